@@ -0,0 +1,191 @@
+from planner.enums import FlightDirection
+from planner.flight import RoundTrip
+from planner.flight_index import FlightIndex
+from planner.index import load_index
+from planner.itinerary import LegIndex
+from planner.join import home_cities, home_rows, iter_round_trips
+from planner.ranking import Objectives, TopK
+from planner.store import FlightStore
+
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import cmd
+import time
+
+import numpy as np
+
+def parse_range(text: Optional[str], parse: Callable) -> tuple:
+    # Ranges look like "2..8", and either end can be left out, as in "..8"
+    if text is None:
+        return None, None
+    
+    low, separator, high = text.partition("..")
+    
+    if not separator:
+        raise ValueError(f"{text} is not a range, such as 2..8")
+    
+    return parse(low) if low else None, parse(high) if high else None
+
+def parse_hours(text: str) -> timedelta:
+    return timedelta(hours = float(text))
+
+class Explorer(cmd.Cmd):
+    """Answers queries about the flights found by a search"""
+    intro = "Query the flights found by the search. Type help or ? to list commands.\n"
+    prompt = "(flights) "
+    
+    def __init__(self, index: FlightIndex, city2airports: dict, airport2cities: dict):
+        super().__init__()
+        self.index = index
+        self.city2airports = city2airports
+        self.airport2cities = airport2cities
+        
+        # Every flight found, in either direction, for connecting through other airports
+        self.legs = LegIndex.from_store(index.store)
+    
+    def _options(self, line: str, allowed: set[str]) -> dict[str, str]:
+        options = {}
+        
+        for word in line.split():
+            name, separator, value = word.partition("=")
+            
+            if not separator or name not in allowed:
+                raise ValueError(f"{word} is not an option, choose from {', '.join(sorted(allowed))}")
+            
+            options[name] = value
+        
+        return options
+    
+    def _query(self, direction: FlightDirection, options: dict[str, str], leeway: Optional[str] = None):
+        airports = options["airports"].upper().split(",") if "airports" in options else None
+        
+        return self.index.query(direction,
+                                airports = airports,
+                                leeway_range = parse_range(leeway, parse_hours),
+                                time_range = parse_range(options.get("time"), datetime.fromisoformat),
+                                max_cost = int(options["cost"]) if "cost" in options else None)
+    
+    def _show_flights(self, direction: FlightDirection, line: str):
+        options = self._options(line, {"airports", "leeway", "time", "cost", "limit"})
+        
+        start = time.perf_counter()
+        flights = self._query(direction, options, options.get("leeway"))
+        elapsed = time.perf_counter() - start
+        
+        # Cheapest first
+        order = np.argsort(flights["cost"], kind = "stable")
+        
+        for i in order[:int(options.get("limit", 20))]:
+            print(flights.flight(i))
+        
+        print(f"{len(flights)} {direction.value} flights in {elapsed * 1000:.1f} ms")
+    
+    def do_departing(self, line: str):
+        """departing [airports=AUS,DFW] [leeway=2..8] [time=2024-04-08T06:00..2024-04-08T12:00] [cost=400] [limit=20]
+        Flights landing at the airports, with the hours to set up and the landing time within the ranges"""
+        self._show_flights(FlightDirection.DEPARTING, line)
+    
+    def do_returning(self, line: str):
+        """returning [airports=AUS,DFW] [leeway=2..8] [time=2024-04-08T15:00..2024-04-08T23:00] [cost=400] [limit=20]
+        Flights taking off from the airports, with the hours to clean up and the takeoff time within the ranges"""
+        self._show_flights(FlightDirection.RETURNING, line)
+    
+    def do_trips(self, line: str):
+        """trips [airports=AUS,DFW] [setup=2..8] [cleanup=2..8] [by=cost,travel_time] [top=10] [home=Chicago]
+        The best round trips through the airports, with the hours to set up and clean up within the ranges"""
+        options = self._options(line, {"airports", "setup", "cleanup", "by", "top", "home"})
+        objectives = Objectives(options.get("by", "cost,travel_time"))
+        
+        start = time.perf_counter()
+        
+        departing = self._query(FlightDirection.DEPARTING, options, options.get("setup", "2..8"))
+        returning = self._query(FlightDirection.RETURNING, {}, options.get("cleanup", "2..8"))
+        
+        ranker = TopK(int(options.get("top", 10)))
+        num_trips = 0
+        
+        # Each traveler flies home to where they left from, so pair the flights of each home city apart
+        homes = [options["home"]] if "home" in options else home_cities(departing, self.airport2cities)
+        
+        for home in homes:
+            departing_home = home_rows(departing, self.city2airports[home])
+            returning_home = home_rows(returning, self.city2airports[home])
+            
+            chunks = iter_round_trips(departing.where(departing_home), returning.where(returning_home),
+                                      self.city2airports, self.airport2cities)
+            
+            for departing_rows, returning_rows in chunks:
+                # Back to rows of every flight found, so trips from each home can be ranked together
+                departing_rows, returning_rows = departing_home[departing_rows], returning_home[returning_rows]
+                
+                keys = objectives.keys(departing.records[departing_rows], returning.records[returning_rows])
+                ranker.push_many(keys, np.stack((departing_rows, returning_rows), axis = 1))
+                
+                num_trips += len(keys)
+        
+        elapsed = time.perf_counter() - start
+        
+        for _, (departing_row, returning_row) in ranker.results():
+            print(RoundTrip(departing.flight(departing_row), returning.flight(returning_row)), end = "\n\n")
+        
+        print(f"Best {len(ranker)} of {num_trips} round trips by {objectives} in {elapsed * 1000:.1f} ms")
+    
+    def do_connect(self, line: str):
+        """connect from=LAX to=AUS,DFW [after=2024-04-07T06:00] [before=2024-04-08T10:00] [connection=2] [legs=3] [by=cost]
+        The cheapest way to each airport, or the soonest with by=arrival, changing planes with at least the hours between flights"""
+        options = self._options(line, {"from", "to", "after", "before", "connection", "legs", "by"})
+        
+        if "from" not in options or "to" not in options:
+            raise ValueError("Both from= and to= airports are required")
+        
+        by = options.get("by", "cost")
+        
+        if by not in ("cost", "arrival"):
+            raise ValueError(f"{by} is not an objective, choose from cost, arrival")
+        
+        find = self.legs.cheapest if by == "cost" else self.legs.earliest_arrivals
+        
+        start = time.perf_counter()
+        itineraries = find(options["from"].upper().split(","), options["to"].upper().split(","),
+                           depart_after = datetime.fromisoformat(options["after"]) if "after" in options else None,
+                           deadline = datetime.fromisoformat(options["before"]) if "before" in options else None,
+                           min_connection = parse_hours(options.get("connection", "2")),
+                           max_legs = int(options.get("legs", 3)))
+        elapsed = time.perf_counter() - start
+        
+        for itinerary in itineraries.values():
+            print(itinerary, end = "\n\n")
+        
+        print(f"{len(itineraries)} itineraries through {len(self.legs)} flights by {by} in {elapsed * 1000:.1f} ms")
+    
+    def do_quit(self, line: str):
+        """quit
+        Stop exploring"""
+        return True
+    
+    def do_EOF(self, line: str):
+        print()
+        return True
+    
+    def emptyline(self):
+        # Don't repeat the last query
+        pass
+    
+    def onecmd(self, line: str):
+        try:
+            return super().onecmd(line)
+        except (ValueError, KeyError) as error:
+            print(f"Error: {error}")
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description = "Interactively query the flights found by a search")
+    parser.add_argument("--output", default = "output/flights", help = "directory the flights were stored in")
+    parser.add_argument("--transfer-radius", type = float, help = "kilometers within which to fly home from a different airport than the one arrived at")
+    args = parser.parse_args()
+    
+    index = load_index("data/processed.csv", transfer_radius = args.transfer_radius)
+    
+    Explorer(FlightIndex(FlightStore(args.output)), index.city2airports, index.airport2cities).cmdloop()
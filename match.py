@@ -1,78 +1,104 @@
-from planner.utils import get_airport_to_eclipse_times, load_airports
+from planner.index import load_index
 from planner.flight import RoundTrip
+from planner.store import FlightStore
+from planner.join import from_home, home_cities, iter_round_trips, leeway_mask
+from planner.ranking import OBJECTIVES, Objectives, Skyline, TopK
+from planner.pruning import Constraints
 
-from collections import defaultdict
-from datetime import timedelta
+import argparse
 
-import pickle
+import numpy as np
 
-with open("output/departing.pkl", "rb") as file:
-    departing_flights = pickle.load(file)
+parser = argparse.ArgumentParser(description = "Match departing and returning flights into round trips")
+parser.add_argument("--top", type = int, default = 25, help = "number of trips to show")
+parser.add_argument("--pareto", action = "store_true", help = "show every trip which no other trip beats in all of the objectives")
+parser.add_argument("--objectives", default = "cost,travel_time",
+                    help = f"comma separated objectives to rank by, from {', '.join(OBJECTIVES)}, prefixed with - to prefer larger values")
+parser.add_argument("--origin-city", nargs = "+", help = "cities to match trips home to, by default every city flights were searched from")
+parser.add_argument("--transfer-radius", type = float, help = "kilometers within which to fly home from a different airport than the one arrived at")
+parser.add_argument("--output", default = "output/flights", help = "directory the flights were stored in")
+parser.add_argument("--window", type = int,
+                    help = "days the search's --window added, by default read from the flights along with the setup and cleanup windows")
+args = parser.parse_args()
 
-with open("output/returning.pkl", "rb") as file:
-    returning_flights = pickle.load(file)
+objectives = Objectives(args.objectives)
 
-print("%d departing flights were found" % len(departing_flights))
-print("%d returning flights were found" % len(returning_flights))
+# Map the flights found by the search into memory
+store = FlightStore(args.output)
+departing_table, returning_table = store.departing, store.returning
 
-num_duplicate_departing_flights = len(departing_flights) - len(set(departing_flights))
-num_duplicate_returning_flights = len(returning_flights) - len(set(returning_flights))
+print("%d departing flights were found" % len(departing_table))
+print("%d returning flights were found" % len(returning_table))
+
+num_duplicate_departing_flights = len(departing_table) - len(np.unique(departing_table.records))
+num_duplicate_returning_flights = len(returning_table) - len(np.unique(returning_table.records))
 
 assert num_duplicate_departing_flights == 0, "Duplicate departing flights were found"
 assert num_duplicate_returning_flights == 0, "Duplicate returning flights were found"
 
-# Load origin and eclipse viewing airports
-origin_airports, viewing_airports, city2airports, airport2cities = load_airports("data/processed.csv")
-
-# Get eclipse event times at each airport
-localized_events = get_airport_to_eclipse_times("data/processed.csv")
-
-# Define the minimum and maximum allowed setup and cleanup times
-min_setup_time = timedelta(hours = 2)
-max_setup_time = timedelta(hours = 8)
-min_cleanup_time = timedelta(hours = 2)
-max_cleanup_time = timedelta(hours = 8)
-
-# Filter out flights which do not have enough time to setup and cleanup
-departing_flights = [flight for flight in departing_flights if min_setup_time <= flight.leeway_time <= max_setup_time]
-returning_flights = [flight for flight in returning_flights if min_cleanup_time <= flight.leeway_time <= max_cleanup_time]
-
-print("%d departing flights remain after filtering for leeway time" % len(departing_flights))
-print("%d returning flights remain after filtering for leeway time" % len(returning_flights))
-
-# Organize returning flights by the airport they are departing from
-returning_departures = defaultdict(list)
-
-for flight in returning_flights:
-    returning_departures[flight.departure_airport].append(flight)
-
-# Compute all possible round trips
-trips = set()
-
-for departing_flight in departing_flights:
-    # We are arriving at some airport to view the eclipse. Let's get all of the cities
-    # which share this airport.
-    for city in airport2cities[departing_flight.arrival_airport]:
-        # Then, get all of the airports used by all of these cities. This is 
-        # effectively the list of airports we can use for returning home.
-        for airport in city2airports[city]:
-            for returning_flight in returning_departures[airport]:
-                trip = RoundTrip(departing_flight, returning_flight)
-                trips.add(trip)
-
-# Sort trips by total cost.
-trips = sorted(trips, key = lambda trip: (trip.cost, trip.travel_time), reverse = True)
-print("%d possible round trips were found" % len(trips))
-
-# All trips will work a follows:
-#  1. You leave from a home airport
-#  2. You arrive at an airport to view the eclipse with sufficient time to
-#     set up and clean up afterwords
-#  3. You view the eclipse
-#  4. You depart at some airport in the eclipse viewing city (not necessarily
-#     the same airport you arrived at)
-#  5. You arrive back at some home airport (also not necessarily the same
-#     airport you left from originally)
-
-for trip in trips:
-    print(trip, end = '\n\n')
\ No newline at end of file
+# Load the airports of each city, shared with the search
+index = load_index("data/processed.csv", transfer_radius = args.transfer_radius)
+city2airports, airport2cities = index.city2airports, index.airport2cities
+
+# A search may be shared by travelers from several cities, each of whom flies out from and back to their own
+origin_cities = args.origin_city or home_cities(departing_table, airport2cities)
+
+# Use the same setup and cleanup windows as the search, which saved them with the flights
+if args.window is not None:
+    constraints = Constraints().widened(args.window)
+elif store.constraints is not None:
+    constraints = Constraints.from_json(store.constraints)
+else:
+    constraints = Constraints()
+
+min_setup_time, max_setup_time = constraints.min_setup_time, constraints.max_setup_time
+min_cleanup_time, max_cleanup_time = constraints.min_cleanup_time, constraints.max_cleanup_time
+
+for origin_city in origin_cities:
+    # Only the flights which leave from and return to this traveler's home airports
+    departing, returning = from_home(departing_table, returning_table, city2airports[origin_city])
+    
+    if len(origin_cities) > 1:
+        print("\nRound trips from %s" % origin_city)
+    
+    print("%d departing flights remain after filtering for leeway time" % leeway_mask(departing, min_setup_time, max_setup_time).sum())
+    print("%d returning flights remain after filtering for leeway time" % leeway_mask(returning, min_cleanup_time, max_cleanup_time).sum())
+    
+    # Pair up flights with enough time to setup and cleanup, on the stored columns,
+    # keeping only the best trips so that memory doesn't grow with the number of pairings
+    chunks = iter_round_trips(departing, returning, city2airports, airport2cities,
+                              min_setup_time = min_setup_time,
+                              max_setup_time = max_setup_time,
+                              min_cleanup_time = min_cleanup_time,
+                              max_cleanup_time = max_cleanup_time)
+    
+    ranker = Skyline() if args.pareto else TopK(args.top)
+    num_trips = 0
+    
+    for departing_rows, returning_rows in chunks:
+        keys = objectives.keys(departing.records[departing_rows], returning.records[returning_rows])
+        ranker.push_many(keys, np.stack((departing_rows, returning_rows), axis = 1))
+        
+        num_trips += len(keys)
+    
+    print("%d possible round trips were found" % num_trips)
+    
+    if args.pareto:
+        print("%d of them are not beaten in every one of %s by another trip" % (len(ranker), objectives))
+    else:
+        print("Showing the best %d of them by %s" % (len(ranker), objectives))
+    
+    # All trips will work a follows:
+    #  1. You leave from a home airport
+    #  2. You arrive at an airport to view the eclipse with sufficient time to
+    #     set up and clean up afterwords
+    #  3. You view the eclipse
+    #  4. You depart at some airport in the eclipse viewing city (not necessarily
+    #     the same airport you arrived at)
+    #  5. You arrive back at some home airport (also not necessarily the same
+    #     airport you left from originally)
+    
+    # Show the best trip last, so that it's closest to the prompt
+    for _, (departing_row, returning_row) in reversed(ranker.results()):
+        trip = RoundTrip(departing.flight(departing_row), returning.flight(returning_row))
+        print(trip, end = '\n\n')
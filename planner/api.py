@@ -1,5 +1,10 @@
 from planner.enums import TripType, FlightClass
-from planner.utils import chunkify
+from planner.query import Query, chunk_queries
+from planner.cache import QueryCache
+from planner.journal import Journal
+from planner.urls import search_url
+from planner.parser import ParsedFlight, parse_calendar, parse_flights
+from planner.metrics import Metrics, timed_call
 
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
@@ -7,33 +12,119 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import WebDriverException
 
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from datetime import datetime
-from bs4 import BeautifulSoup
 
-from typing import Union, Optional
+from typing import Generator, Iterable, Union, Optional
 from time import sleep
 
 import logging
-import re
 
 logger = logging.getLogger(__name__)
+
+def to_rows(flights: list[ParsedFlight]) -> list:
+    return [
+        ((flight.departure_airport, flight.arrival_airport), (flight.departure_time, flight.arrival_time), flight.price)
+        for flight in flights
+    ]
+
+# What the search form shows when it is first loaded
+FRESH_FORM = dict(
+    departing_from = None,
+    arriving_to = None,
+    departure_date = None,
+    trip = TripType.DEFAULT,
+    flight_class = FlightClass.DEFAULT,
+    return_date = None,
+    adults = 1,
+    children = 0,
+    infants_in_seat = 0,
+    infants_on_lap = 0,
+)
+
+# Resources which the results page loads but the parser never uses. Flights are
+# listed as text, so images, web fonts, map tiles and tracking can all be left out.
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+    "*maps.googleapis.com*", "*/maps/vt*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*play.google.com/log*", "*/gen_204*",
+]
+
+# Chrome features which a scraper has no use for
+LEAN_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+# Flight cards on the results page, and fares on the days of the date picker
+FLIGHT_CARDS = "li.pIav2d"
+CALENDAR_FARES = "div[role='gridcell'][data-iso] div.UNMzKf"
+
+# What the results page shows instead of flight cards when nothing flies the route.
+# Links ask for the page in English, so the message can be matched by its text.
+NO_FLIGHTS = "//*[contains(text(), 'No results returned')]"
+
+# The first flight card or the message that there are none, whichever the page shows
+FIRST_RESULT = f"""
+return document.querySelector("{FLIGHT_CARDS}") ||
+    document.evaluate("{NO_FLIGHTS}", document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+"""
+
+# Resolves once more than `count` elements match `selector`, or an element matches
+# the XPath `otherwise` if it isn't null, or after `timeout` milliseconds, with whether
+# it succeeded, the final count, the time taken and how many times the page changed
+# before then
+WAIT_FOR_ELEMENTS = """
+const [selector, count, otherwise, timeout, done] = arguments;
+const started = performance.now();
+const countMatches = () => document.querySelectorAll(selector).length;
+const shown = () => countMatches() > count || (otherwise !== null &&
+    document.evaluate(otherwise, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null);
+let checks = 0;
+
+if (shown()) {
+    done([true, countMatches(), 0, checks]);
+    return;
+}
+
+const finish = (found) => {
+    observer.disconnect();
+    clearTimeout(timer);
+    done([found, countMatches(), performance.now() - started, checks]);
+};
+
+const observer = new MutationObserver(() => {
+    checks += 1;
     
-class API:
-    endpoint = "https://www.google.com/travel/flights/search"
-    
-    def __init__(self, debug: bool = False):
-        self.debug = debug
-        
-        options = webdriver.ChromeOptions()
-        
-        if not debug:
-            options.add_argument("--headless=new")
-            
-        options.add_argument("--window-size=1920,1080")
+    if (shown()) {
+        finish(true);
+    }
+});
 
-        self.driver = webdriver.Chrome(options = options)
-        self.driver.implicitly_wait(30)
+observer.observe(document.body, {childList: true, subtree: true});
+
+const timer = setTimeout(() => finish(false), timeout);
+"""
+
+class BaseAPI(ABC):
+    """Searching which is shared by a single browser and a pool of browsers"""
+    cache: Optional[QueryCache] = None
+    journal: Optional[Journal] = None
+    metrics: Metrics
     
     def search(
         self,
@@ -48,127 +139,402 @@ class API:
         infants_in_seat: int = 0,
         infants_on_lap: int = 0,
     ):
-        if isinstance(departing_from, str):
-            departing_from = [departing_from]
+        queries = chunk_queries(
+            departing_from = departing_from,
+            arriving_to = arriving_to,
+            departure_date = departure_date,
+            trip = trip,
+            flight_class = flight_class,
+            return_date = return_date,
+            adults = adults,
+            children = children,
+            infants_in_seat = infants_in_seat,
+            infants_on_lap = infants_on_lap,
+        )
+        
+        for query, rows in self.stream(queries):
+            yield from rows
+    
+    def run(self, query: Query):
+        for _, rows in self.stream([query]):
+            yield from rows
+    
+    @abstractmethod
+    def stream(self, queries: Iterable[Query]) -> Generator[tuple[Query, list], None, None]:
+        """The rows of each query, in the order the queries finish"""
+    
+    @abstractmethod
+    def cheapest_fares(self, queries: Iterable[Query]) -> Generator[tuple[Query, dict[datetime, Optional[int]]], None, None]:
+        """The cheapest fare on each day around each query's date, from one page per query"""
+    
+    def _lookup(self, query: Query) -> Optional[list]:
+        # Queries which were completed earlier in this sweep
+        if self.journal is not None:
+            rows = self.journal.get(query)
+            
+            if rows is not None:
+                self.metrics.increment("journal_hits")
+                return rows
+        
+        # Replay the results of a recent identical search without opening the page
+        if self.cache is not None:
+            rows = self.cache.get(query)
+            
+            if rows is not None:
+                logger.info("Using %d cached flights for %s", len(rows), query)
+                self.metrics.increment("cache_hits")
+                
+                if self.journal is not None:
+                    self.journal.append(query, rows)
+                
+                return rows
         
-        if isinstance(arriving_to, str):
-            arriving_to = [arriving_to]
+        return None
+    
+    def _lookup_fares(self, query: Query) -> Optional[dict[datetime, Optional[int]]]:
+        # Date pickers are looked up like searches, so resuming doesn't open them again
+        if self.journal is not None:
+            fares = self.journal.get_fares(query)
             
-        if isinstance(departure_date, datetime):
-            departure_date = [departure_date]
+            if fares is not None:
+                self.metrics.increment("journal_hits")
+                return fares
+        
+        if self.cache is not None:
+            fares = self.cache.get_fares(query)
             
-        if trip == TripType.MULTICITY:
-            raise NotImplementedError("Multi-city trips are not yet supported.")
-        elif trip == TripType.ROUNDTRIP and return_date is None:
-            raise ValueError("Return date must be specified for round-trip flights.")
-        
-        if adults < 1:
-            raise ValueError("At least one adult must be present.")
-        
-        if children < 0:
-            raise ValueError("Cannot have a negative number of children.")
-        
-        if infants_in_seat < 0 or infants_on_lap < 0:
-            raise ValueError("Cannot have a negative number of infants.")
-        
-        # We can only query up to 7 airports at a time, so chunk the airports
-        # into groups of 7
-        for departing_group in chunkify(departing_from, 7):
-            for arriving_group in chunkify(arriving_to, 4):
-                for date in departure_date:
-                    yield from self._search(
-                        departing_from = departing_group,
-                        arriving_to = arriving_group,
-                        departure_date = date,
-                        trip = trip,
-                        flight_class = flight_class,
-                        return_date = return_date,
-                        adults = adults,
-                        children = children,
-                        infants_in_seat = infants_in_seat,
-                        infants_on_lap = infants_on_lap,
-                    )
+            if fares is not None:
+                self.metrics.increment("cache_hits")
+                
+                if self.journal is not None:
+                    self.journal.append_fares(query, fares)
+                
+                return fares
+        
+        return None
     
-    def _search(
+    def _store_fares(self, query: Query, fares: dict[datetime, Optional[int]]):
+        # A date picker without any fares may just not have loaded, so it is read again next time
+        if not fares:
+            return
+        
+        if self.cache is not None:
+            self.cache.put_fares(query, fares)
+        
+        if self.journal is not None:
+            self.journal.append_fares(query, fares)
+    
+    def _store(self, query: Query, rows: list):
+        logger.info("Found %d flights for %s", len(rows), query)
+        
+        self.metrics.increment("queries_searched")
+        self.metrics.increment("flights_found", len(rows))
+        self.metrics.observe("flights_per_query", len(rows))
+        
+        if self.cache is not None:
+            self.cache.put(query, rows)
+        
+        if self.journal is not None:
+            self.journal.append(query, rows)
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+class API(BaseAPI):
+    endpoint = "https://www.google.com/travel/flights/search"
+    
+    def __init__(
         self,
-        departing_from: Union[str, list[str]],
-        arriving_to: Union[str, list[str]],
-        departure_date: datetime,
-        trip: TripType = TripType.ROUNDTRIP,
-        flight_class: FlightClass = FlightClass.ECONOMY,
-        return_date: Optional[datetime] = None,
-        adults: int = 1,
-        children: int = 0,
-        infants_in_seat: int = 0,
-        infants_on_lap: int = 0,
+        debug: bool = False,
+        timeout: float = 120,
+        cache: Optional[QueryCache] = None,
+        journal: Optional[Journal] = None,
+        direct: bool = True,
+        results_timeout: float = 30,
+        expand_timeout: float = 30,
+        parse_workers: int = 0,
+        metrics: Optional[Metrics] = None,
+        lean: bool = False,
     ):
-        driver = self.driver
-        driver.get(self.endpoint)
+        self.debug = debug
+        self.timeout = timeout
+        self.cache = cache
+        self.journal = journal
         
-        actions = ActionChains(driver)
+        # Where the time spent on each step of a search is recorded
+        self.metrics = metrics if metrics is not None else Metrics()
         
-        # Select trip type
-        if trip != TripType.DEFAULT:
-            trip_type_dropdown_menu_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-TkwUic")[0]
-            trip_type_dropdown_menu_button.click()
-            trip_type_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-rymPhb-ibnC6b-OWXEXe-SfQLQb-Woal0c-RWgCYc")[trip.value]
-            trip_type_button.click()
+        # Whether to open the results page from a link instead of filling in the search form,
+        # until a link fails to show any results in this browser
+        self.direct = direct
         
-        # Select flight class
-        if flight_class != FlightClass.DEFAULT:
-            flight_class_dropdown_menu_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-TkwUic")[1]
-            flight_class_dropdown_menu_button.click()
-            flight_class_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-rymPhb-ibnC6b-OWXEXe-SfQLQb-Woal0c-RWgCYc")[flight_class.value]
-            flight_class_button.click()
+        # How long to wait for the results page to show its first flights
+        self.results_timeout = results_timeout
         
-        # Select passengers
-        if adults > 1 or children or infants_in_seat or infants_on_lap != 0:
-            passengers_dropdown_button = WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.CLASS_NAME, "Hj7hq")))
-            passengers_dropdown_button.click()
+        # How long to wait for the rest of the flights after expanding the list
+        self.expand_timeout = expand_timeout
+        
+        # Processes which parse pages while the browser keeps searching
+        self.parser = ProcessPoolExecutor(max_workers = parse_workers) if parse_workers > 0 else None
+        
+        options = webdriver.ChromeOptions()
+        
+        if not debug:
+            options.add_argument("--headless=new")
+        
+        options.add_argument("--window-size=1920,1080")
+        
+        # The fields last entered into the search form, if it is still on the page
+        self.form = None
+        
+        # Skip everything the parser doesn't need, as long as the flights still show
+        self.lean = lean
+        
+        if lean:
+            for argument in LEAN_ARGUMENTS:
+                options.add_argument(argument)
+        
+        self.driver = webdriver.Chrome(options = options)
+        self.driver.implicitly_wait(30)
+        
+        # Bound every page load and script so that a stuck tab raises instead
+        # of blocking forever
+        self.driver.set_page_load_timeout(timeout)
+        self.driver.set_script_timeout(timeout)
+        
+        # Resources are blocked through the DevTools protocol rather than browser
+        # settings, so that they can be let through again if the flights don't show
+        if lean:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    
+    def fetch(self, query: Query) -> str:
+        with self.metrics.timer("fetch"):
+            return self._fetch(**query.kwargs())
+    
+    def stream(self, queries: Iterable[Query]) -> Generator[tuple[Query, list], None, None]:
+        # Pages waiting to be parsed in the background, by the query they answer
+        parsing = {}
+        
+        for query in queries:
+            rows = self._lookup(query)
             
-            increment_buttons = driver.find_elements(By.CLASS_NAME, "g2ZhCc")
+            if rows is not None:
+                yield query, rows
+                continue
             
-            # Add adults
-            if adults > 1:
-                increment_adults_button = increment_buttons[1]
+            if self.parser is None:
+                with self.metrics.timer("search"):
+                    rows = list(self._search(**query.kwargs()))
                 
-                for _ in range(adults - 1):
-                    increment_adults_button.click()
-                    
-            # Add children
-            if children:
-                increment_children_button = increment_buttons[3]
-                
-                for _ in range(children):
-                    increment_children_button.click()
-                    
-            # Add infants in seat
-            if infants_in_seat:
-                increment_infants_in_seat_button = increment_buttons[5]
-                
-                for _ in range(infants_in_seat):
-                    increment_infants_in_seat_button.click()
-                    
-            # Add infants on lap
-            if infants_on_lap:
-                increment_infants_on_lap_button = increment_buttons[7]
-                
-                for _ in range(infants_on_lap):
-                    increment_infants_on_lap_button.click()
+                self._store(query, rows)
+                yield query, rows
+                continue
+            
+            # Parse the page in the background while the browser moves on to the next query
+            page = self.fetch(query)
+            parsing[self.parser.submit(timed_call, parse_flights, page, query.departure_date)] = query
+            
+            for future in [future for future in parsing if future.done()]:
+                yield self._collect(future, parsing.pop(future))
+        
+        for future in as_completed(parsing):
+            yield self._collect(future, parsing[future])
+    
+    def fetch_calendar(self, query: Query) -> str:
+        """The search page for a query with its date picker open, showing a fare for each day"""
+        with self.metrics.timer("calendar"):
+            # The results don't have to show, since only the date picker is read
+            self.form = None
+            
+            with self.metrics.timer("page_load"):
+                self.driver.get(search_url(self.endpoint, query))
             
-            # Click "Done"
-            done_button = driver.find_elements(By.CLASS_NAME, "sIWnMc")[2]
-            done_button.click()
+            self.driver.find_elements(By.CLASS_NAME, "GYgkab")[0].click()
+            
+            # Fares for every day shown arrive together, so wait for the first of them
+            found, _ = self._wait_for(CALENDAR_FARES, more_than = 0, timeout = self.results_timeout, step = "calendar")
+            
+            if not found:
+                logger.warning("The date picker did not show any fares for %s", query)
+            
+            return self.driver.page_source
+    
+    def cheapest_fares(self, queries: Iterable[Query]) -> Generator[tuple[Query, dict[datetime, Optional[int]]], None, None]:
+        for query in queries:
+            fares = self._lookup_fares(query)
+            
+            if fares is None:
+                fares = parse_calendar(self.fetch_calendar(query))
+                self._store_fares(query, fares)
+            
+            yield query, fares
+    
+    def _collect(self, future: Future, query: Query) -> tuple[Query, list]:
+        flights, elapsed = future.result()
+        self.metrics.observe("parse_seconds", elapsed)
+        
+        rows = to_rows(flights)
+        self._store(query, rows)
+        return query, rows
+    
+    def heap_size(self) -> int:
+        """Bytes of JavaScript heap held by the page, which is what grows over a long sweep
+        
+        This is not the memory of Chrome's processes, which also hold the renderer,
+        the GPU process and their caches, but it grows along with them.
+        """
+        self.driver.execute_cdp_cmd("Performance.enable", {})
+        metrics = self.driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+        
+        return int(sum(metric["value"] for metric in metrics if metric["name"] == "JSHeapTotalSize"))
+    
+    def close(self):
+        self.driver.quit()
+        
+        if self.parser is not None:
+            self.parser.shutdown(cancel_futures = True)
+    
+    def _stop_blocking(self, query: Query):
+        logger.warning("No results were shown with resources blocked for %s, loading them all instead", query)
+        self.metrics.increment("lean_fallbacks")
+        
+        self.lean = False
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+    
+    def _open_results(self, query: Query) -> bool:
+        # Opening a link replaces the form
+        self.form = None
+        
+        with self.metrics.timer("page_load"):
+            self.driver.get(search_url(self.endpoint, query))
+        
+        shown = self._wait_for_results()
+        
+        # If the results don't show without the blocked resources, load everything from now on.
+        # A route without any flights still says so, which doesn't need anything that is blocked.
+        if shown is None and self.lean:
+            self._stop_blocking(query)
+            return self._open_results(query)
+        
+        # A page which says there are no flights has answered the query as well as the form would
+        if shown is None:
+            logger.info("Direct link did not show any results for %s, filling in the search form from now on", query)
+            self.metrics.increment("direct_link_fallbacks")
+            self.direct = False
+            return False
+        
+        return True
+    
+    def _wait_for_flights(self, more_than: int, timeout: float, step: str) -> bool:
+        found, _ = self._wait_for(FLIGHT_CARDS, more_than, timeout, step)
+        return found
+    
+    def _wait_for_results(self) -> Optional[int]:
+        """How many flights the results page shows, 0 if it says there are none, or None if it shows neither"""
+        found, count = self._wait_for(FLIGHT_CARDS, 0, self.results_timeout, "results", otherwise = NO_FLIGHTS)
+        
+        if not found:
+            return None
+        
+        if count == 0:
+            logger.info("The results page says there are no flights")
+            self.metrics.increment("empty_results")
+        
+        return count
+    
+    def _wait_for(self, selector: str, more_than: int, timeout: float, step: str, otherwise: Optional[str] = None) -> tuple[bool, int]:
+        # Watch the page for new elements from inside the browser, so we are
+        # woken up by the DOM change itself rather than re-reading the page
+        found, count, elapsed, checks = self.driver.execute_async_script(WAIT_FOR_ELEMENTS, selector, more_than, otherwise, timeout * 1000)
+        
+        logger.info("Waited %.2fs for more than %d of %s, %d are shown", elapsed / 1000, more_than, selector, count)
+        
+        self.metrics.observe(f"{step}_wait_seconds", elapsed / 1000)
+        self.metrics.observe(f"{step}_wait_checks", checks)
+        
+        if not found:
+            self.metrics.increment(f"{step}_wait_timeouts")
+        
+        return found, count
+    
+    def _set_trip_type(self, trip: TripType):
+        driver = self.driver
+        
+        trip_type_dropdown_menu_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-TkwUic")[0]
+        trip_type_dropdown_menu_button.click()
+        trip_type_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-rymPhb-ibnC6b-OWXEXe-SfQLQb-Woal0c-RWgCYc")[trip.value]
+        trip_type_button.click()
+    
+    def _set_flight_class(self, flight_class: FlightClass):
+        driver = self.driver
+        
+        flight_class_dropdown_menu_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-TkwUic")[1]
+        flight_class_dropdown_menu_button.click()
+        flight_class_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-rymPhb-ibnC6b-OWXEXe-SfQLQb-Woal0c-RWgCYc")[flight_class.value]
+        flight_class_button.click()
+    
+    def _set_passengers(self, adults: int, children: int, infants_in_seat: int, infants_on_lap: int):
+        driver = self.driver
+        
+        passengers_dropdown_button = WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.CLASS_NAME, "Hj7hq")))
+        passengers_dropdown_button.click()
+        
+        increment_buttons = driver.find_elements(By.CLASS_NAME, "g2ZhCc")
+        
+        # Add adults
+        if adults > 1:
+            increment_adults_button = increment_buttons[1]
+            
+            for _ in range(adults - 1):
+                increment_adults_button.click()
+        
+        # Add children
+        if children:
+            increment_children_button = increment_buttons[3]
+            
+            for _ in range(children):
+                increment_children_button.click()
+        
+        # Add infants in seat
+        if infants_in_seat:
+            increment_infants_in_seat_button = increment_buttons[5]
+            
+            for _ in range(infants_in_seat):
+                increment_infants_in_seat_button.click()
+        
+        # Add infants on lap
+        if infants_on_lap:
+            increment_infants_on_lap_button = increment_buttons[7]
+            
+            for _ in range(infants_on_lap):
+                increment_infants_on_lap_button.click()
+        
+        # Click "Done"
+        done_button = driver.find_elements(By.CLASS_NAME, "sIWnMc")[2]
+        done_button.click()
+    
+    def _set_dates(self, departure_date: datetime, return_date: Optional[datetime], trip: TripType):
+        driver = self.driver
         
         # Get departure and arrival time fields
         departure_arrival_time_fields = driver.find_elements(By.CLASS_NAME, "GYgkab")
-
+        
         # Enter departure date
         departure_time_field = departure_arrival_time_fields[0]
         departure_time_field.click()
         
         departure_time_field = driver.find_elements(By.CLASS_NAME, "TP4Lpb")[2]
         departure_time_field.click()
+        
+        # Replace whatever date is already entered
+        departure_time_field.send_keys(Keys.COMMAND, 'a')
         departure_time_field.send_keys(departure_date.strftime("%Y-%m-%d"))
         departure_time_field.send_keys(Keys.RETURN)
         
@@ -176,121 +542,238 @@ class API:
         if trip == TripType.ROUNDTRIP:
             return_time_field = driver.find_elements(By.CLASS_NAME, "TP4Lpb")[3]
             return_time_field.click()
+            return_time_field.send_keys(Keys.COMMAND, 'a')
             return_time_field.send_keys(return_date.strftime("%Y-%m-%d"))
             return_time_field.send_keys(Keys.RETURN)
         
         # Click "Done"
         done_button = driver.find_element(By.CLASS_NAME, "WXaAwc")
         done_button.click()
+    
+    def _set_airports(self, field_index: int, airport_codes: Iterable[str]):
+        driver = self.driver
+        actions = ActionChains(driver)
         
-        # Enter departure and arrival locations
-        departure_arrival_fields = driver.find_elements(By.CLASS_NAME, "II2One")
-        
-        departure_field = departure_arrival_fields[0]
-        arrival_field = departure_arrival_fields[2]
-        
-        # Enter departure locations
-        departure_field.click()
+        # Clear the airports which are already entered
+        driver.find_elements(By.CLASS_NAME, "II2One")[field_index].click()
         actions.key_down(Keys.COMMAND).send_keys('A').key_up(Keys. COMMAND).perform()
         actions.key_down(Keys.DELETE).perform()
         
-        for airport_code in departing_from:
+        for airport_code in airport_codes:
             driver.find_elements(By.CLASS_NAME, "II2One")[3].send_keys(airport_code)
             sleep(0.3)
             actions.key_down(',').perform()
             sleep(0.3)
+    
+    def _update_form(self, form: dict, previous: dict):
+        driver = self.driver
         
-        # Click the checkmark button
-        checkmark_button_selector = "button.VfPpkd-Bz112c-LgbsSe.yHy1rc.eT1oJ.mN1ivc.evEd9e[data-tooltip-id=\"tt-i26\"]"
-        checkmark_button = WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.CSS_SELECTOR, checkmark_button_selector)))
-        checkmark_button.click()
+        # Time each step of filling in the form
+        lap = self.metrics.stopwatch("form")
         
-        # Enter arrival locations
-        arrival_field.click()
-        actions.key_down(Keys.COMMAND).send_keys('A').key_up(Keys. COMMAND).perform()
-        actions.key_down(Keys.DELETE).perform()
+        # Only change the fields which differ from what the form already shows
+        changed = lambda *names: any(form[name] != previous.get(name) for name in names)
         
-        for airport_code in arriving_to:
-            driver.find_elements(By.CLASS_NAME, "II2One")[3].send_keys(airport_code)
+        if not previous:
+            driver.get(self.endpoint)
+            previous = dict(FRESH_FORM)
+            lap("page_load")
+        
+        # Select trip type
+        if changed("trip"):
+            self._set_trip_type(form["trip"])
+            lap("trip_type")
+        
+        # Select flight class
+        if changed("flight_class"):
+            self._set_flight_class(form["flight_class"])
+            lap("flight_class")
+        
+        # Select passengers
+        if changed("adults", "children", "infants_in_seat", "infants_on_lap"):
+            self._set_passengers(form["adults"], form["children"], form["infants_in_seat"], form["infants_on_lap"])
+            lap("passengers")
+        
+        # Enter departure and return dates
+        if changed("departure_date", "return_date", "trip"):
+            self._set_dates(form["departure_date"], form["return_date"], form["trip"])
+            lap("dates")
+        
+        # Enter departure locations
+        if changed("departing_from"):
+            self._set_airports(0, form["departing_from"])
             
-            sleep(0.3)
-            actions.key_down(',').perform()
-            sleep(0.3)
+            # Click the checkmark button
+            checkmark_button_selector = "button.VfPpkd-Bz112c-LgbsSe.yHy1rc.eT1oJ.mN1ivc.evEd9e[data-tooltip-id=\"tt-i26\"]"
+            checkmark_button = WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.CSS_SELECTOR, checkmark_button_selector)))
+            checkmark_button.click()
+            lap("departure_airports")
+        
+        # Enter arrival locations
+        if changed("arriving_to"):
+            self._set_airports(2, form["arriving_to"])
+            
+            # Click the checkmark button
+            checkmark_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-Bz112c-LgbsSe")[6]
+            checkmark_button.click()
+            lap("arrival_airports")
         
-        # Click the checkmark button
-        checkmark_button = driver.find_elements(By.CLASS_NAME, "VfPpkd-Bz112c-LgbsSe")[6]
-        checkmark_button.click()
+        # A reused form still shows the results of the last search, which would satisfy the
+        # wait for results straight away, so keep hold of one to see when it is replaced
+        old_card = driver.execute_script(FIRST_RESULT)
         
         # Click "Explore"
         explore_button = driver.find_element(By.CLASS_NAME, "xFFcie")
         explore_button.click()
+        lap("submit")
         
-        needs_expanding = False
+        # Raises a timeout if the old results stay, and the form is then filled in again from scratch
+        if old_card is not None:
+            WebDriverWait(driver, self.results_timeout).until(EC.staleness_of(old_card))
+            lap("clear_results")
+    
+    def _fill_form(
+        self,
+        departing_from: Union[str, list[str]],
+        arriving_to: Union[str, list[str]],
+        departure_date: datetime,
+        trip: TripType = TripType.ROUNDTRIP,
+        flight_class: FlightClass = FlightClass.ECONOMY,
+        return_date: Optional[datetime] = None,
+        adults: int = 1,
+        children: int = 0,
+        infants_in_seat: int = 0,
+        infants_on_lap: int = 0,
+    ):
+        form = dict(
+            departing_from = tuple(departing_from),
+            arriving_to = tuple(arriving_to),
+            departure_date = departure_date,
+            trip = trip,
+            flight_class = flight_class,
+            return_date = return_date,
+            adults = adults,
+            children = children,
+            infants_in_seat = infants_in_seat,
+            infants_on_lap = infants_on_lap,
+        )
+        
+        # Passengers can only be added to those on a fresh form, so changing them
+        # once they have been added means starting over
+        previous = self.form
+        passengers = ("adults", "children", "infants_in_seat", "infants_on_lap")
+        
+        if previous is not None and any(previous[name] != form[name] for name in passengers) and \
+                                    any(previous[name] != FRESH_FORM[name] for name in passengers):
+            previous = None
+        
+        # Until the form is submitted, we can't be sure what it shows
+        self.form = None
         
         try:
-            # Expand to show all flights
-            driver.find_element(By.CSS_SELECTOR, "div.zISZ5c.QB2Jof").click()
-            needs_expanding = True
-        except:
-            pass
-        
-        if needs_expanding:
-            # Get number of flights before expanding
-            html = driver.page_source
-            soup = BeautifulSoup(html, "html.parser")
+            self._update_form(form, previous)
+        except (WebDriverException, IndexError):
+            # The page has drifted from the form we filled in last time, so start over
+            if not previous:
+                raise
             
-            num_flights = len(soup.find_all("li", {"class": "pIav2d"}))
+            logger.info("Could not change the search form, reloading it instead")
+            self.metrics.increment("form_reloads")
             
-            # Wait until all flights are loaded
-            while True:
-                try:
-                    hide_button = driver.find_element(By.CSS_SELECTOR, "button.VfPpkd-LgbsSe.VfPpkd-LgbsSe-OWXEXe-k8QpJ.VfPpkd-LgbsSe-OWXEXe-Bz112c-M1Soyc.VfPpkd-LgbsSe-OWXEXe-dgl2Hf.nCP5yc.AjY5Oe.LQeN7.nJawce.OTelKf.iIo4pd")
-                    aria_label = hide_button.get_attribute("aria-label")
-                except:
-                    logging.info("Waiting for flights to load...")
-                    continue
+            self._update_form(form, None)
+        
+        self.form = form
+    
+    def _fetch(
+        self,
+        departing_from: Union[str, list[str]],
+        arriving_to: Union[str, list[str]],
+        departure_date: datetime,
+        trip: TripType = TripType.ROUNDTRIP,
+        flight_class: FlightClass = FlightClass.ECONOMY,
+        return_date: Optional[datetime] = None,
+        adults: int = 1,
+        children: int = 0,
+        infants_in_seat: int = 0,
+        infants_on_lap: int = 0,
+    ) -> str:
+        driver = self.driver
+        
+        query = Query(
+            departing_from = tuple(departing_from),
+            arriving_to = tuple(arriving_to),
+            departure_date = departure_date,
+            trip = trip,
+            flight_class = flight_class,
+            return_date = return_date,
+            adults = adults,
+            children = children,
+            infants_in_seat = infants_in_seat,
+            infants_on_lap = infants_on_lap,
+        )
+        
+        # Go straight to the results page, and only click through the search
+        # form if the page doesn't understand the link
+        if not (self.direct and self._open_results(query)):
+            with self.metrics.timer("form"):
+                self._fill_form(**query.kwargs())
+            
+            shown = self._wait_for_results()
+            
+            if shown is None and self.lean:
+                self._stop_blocking(query)
+                self.form = None
                 
-                html = driver.page_source
-                soup = BeautifulSoup(html, "html.parser")
+                with self.metrics.timer("form"):
+                    self._fill_form(**query.kwargs())
                 
-                num_expanded_flights = len(soup.find_all("li", {"class": "pIav2d"}))
+                shown = self._wait_for_results()
             
-                if aria_label.startswith("Hide") and num_expanded_flights > num_flights:
-                    logging.info("Waiting for flights to load...")
-                    break
-        
-        html = driver.page_source
-        soup = BeautifulSoup(html, "html.parser")
+            # The form may not show what we entered, so start over next time
+            if shown is None:
+                self.form = None
         
-        flights = soup.find_all("li", {"class": "pIav2d"})
+        # Expand to show all flights, then wait for the extra flights to appear
+        expand_button = driver.execute_script("return document.querySelector('div.zISZ5c.QB2Jof')")
         
-        logging.info("Found %d flights" % len(flights))
-        
-        departure_airports = soup.select("div.G2WY5c.sSHqwe.ogfYpf.tPgKwe")
-        arrival_airports = soup.select("div.c8rWCd.sSHqwe.ogfYpf.tPgKwe")
-        
-        departure_times = soup.select("div.wtdjmc.YMlIz.ogfYpf.tPgKwe")
-        arrival_times = soup.select("div.XWcVob.YMlIz.ogfYpf.tPgKwe")
-
-        price_expr = re.compile("\$(\d+,?\d+)")
-        prices = soup.select("div.BVAVmf.I11szd.Qr8X4d")
-        
-        for departing_airport, arriving_airport, departure_time, arrival_time, price in zip(departure_airports, arrival_airports, departure_times, arrival_times, prices):
-            departure_time = datetime.strptime(departure_time.text, "%I:%M %p")
-            departure_time = departure_time.replace(day = departure_date.day, month = departure_date.month, year = departure_date.year)
+        if expand_button is not None:
+            num_flights = driver.execute_script("return document.querySelectorAll('li.pIav2d').length")
+            expand_button.click()
             
-            arrival_time = arrival_time.text
-
-            if '+' in arrival_time:
-                arrival_time, added_days = arrival_time.split('+')
-                added_days = int(added_days)
-            else:
-                added_days = 0
-                
-            arrival_time = datetime.strptime(arrival_time, "%I:%M\u202f%p")
-            arrival_time = arrival_time.replace(day = departure_date.day + added_days, month = departure_date.month, year = departure_date.year)
+            if not self._wait_for_flights(more_than = num_flights, timeout = self.expand_timeout, step = "expand"):
+                logger.warning("Only %d flights were shown for %s", num_flights, query)
+        
+        with self.metrics.timer("page_source"):
+            return driver.page_source
     
-            matches = re.findall(price_expr, price.text)
-            price = int(matches[0].replace(',', '')) if matches else None
-            
-            yield (departing_airport.text, arriving_airport.text), (departure_time, arrival_time), price
\ No newline at end of file
+    def _search(
+        self,
+        departing_from: Union[str, list[str]],
+        arriving_to: Union[str, list[str]],
+        departure_date: datetime,
+        trip: TripType = TripType.ROUNDTRIP,
+        flight_class: FlightClass = FlightClass.ECONOMY,
+        return_date: Optional[datetime] = None,
+        adults: int = 1,
+        children: int = 0,
+        infants_in_seat: int = 0,
+        infants_on_lap: int = 0,
+    ):
+        with self.metrics.timer("fetch"):
+            page = self._fetch(
+                departing_from = departing_from,
+                arriving_to = arriving_to,
+                departure_date = departure_date,
+                trip = trip,
+                flight_class = flight_class,
+                return_date = return_date,
+                adults = adults,
+                children = children,
+                infants_in_seat = infants_in_seat,
+                infants_on_lap = infants_on_lap,
+            )
+        
+        with self.metrics.timer("parse"):
+            flights = parse_flights(page, departure_date)
+        
+        yield from to_rows(flights)
@@ -0,0 +1,111 @@
+from planner.query import Query, encode_rows, decode_rows, encode_fares, decode_fares
+
+from datetime import timedelta
+from typing import Optional
+from threading import Lock
+
+import logging
+import sqlite3
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Date picker fares are kept alongside search results, under keys which can't be mistaken for a search
+CALENDAR_PREFIX = "calendar:"
+
+class QueryCache:
+    """A persistent store of search results, keyed by the normalized query"""
+    
+    def __init__(
+        self,
+        filepath: str,
+        ttl: timedelta = timedelta(hours = 1),
+        max_size: int = 256 * 1024 * 1024,
+    ):
+        self.filepath = filepath
+        self.ttl = ttl
+        self.max_size = max_size
+        
+        directory = os.path.dirname(filepath)
+        
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        
+        # Pooled browsers share one cache, so serialize access to the connection
+        self.lock = Lock()
+        self.connection = sqlite3.connect(filepath, check_same_thread = False)
+        
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, "
+                "created REAL NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "rows TEXT NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+    
+    def get(self, query: Query) -> Optional[list]:
+        encoded = self._get(query.key())
+        return None if encoded is None else decode_rows(encoded)
+    
+    def put(self, query: Query, rows: list):
+        self._put(query.key(), encode_rows(rows))
+    
+    def get_fares(self, query: Query) -> Optional[dict]:
+        encoded = self._get(CALENDAR_PREFIX + query.key())
+        return None if encoded is None else decode_fares(encoded)
+    
+    def put_fares(self, query: Query, fares: dict):
+        self._put(CALENDAR_PREFIX + query.key(), encode_fares(fares))
+    
+    def _get(self, key: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT rows FROM results WHERE key = ? AND created >= ?",
+                (key, time.time() - self.ttl.total_seconds()),
+            ).fetchone()
+        
+        return None if row is None else json.loads(row[0])
+    
+    def _put(self, key: str, encoded):
+        payload = json.dumps(encoded)
+        
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (key, created, size, rows) VALUES (?, ?, ?, ?)",
+                (key, time.time(), len(payload), payload),
+            )
+            
+            self._evict()
+    
+    def _evict(self):
+        # Drop everything which is no longer fresh
+        self.connection.execute(
+            "DELETE FROM results WHERE created < ?",
+            (time.time() - self.ttl.total_seconds(),),
+        )
+        
+        # Then drop the oldest entries until the cache fits within its size limit
+        total_size, = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        
+        if total_size <= self.max_size:
+            return
+        
+        evicted = 0
+        
+        for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY created").fetchall():
+            if total_size <= self.max_size:
+                break
+            
+            self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+            total_size -= size
+            evicted += 1
+        
+        logger.info("Evicted %d cached searches to stay within %d bytes", evicted, self.max_size)
+    
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,234 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Union
+
+import numpy as np
+
+# Shape of the Earth, for the observer's position in the fundamental plane
+EQUATORIAL_RADIUS_METERS = 6378140.0
+POLAR_RATIO = 0.99664719
+
+# Rotation of the Earth in degrees for every second of difference between
+# terrestrial and universal time
+ROTATION_PER_SECOND = 0.00417807
+
+@dataclass(frozen = True)
+class BesselianElements:
+    """The shadow of the Moon on the fundamental plane, as polynomials in hours from `t0` in terrestrial time"""
+    t0: datetime
+    delta_t: float
+    x: tuple[float, ...]
+    y: tuple[float, ...]
+    d: tuple[float, ...]
+    mu: tuple[float, ...]
+    l1: tuple[float, ...]
+    l2: tuple[float, ...]
+    tan_f1: float
+    tan_f2: float
+
+# The total solar eclipse of April 8, 2024, as published by NASA
+APRIL_8_2024 = BesselianElements(
+    t0 = datetime(2024, 4, 8, 18),
+    delta_t = 69.1,
+    x = (-0.318157, 0.5117105, 0.0000326, -0.0000085),
+    y = (0.219747, 0.2709586, -0.0000595, -0.0000047),
+    d = (7.5862, 0.014844, -0.000002),
+    mu = (89.59122, 15.004080),
+    l1 = (0.535813, 0.0000618, -0.0000128),
+    l2 = (-0.010274, 0.0000615, -0.0000127),
+    tan_f1 = 0.0046683,
+    tan_f2 = 0.0046450,
+)
+
+def _value(coefficients: tuple[float, ...], t: np.ndarray) -> np.ndarray:
+    return np.polynomial.polynomial.polyval(t, coefficients)
+
+def _rate(coefficients: tuple[float, ...], t: np.ndarray) -> np.ndarray:
+    # Change per hour
+    if len(coefficients) < 2:
+        return np.zeros_like(t)
+    
+    return np.polynomial.polynomial.polyval(t, np.polynomial.polynomial.polyder(coefficients))
+
+class _Observers:
+    """Where a set of observers are in the fundamental plane, and where the shadow is relative to them, at times `t`"""
+    
+    def __init__(self, elements: BesselianElements, latitude: np.ndarray, longitude: np.ndarray, height: np.ndarray):
+        self.elements = elements
+        
+        # Geocentric position of each observer
+        phi = np.radians(latitude)
+        u = np.arctan(POLAR_RATIO * np.tan(phi))
+        
+        self.rho_sin = POLAR_RATIO * np.sin(u) + height / EQUATORIAL_RADIUS_METERS * np.sin(phi)
+        self.rho_cos = np.cos(u) + height / EQUATORIAL_RADIUS_METERS * np.cos(phi)
+        self.longitude = longitude
+    
+    def at(self, t: np.ndarray) -> dict[str, np.ndarray]:
+        elements = self.elements
+        
+        d = np.radians(_value(elements.d, t))
+        d_rate = np.radians(_rate(elements.d, t))
+        mu_rate = np.radians(_rate(elements.mu, t))
+        
+        # Hour angle of the shadow's axis at each observer, with longitudes east of Greenwich positive
+        h = np.radians(_value(elements.mu, t) + self.longitude - ROTATION_PER_SECOND * elements.delta_t)
+        
+        xi = self.rho_cos * np.sin(h)
+        eta = self.rho_sin * np.cos(d) - self.rho_cos * np.cos(h) * np.sin(d)
+        zeta = self.rho_sin * np.sin(d) + self.rho_cos * np.cos(h) * np.cos(d)
+        
+        xi_rate = mu_rate * self.rho_cos * np.cos(h)
+        eta_rate = mu_rate * xi * np.sin(d) - zeta * d_rate
+        
+        # The shadow's axis relative to the observer, and how fast it moves past them
+        u = _value(elements.x, t) - xi
+        v = _value(elements.y, t) - eta
+        a = _rate(elements.x, t) - xi_rate
+        b = _rate(elements.y, t) - eta_rate
+        
+        return dict(
+            u = u, v = v, a = a, b = b, n2 = a * a + b * b, zeta = zeta,
+            # Radii of the penumbra and umbra where the observer stands, the umbra's being negative for a total eclipse
+            l1 = _value(elements.l1, t) - zeta * elements.tan_f1,
+            l2 = _value(elements.l2, t) - zeta * elements.tan_f2,
+        )
+
+def _maximum(observers: _Observers, t: np.ndarray, iterations: int) -> np.ndarray:
+    # Each step moves to when the shadow's axis is closest to the observer
+    for _ in range(iterations):
+        shadow = observers.at(t)
+        t = t - (shadow["u"] * shadow["a"] + shadow["v"] * shadow["b"]) / shadow["n2"]
+    
+    return t
+
+def _contact(observers: _Observers, t: np.ndarray, radius: str, sign: int, iterations: int) -> np.ndarray:
+    # Each step moves to when the edge of the shadow touches the observer, before
+    # the maximum for a sign of -1 and after it for +1
+    for _ in range(iterations):
+        shadow = observers.at(t)
+        n = np.sqrt(shadow["n2"])
+        r = np.abs(shadow[radius])
+        
+        delta = (shadow["u"] * shadow["b"] - shadow["v"] * shadow["a"]) / n
+        
+        with np.errstate(invalid = "ignore"):
+            t = t - (shadow["u"] * shadow["a"] + shadow["v"] * shadow["b"]) / shadow["n2"] + sign * r / n * np.sqrt(1 - (delta / r) ** 2)
+    
+    return t
+
+def _to_times(elements: BesselianElements, t: np.ndarray) -> np.ndarray:
+    # Hours from t0 in terrestrial time, to universal time to the nearest second
+    seconds = np.round(t * 3600 - elements.delta_t)
+    times = np.datetime64(elements.t0, "s") + np.where(np.isnan(seconds), 0, seconds).astype("timedelta64[s]")
+    
+    return np.where(np.isnan(seconds), np.datetime64("NaT"), times)
+
+def contact_times(
+    latitude: Union[float, np.ndarray],
+    longitude: Union[float, np.ndarray],
+    height: Union[float, np.ndarray] = 0.0,
+    elements: BesselianElements = APRIL_8_2024,
+    iterations: int = 5,
+) -> dict[str, np.ndarray]:
+    """When the eclipse begins, is at its greatest and ends for observers at each latitude and longitude, in UTC
+    
+    Returns the first to fourth contacts `c1` to `c4`, the `maximum`, its `magnitude` and
+    `altitude` in degrees, and the `duration` of totality. Contacts which don't happen,
+    such as totality outside of the path, are NaT, as is every time for observers who
+    see no eclipse at all.
+    """
+    latitude, longitude, height = np.broadcast_arrays(*(np.asarray(value, dtype = float) for value in (latitude, longitude, height)))
+    observers = _Observers(elements, latitude, longitude, height)
+    
+    maximum = _maximum(observers, np.zeros(latitude.shape), iterations)
+    shadow = observers.at(maximum)
+    
+    # How far the observer is from the shadow's axis. Observers on the far side of
+    # the Earth can line up with the shadow too, but with the Sun below their horizon.
+    distance = np.hypot(shadow["u"], shadow["v"])
+    is_partial = (distance < shadow["l1"]) & (shadow["zeta"] > 0)
+    is_total = is_partial & (shadow["l2"] < 0) & (distance < np.abs(shadow["l2"]))
+    
+    maximum = np.where(is_partial, maximum, np.nan)
+    
+    contacts = dict(
+        c1 = np.where(is_partial, _contact(observers, maximum, "l1", -1, iterations), np.nan),
+        c2 = np.where(is_total, _contact(observers, maximum, "l2", -1, iterations), np.nan),
+        c3 = np.where(is_total, _contact(observers, maximum, "l2", 1, iterations), np.nan),
+        c4 = np.where(is_partial, _contact(observers, maximum, "l1", 1, iterations), np.nan),
+    )
+    
+    duration = np.where(is_total, contacts["c3"] - contacts["c2"], 0.0)
+    
+    return dict(
+        **{name: _to_times(elements, t) for name, t in contacts.items()},
+        maximum = _to_times(elements, maximum),
+        magnitude = np.where(is_partial, (shadow["l1"] - distance) / (shadow["l1"] + shadow["l2"]), 0.0),
+        # How far the observer is above the fundamental plane gives the Sun's altitude, near enough
+        altitude = np.degrees(np.arcsin(np.clip(shadow["zeta"], -1, 1))),
+        duration = np.round(duration * 3600).astype("timedelta64[s]"),
+    )
+
+def central_line(elements: BesselianElements = APRIL_8_2024, step: float = 60.0) -> tuple[np.ndarray, np.ndarray]:
+    """Latitudes and longitudes where the shadow's axis meets the Earth, every `step` seconds, in order"""
+    t = np.arange(-3 * 3600, 3 * 3600 + step, step) / 3600
+    
+    x = _value(elements.x, t)
+    y = _value(elements.y, t)
+    d = np.radians(_value(elements.d, t))
+    
+    # Stretching the polar axis turns the Earth into a unit sphere, on which the axis meets a
+    # circle of radius sqrt(1 - x^2) across the plane through it, along the line where η = y
+    normal = np.stack((-np.sin(d), POLAR_RATIO * np.cos(d)))
+    length = np.hypot(*normal)
+    
+    with np.errstate(invalid = "ignore"):
+        along = np.sqrt(1 - x ** 2 - (y / length) ** 2)
+    
+    # Of the two crossings, the one facing the Sun
+    tangent = np.stack((POLAR_RATIO * np.cos(d), np.sin(d))) / length
+    foot = normal * y / length ** 2
+    
+    q, p = foot + tangent * along
+    q_far, p_far = foot - tangent * along
+    
+    use_far = POLAR_RATIO * p_far * np.sin(d) + q_far * np.cos(d) > POLAR_RATIO * p * np.sin(d) + q * np.cos(d)
+    q, p = np.where(use_far, q_far, q), np.where(use_far, p_far, p)
+    
+    # Back to latitude and longitude, east of Greenwich positive
+    hour_angle = np.degrees(np.arctan2(x, q))
+    reduced_latitude = np.arctan2(p, np.hypot(x, q))
+    
+    latitude = np.degrees(np.arctan(np.tan(reduced_latitude) / POLAR_RATIO))
+    longitude = (hour_angle - _value(elements.mu, t) + ROTATION_PER_SECOND * elements.delta_t + 180) % 360 - 180
+    
+    hits = ~np.isnan(along)
+    return latitude[hits], longitude[hits]
+
+def path_of_totality(
+    elements: BesselianElements = APRIL_8_2024,
+    step: float = 15.0,
+    spacing: float = 5.0,
+    half_width: float = 300.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Latitudes and longitudes about `spacing` kilometers apart which cover the path of totality"""
+    latitude, longitude = central_line(elements, step)
+    
+    # Direction of travel along the central line, and across it
+    phi, lam = np.radians(latitude), np.radians(longitude)
+    bearing = np.arctan2(np.gradient(np.unwrap(lam)) * np.cos(phi), np.gradient(phi))
+    across = bearing[:, None] + np.pi / 2
+    
+    # Points either side of the central line, wider than the path ever is
+    distances = np.arange(-half_width, half_width + spacing, spacing)[None, :] / EQUATORIAL_RADIUS_METERS * 1000
+    phi, lam = phi[:, None], lam[:, None]
+    
+    sides_phi = np.arcsin(np.sin(phi) * np.cos(distances) + np.cos(phi) * np.sin(distances) * np.cos(across))
+    sides_lam = lam + np.arctan2(np.sin(across) * np.sin(distances) * np.cos(phi), np.cos(distances) - np.sin(phi) * np.sin(sides_phi))
+    
+    latitude, longitude = np.degrees(sides_phi).ravel(), (np.degrees(sides_lam).ravel() + 180) % 360 - 180
+    
+    # Keep those from which totality is seen
+    total = contact_times(latitude, longitude, elements = elements)["duration"] > np.timedelta64(0, "s")
+    return latitude[total], longitude[total]
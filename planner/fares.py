@@ -0,0 +1,55 @@
+from planner.api import BaseAPI
+from planner.query import Query
+
+from collections import defaultdict
+from typing import Iterable
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FareFilter:
+    """Leaves out searches whose cheapest fare, as shown by the date picker, is over budget"""
+    
+    def __init__(self, api: BaseAPI, budget: int, min_dates: int = 2):
+        self.api = api
+        self.budget = budget
+        
+        # A date picker takes about as long to load as a results page, so it is
+        # only worth opening for routes searched on at least this many days
+        self.min_dates = min_dates
+    
+    def filter(self, queries: Iterable[Query]) -> list[Query]:
+        """The queries worth searching in full, in the order they were given"""
+        queries = list(queries)
+        
+        # The same airports searched on different days
+        routes = defaultdict(list)
+        
+        for query in queries:
+            routes[query.route_key()].append(query)
+        
+        # One date picker shows the fares for every day of a route, and opens on
+        # the month of the day it was searched for
+        calendars = [
+            min(route, key = lambda query: query.departure_date)
+            for route in routes.values()
+            if len(route) >= self.min_dates
+        ]
+        
+        fares = {query.route_key(): days for query, days in self.api.cheapest_fares(calendars)}
+        
+        kept = []
+        
+        for query in queries:
+            fare = fares.get(query.route_key(), {}).get(query.departure_date)
+            
+            # Days without a fare may just not have loaded, so they are still searched
+            if fare is not None and fare > self.budget:
+                logger.info("Skipping %s, whose cheapest fare of $%d is over budget", query, fare)
+                self.api.metrics.increment("searches_over_budget")
+                continue
+            
+            kept.append(query)
+        
+        return kept
@@ -1,35 +1,84 @@
 from planner.enums import FlightDirection
 
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import sys
+
+class SharedValues:
+    """
+    Times and leeways repeat across many flights, so flights made with the same
+    shared values reuse the first copy of each value instead of keeping their own.
+    Values are held for as long as this is, so keep one per search or store.
+    """
+    
+    def __init__(self):
+        self.values = {}
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def __call__(self, value):
+        return self.values.setdefault(value, value)
+
+def _field(index: int) -> property:
+    return property(lambda flight: flight.key[index])
 
-@dataclass
 class Flight:
     """A one-way flight"""
-    departure_airport: str
-    arrival_airport: str
-    departure_time: datetime
-    arrival_time: datetime
-    leeway_time: timedelta
-    direction: FlightDirection
-    cost: int
+    __slots__ = ("key", "_hash")
+    
+    # Every field is read from the key, so a flight can't be changed once created
+    departure_airport = _field(0)
+    arrival_airport = _field(1)
+    departure_time = _field(2)
+    arrival_time = _field(3)
+    leeway_time = _field(4)
+    direction = _field(5)
+    cost = _field(6)
+    
+    def __init__(
+        self,
+        departure_airport: str,
+        arrival_airport: str,
+        departure_time: datetime,
+        arrival_time: datetime,
+        leeway_time: timedelta,
+        direction: FlightDirection,
+        cost: int,
+        shared: Optional[SharedValues] = None,
+    ):
+        # Without shared values, each flight keeps the values it was given
+        if shared is not None:
+            departure_time, arrival_time, leeway_time = shared(departure_time), shared(arrival_time), shared(leeway_time)
+        
+        self.key = (sys.intern(departure_airport), sys.intern(arrival_airport),
+                    departure_time, arrival_time, leeway_time, direction, cost)
+        
+        self._hash = hash(self.key)
+    
+    def __reduce__(self):
+        return Flight, self.key
     
     @property
     def travel_time(self) -> timedelta:
         return self.arrival_time - self.departure_time
     
     def __eq__(self, other):
-        return self.departure_airport == other.departure_airport and \
-               self.arrival_airport == other.arrival_airport and \
-               self.departure_time == other.departure_time and \
-               self.arrival_time == other.arrival_time and \
-               self.direction == other.direction and \
-               self.cost == other.cost
-               
+        if self is other:
+            return True
+        
+        if not isinstance(other, Flight):
+            return NotImplemented
+        
+        return self._hash == other._hash and self.key == other.key
+    
     def __hash__(self):
-        return hash((self.departure_airport, self.arrival_airport,
-                     self.departure_time, self.arrival_time, self.leeway_time,
-                     self.direction, self.cost))
+        return self._hash
+    
+    def __repr__(self):
+        fields = ("departure_airport", "arrival_airport", "departure_time", "arrival_time", "leeway_time", "direction", "cost")
+        return "Flight(%s)" % ", ".join(f"{name}={value!r}" for name, value in zip(fields, self.key))
     
     def __str__(self):
         # Format: "on April 8 at 12:00 PM"
@@ -37,13 +86,18 @@ class Flight:
         formatted_arrival_time = self.arrival_time.strftime("%B %-d at %-I:%M %p")
         
         return f"Take a {self.direction.value} flight from {self.departure_airport} on {formatted_departure_time} to {self.arrival_airport}, arriving on {formatted_arrival_time} for a cost of ${self.cost}."
-    
-@dataclass
+
 class RoundTrip:
     """A round trip flight plan for viewing the eclipse"""
-    departing_flight: FlightDirection
-    returning_flight: FlightDirection
-
+    __slots__ = ("departing_flight", "returning_flight", "_hash")
+    
+    def __init__(self, departing_flight: Flight, returning_flight: Flight):
+        self.departing_flight = departing_flight
+        self.returning_flight = returning_flight
+        
+        # Both flights already have their hash, so this only combines the two
+        self._hash = hash((departing_flight._hash, returning_flight._hash))
+    
     @property
     def travel_time(self) -> timedelta:
         return self.departing_flight.travel_time + self.returning_flight.travel_time
@@ -60,8 +114,73 @@ class RoundTrip:
     def cost(self) -> int:
         return self.departing_flight.cost + self.returning_flight.cost
     
+    def __eq__(self, other):
+        if not isinstance(other, RoundTrip):
+            return NotImplemented
+        
+        return self._hash == other._hash and \
+               self.departing_flight == other.departing_flight and \
+               self.returning_flight == other.returning_flight
+    
     def __hash__(self) -> int:
-        return hash((self.departing_flight, self.returning_flight))
+        return self._hash
+    
+    def __repr__(self):
+        return f"RoundTrip(departing_flight={self.departing_flight!r}, returning_flight={self.returning_flight!r})"
     
     def __str__(self):
-        return f"{self.departing_flight} {self.returning_flight} You will have {self.setup_time} to setup and {self.cleanup_time} to cleanup. The total travel time is {self.travel_time} and the total cost of the trip will be ${self.cost}."
\ No newline at end of file
+        return f"{self.departing_flight} {self.returning_flight} You will have {self.setup_time} to setup and {self.cleanup_time} to cleanup. The total travel time is {self.travel_time} and the total cost of the trip will be ${self.cost}."
+
+class Itinerary:
+    """One-way flights taken one after another, changing planes at the airport each lands at"""
+    __slots__ = ("flights",)
+    
+    def __init__(self, flights: Sequence[Flight]):
+        self.flights = tuple(flights)
+    
+    @property
+    def departure_airport(self) -> str:
+        return self.flights[0].departure_airport
+    
+    @property
+    def arrival_airport(self) -> str:
+        return self.flights[-1].arrival_airport
+    
+    @property
+    def departure_time(self) -> datetime:
+        return self.flights[0].departure_time
+    
+    @property
+    def arrival_time(self) -> datetime:
+        return self.flights[-1].arrival_time
+    
+    @property
+    def connection_times(self) -> list[timedelta]:
+        # Both times are local to the airport of the connection
+        return [after.departure_time - before.arrival_time for before, after in zip(self.flights, self.flights[1:])]
+    
+    @property
+    def travel_time(self) -> timedelta:
+        return self.arrival_time - self.departure_time
+    
+    @property
+    def cost(self) -> int:
+        return sum(flight.cost for flight in self.flights)
+    
+    def __eq__(self, other):
+        if not isinstance(other, Itinerary):
+            return NotImplemented
+        
+        return self.flights == other.flights
+    
+    def __hash__(self) -> int:
+        return hash(self.flights)
+    
+    def __repr__(self):
+        return f"Itinerary(flights={list(self.flights)!r})"
+    
+    def __str__(self):
+        connections = ", ".join(str(connection) for connection in self.connection_times)
+        summary = f" You will have {connections} to change planes." if connections else ""
+        
+        return " ".join(str(flight) for flight in self.flights) + summary + f" The total travel time is {self.travel_time} and the total cost of the trip will be ${self.cost}."
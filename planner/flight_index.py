@@ -0,0 +1,98 @@
+from planner.enums import FlightDirection
+from planner.store import SECOND, FlightStore, FlightTable, to_seconds
+
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+
+# The end of each flight at the eclipse, where its leeway is spent
+VIEWING_AIRPORT = {
+    FlightDirection.DEPARTING: "arrival_airport",
+    FlightDirection.RETURNING: "departure_airport",
+}
+
+VIEWING_TIME = {
+    FlightDirection.DEPARTING: "arrival_time",
+    FlightDirection.RETURNING: "departure_time",
+}
+
+class _SortedRuns:
+    """Rows grouped by airport, each group sorted by one column so it can be searched"""
+    
+    def __init__(self, airports: np.ndarray, values: np.ndarray, num_airports: int):
+        self.order = np.lexsort((values, airports))
+        self.values = values[self.order]
+        
+        counts = np.bincount(airports, minlength = num_airports)
+        self.ends = np.cumsum(counts)
+        self.starts = self.ends - counts
+    
+    def rows(self, codes: Iterable[int], low: Optional[int], high: Optional[int]) -> np.ndarray:
+        """Rows of the airports whose value is within [low, high]"""
+        runs = []
+        
+        for code in codes:
+            first = self.starts[code]
+            values = self.values[first:self.ends[code]]
+            
+            start = first + (np.searchsorted(values, low, side = "left") if low is not None else 0)
+            end = first + (np.searchsorted(values, high, side = "right") if high is not None else len(values))
+            
+            if start < end:
+                runs.append(self.order[start:end])
+        
+        return np.concatenate(runs) if runs else np.empty(0, dtype = np.int64)
+
+class FlightIndex:
+    """Flights of a store sorted by leeway and time at each eclipse viewing airport"""
+    
+    def __init__(self, store: FlightStore):
+        self.store = store
+        self.tables = {FlightDirection.DEPARTING: store.departing, FlightDirection.RETURNING: store.returning}
+        
+        self.by_leeway = {}
+        self.by_time = {}
+        
+        for direction, table in self.tables.items():
+            airports = table[VIEWING_AIRPORT[direction]].astype(np.int64)
+            
+            self.by_leeway[direction] = _SortedRuns(airports, np.asarray(table["leeway_time"]), len(store.airports))
+            self.by_time[direction] = _SortedRuns(airports, np.asarray(table[VIEWING_TIME[direction]]), len(store.airports))
+    
+    def query(
+        self,
+        direction: FlightDirection,
+        airports: Optional[Iterable[str]] = None,
+        leeway_range: tuple[Optional[timedelta], Optional[timedelta]] = (None, None),
+        time_range: tuple[Optional[datetime], Optional[datetime]] = (None, None),
+        max_cost: Optional[int] = None,
+    ) -> FlightTable:
+        """Flights at any of the airports with a leeway and time there within the ranges, where None is unlimited"""
+        table = self.tables[direction]
+        
+        if airports is None:
+            codes = range(len(self.store.airports))
+        else:
+            codes = [self.store.codes[airport] for airport in airports if airport in self.store.codes]
+        
+        min_leeway, max_leeway = (None if leeway is None else leeway // SECOND for leeway in leeway_range)
+        earliest, latest = (None if time is None else to_seconds(time) for time in time_range)
+        
+        # Search whichever column was limited, and check the other on the rows found
+        if min_leeway is not None or max_leeway is not None:
+            rows = self.by_leeway[direction].rows(codes, min_leeway, max_leeway)
+            times = table[VIEWING_TIME[direction]][rows]
+            
+            if earliest is not None:
+                rows, times = rows[times >= earliest], times[times >= earliest]
+            
+            if latest is not None:
+                rows = rows[times <= latest]
+        else:
+            rows = self.by_time[direction].rows(codes, earliest, latest)
+        
+        if max_cost is not None:
+            rows = rows[table["cost"][rows] <= max_cost]
+        
+        return table.where(np.sort(rows))
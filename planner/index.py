@@ -0,0 +1,180 @@
+from planner.eclipse import contact_times
+from planner.spatial import AirportTree, transfer_areas, with_areas
+
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Union
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Offsets from UTC of the time zones used in the eclipse table
+UTC_OFFSETS = {
+    "HST": -10, "AKST": -9, "AKDT": -8,
+    "PST": -8, "PDT": -7,
+    "MST": -7, "MDT": -6,
+    "CST": -6, "CDT": -5,
+    "EST": -5, "EDT": -4,
+    "AST": -4, "ADT": -3,
+}
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Cities to fly out of which are not in the eclipse table, kept alongside it
+HOMES_FILENAME = "origins.csv"
+
+class ColumnMapping(Mapping):
+    """A read-only mapping from each key to its row of the columns, built when it is looked up"""
+    
+    def __init__(self, rows: dict[str, int], columns: dict[str, np.ndarray]):
+        self._rows = rows
+        self._columns = columns
+    
+    def __getitem__(self, key: str) -> Mapping:
+        row = self._rows[key]
+        return MappingProxyType({name: column[row].item() for name, column in self._columns.items()})
+    
+    def __iter__(self):
+        return iter(self._rows)
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def column(self, name: str) -> np.ndarray:
+        # Values for every key, in the order the keys are iterated
+        return self._columns[name]
+
+def table_times(contacts: Mapping[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Contact times in the form of the eclipse table's partial_begins, maximum and partial_ends columns
+    
+    For cities which see totality, the table gives its start as the maximum and the greatest
+    eclipse as the end, and for the others, the greatest eclipse and the last contact.
+    """
+    is_total = ~np.isnat(contacts["c2"])
+    
+    return dict(
+        partial_begins = contacts["c1"],
+        maximum = np.where(is_total, contacts["c2"], contacts["maximum"]),
+        partial_ends = np.where(is_total, contacts["maximum"], contacts["c4"]),
+    )
+
+@dataclass(frozen = True)
+class AirportIndex:
+    """Everything known about the airports in the eclipse table, loaded once"""
+    origin_cities: tuple[str, ...]
+    origins: tuple[str, ...]
+    targets: tuple[str, ...]
+    events: Mapping[str, Mapping[str, datetime]]
+    locations: Mapping[str, Mapping]
+    city2airports: Mapping[str, tuple[str, ...]]
+    airport2cities: Mapping[str, tuple[str, ...]]
+
+@lru_cache(maxsize = None)
+def load_index(
+    filepath: str,
+    origin_cities: Union[str, tuple[str, ...]] = "Los Angeles",
+    transfer_radius: Optional[float] = None,
+    path_radius: Optional[float] = None,
+) -> AirportIndex:
+    if isinstance(origin_cities, str):
+        origin_cities = (origin_cities,)
+    
+    df = pd.read_csv(filepath, usecols = ["city", "latitude", "longitude", "airports", "tz",
+                                          "partial_begins", "maximum", "partial_ends"])
+    
+    # Parse every time in the table at once
+    for column in ("partial_begins", "maximum", "partial_ends"):
+        df[column] = pd.to_datetime(df[column], format = TIME_FORMAT)
+    
+    df["viewing"] = True
+    
+    # Home cities outside of the eclipse table only need a location, and never
+    # have an eclipse to view
+    homes_filepath = os.path.join(os.path.dirname(filepath), HOMES_FILENAME)
+    
+    if os.path.exists(homes_filepath):
+        homes = pd.read_csv(homes_filepath, usecols = ["city", "latitude", "longitude", "airports", "tz"])
+        homes = homes[~homes["city"].isin(df["city"])].assign(viewing = False)
+        
+        df = pd.concat([df, homes], ignore_index = True)
+    
+    for origin_city in origin_cities:
+        if not (df["city"] == origin_city).any():
+            raise ValueError(f"{origin_city} is not in {filepath} or {homes_filepath}.")
+    
+    df["utc_offset"] = pd.to_timedelta(df["tz"].map(UTC_OFFSETS), unit = "h")
+    
+    # Cities in the eclipse table without their times, such as airports added with only a
+    # location, have them worked out from the eclipse's Besselian elements. Times in the
+    # table are kept as they are, since they were looked up for each city.
+    missing = df["viewing"] & df[["partial_begins", "maximum", "partial_ends"]].isna().any(axis = 1)
+    
+    if missing.any():
+        contacts = contact_times(df.loc[missing, "latitude"].to_numpy(), df.loc[missing, "longitude"].to_numpy())
+        offsets = df.loc[missing, "utc_offset"].to_numpy()
+        
+        for column, times in table_times(contacts).items():
+            df.loc[missing, column] = times + offsets
+    
+    # One row for each (city, airport) pair, in the order they appear
+    df["airport"] = df["airports"].str.split()
+    pairs = df.explode("airport", ignore_index = True)
+    
+    city2airports = dict(zip(df["city"].tolist(), map(tuple, df["airport"].tolist())))
+    airport2cities = {}
+    
+    for city, airport in zip(pairs["city"].tolist(), pairs["airport"].tolist()):
+        airport2cities[airport] = airport2cities.get(airport, ()) + (city,)
+    
+    # An airport shared by several cities takes its times and location from the first
+    first = pairs.drop_duplicates("airport")
+    rows = dict(zip(first["airport"].tolist(), range(len(first))))
+    
+    # Only airports which see the eclipse have its times, so that looking them up for
+    # any other airport, such as a home airport, fails instead of giving None
+    seen = pairs["viewing"] & pairs[["partial_begins", "maximum", "partial_ends"]].notna().all(axis = 1)
+    viewed = pairs[seen].drop_duplicates("airport")
+    
+    events = ColumnMapping(dict(zip(viewed["airport"].tolist(), range(len(viewed)))), dict(
+        start = viewed["partial_begins"].to_numpy().astype("datetime64[us]"),
+        maximum = viewed["maximum"].to_numpy().astype("datetime64[us]"),
+        end = viewed["partial_ends"].to_numpy().astype("datetime64[us]"),
+    ))
+    
+    locations = ColumnMapping(rows, dict(
+        latitude = first["latitude"].to_numpy(),
+        longitude = first["longitude"].to_numpy(),
+        utc_offset = first["utc_offset"].to_numpy().astype("timedelta64[us]"),
+    ))
+    
+    # Travelers from several cities share one search, so none of their home
+    # airports are searched as a place to view the eclipse
+    origins = tuple(dict.fromkeys(airport for origin_city in origin_cities for airport in city2airports[origin_city]))
+    targets = tuple(airport for airport in events if airport not in origins)
+    
+    if transfer_radius is not None or path_radius is not None:
+        tree = AirportTree.from_locations({airport: locations[airport] for airport in targets})
+        
+        # Only view the eclipse from airports close enough to the path of totality
+        if path_radius is not None:
+            near = tree.near_path(path_radius)
+            targets = tuple(airport for airport in targets if airport in near)
+        
+        # Let trips fly home from any airport a short drive from the one they arrived at,
+        # as well as from those listed for the same city
+        if transfer_radius is not None:
+            city2airports, airport2cities = with_areas(city2airports, airport2cities, transfer_areas(tree, transfer_radius))
+    
+    return AirportIndex(
+        origin_cities = origin_cities,
+        origins = origins,
+        targets = targets,
+        events = events,
+        locations = locations,
+        city2airports = MappingProxyType(city2airports),
+        airport2cities = MappingProxyType(airport2cities),
+    )
@@ -0,0 +1,273 @@
+from planner.flight import Flight, Itinerary
+from planner.store import SECOND, FlightStore, FlightTable, to_seconds
+
+from datetime import datetime, timedelta
+from typing import Iterable, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+# Times are combined with their airport into one sortable key, so legs at every
+# airport can be searched at once. Seconds since 1970 fit well within 40 bits.
+TIME_BITS = 40
+
+# Later than any time in seconds and more than any itinerary costs in dollars, for what can't be reached
+UNREACHABLE = 2 ** TIME_BITS
+
+def _keys(airports: np.ndarray, times: np.ndarray) -> np.ndarray:
+    return (airports.astype(np.int64) << TIME_BITS) + times
+
+def _first_of_runs(values: np.ndarray) -> np.ndarray:
+    """Positions where each run of equal values begins"""
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]]) if len(values) else np.empty(0, dtype = np.int64)
+
+class LegIndex:
+    """One-way flights indexed by where and when they land, for connecting them into itineraries
+    
+    Every table must come from the same store, so that their airport codes agree. Times are
+    local to each airport, which is all a connection needs, since both of its flights are
+    timed at the airport of the connection.
+    """
+    
+    def __init__(self, tables: Sequence[FlightTable]):
+        self.tables = list(tables)
+        self.airports = self.tables[0].airports if self.tables else np.empty(0, dtype = str)
+        self.codes = {airport: code for code, airport in enumerate(self.airports.tolist())}
+        
+        # Legs of every table one after another, remembering where each table begins
+        self.offsets = np.cumsum([0] + [len(table) for table in self.tables])
+        
+        def column(name: str) -> np.ndarray:
+            columns = [np.asarray(table[name], dtype = np.int64) for table in self.tables]
+            return np.concatenate(columns) if columns else np.empty(0, dtype = np.int64)
+        
+        self.departure_airport = column("departure_airport")
+        self.arrival_airport = column("arrival_airport")
+        self.departure_time = column("departure_time")
+        self.arrival_time = column("arrival_time")
+        self.cost = column("cost")
+        
+        # Legs sorted by the airport they land at and then by when, which makes the legs
+        # which can connect to a departure a run ending just before it
+        self.arrival_order = np.lexsort((self.arrival_time, self.arrival_airport))
+        self.arrival_keys = _keys(self.arrival_airport, self.arrival_time)[self.arrival_order]
+        
+        # Lowering the costs of each airport's run below those of every earlier run turns a
+        # running minimum over the sorted order into a running minimum within each run
+        run_begins = np.zeros(len(self.arrival_order), dtype = np.int64)
+        run_begins[_first_of_runs(self.arrival_airport[self.arrival_order])] = 1
+        self.floor = (np.cumsum(run_begins) - 1) * (2 * UNREACHABLE)
+        
+        # Which legs can follow which only depends on the connection time, so it is worked out once for each
+        self.connections = {}
+    
+    @classmethod
+    def from_store(cls, store: FlightStore) -> "LegIndex":
+        """Every flight found by a search, in either direction"""
+        return cls([store.departing, store.returning])
+    
+    def __len__(self) -> int:
+        return len(self.cost)
+    
+    def flight(self, leg: int) -> Flight:
+        table = np.searchsorted(self.offsets, leg, side = "right") - 1
+        return self.tables[table].flight(leg - self.offsets[table])
+    
+    def itinerary(self, legs: Iterable[int]) -> Itinerary:
+        return Itinerary([self.flight(leg) for leg in legs])
+    
+    def _airport_mask(self, airports: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(len(self.airports), dtype = bool)
+        mask[[self.codes[airport] for airport in airports if airport in self.codes]] = True
+        
+        return mask
+    
+    def _deadlines(self, destinations: Iterable[str], deadline: Union[None, datetime, Mapping[str, datetime]]) -> dict[int, int]:
+        # The latest arrival at each destination, in its own local time
+        deadlines = {}
+        
+        for airport in destinations:
+            if airport not in self.codes:
+                continue
+            
+            if isinstance(deadline, Mapping):
+                time = deadline.get(airport)
+            else:
+                time = deadline
+            
+            deadlines[self.codes[airport]] = UNREACHABLE if time is None else to_seconds(time)
+        
+        return deadlines
+    
+    def _arrivals(self, code: int, latest: int) -> np.ndarray:
+        """Legs landing at an airport by a time, soonest first"""
+        start = np.searchsorted(self.arrival_keys, code << TIME_BITS, side = "left")
+        end = np.searchsorted(self.arrival_keys, (code << TIME_BITS) + min(latest, UNREACHABLE - 1), side = "right")
+        
+        return self.arrival_order[start:end]
+    
+    def _connections(self, min_connection: timedelta) -> tuple[np.ndarray, np.ndarray]:
+        # Each leg can follow the legs landing at its airport at least `min_connection` before it
+        # takes off, which are the run in the sorted order up to and including the position found
+        if min_connection not in self.connections:
+            departure_keys = _keys(self.departure_airport, self.departure_time - min_connection // SECOND)
+            latest = np.searchsorted(self.arrival_keys, departure_keys, side = "right") - 1
+            
+            can_connect = latest >= 0
+            can_connect[can_connect] = self.arrival_airport[self.arrival_order[latest[can_connect]]] == self.departure_airport[can_connect]
+            
+            self.connections[min_connection] = np.where(can_connect, latest, 0), can_connect
+        
+        return self.connections[min_connection]
+    
+    def _first_legs(self, origins: Iterable[str], depart_after: Optional[datetime]) -> np.ndarray:
+        first = self._airport_mask(origins)[self.departure_airport]
+        
+        if depart_after is not None:
+            first &= self.departure_time >= to_seconds(depart_after)
+        
+        return first
+    
+    def earliest_arrivals(
+        self,
+        origins: Iterable[str],
+        destinations: Iterable[str],
+        depart_after: Optional[datetime] = None,
+        deadline: Union[None, datetime, Mapping[str, datetime]] = None,
+        min_connection: timedelta = timedelta(hours = 2),
+        max_legs: int = 3,
+    ) -> dict[str, Itinerary]:
+        """The itinerary from any origin which lands at each destination soonest, for those it lands at by the deadline
+        
+        `deadline` may be one time, or the time for each destination. A connection needs
+        at least `min_connection` between landing and taking off again, and an itinerary
+        has at most `max_legs` flights, which must be at least 1.
+        """
+        if max_legs < 1:
+            raise ValueError("At least one leg is required.")
+        
+        first = self._first_legs(origins, depart_after)
+        is_origin = self._airport_mask(origins)
+        
+        connection = min_connection // SECOND
+        order = self.arrival_order
+        
+        # The soonest each airport can be reached with at most k legs, and the leg which reached
+        # it, or -1 where it was reached as soon with fewer. Each round only extends the itineraries
+        # of the round before, so every itinerary found has at most `max_legs` legs.
+        arrivals = [np.where(is_origin, -UNREACHABLE, UNREACHABLE)]
+        via = [np.full(len(self.airports), -1, dtype = np.int64)]
+        
+        for _ in range(max_legs):
+            # Legs from an origin need no connection, only to leave after `depart_after`
+            ready = arrivals[-1] + connection
+            boardable = np.where(is_origin[self.departure_airport], first, self.departure_time >= ready[self.departure_airport])
+            
+            # Legs are sorted by landing time at each airport, so the first boardable one at each is the soonest
+            rows = order[boardable[order]]
+            rows = rows[_first_of_runs(self.arrival_airport[rows])]
+            
+            airports = self.arrival_airport[rows]
+            improved = self.arrival_time[rows] < arrivals[-1][airports]
+            
+            arrival = arrivals[-1].copy()
+            leg = np.full(len(self.airports), -1, dtype = np.int64)
+            
+            arrival[airports[improved]] = self.arrival_time[rows[improved]]
+            leg[airports[improved]] = rows[improved]
+            
+            arrivals.append(arrival)
+            via.append(leg)
+            
+            if not improved.any():
+                break
+        
+        itineraries = {}
+        
+        for code, latest in self._deadlines(destinations, deadline).items():
+            if is_origin[code] or arrivals[-1][code] >= UNREACHABLE or arrivals[-1][code] > latest:
+                continue
+            
+            # Walk back through the rounds to the leg which reached each airport, which is
+            # in the last round that improved on it. Origins are never improved on.
+            legs = []
+            airport, k = code, len(via) - 1
+            
+            while k > 0:
+                if via[k][airport] < 0:
+                    k -= 1
+                    continue
+                
+                legs.append(via[k][airport])
+                airport, k = self.departure_airport[via[k][airport]], k - 1
+            
+            itineraries[str(self.airports[code])] = self.itinerary(reversed(legs))
+        
+        return itineraries
+    
+    def cheapest(
+        self,
+        origins: Iterable[str],
+        destinations: Iterable[str],
+        depart_after: Optional[datetime] = None,
+        deadline: Union[None, datetime, Mapping[str, datetime]] = None,
+        min_connection: timedelta = timedelta(hours = 2),
+        max_legs: int = 3,
+    ) -> dict[str, Itinerary]:
+        """The cheapest itinerary from any origin to each destination which lands there by the deadline
+        
+        Of itineraries which cost the same, the one which lands soonest is chosen.
+        """
+        if max_legs < 1:
+            raise ValueError("At least one leg is required.")
+        
+        order, floor = self.arrival_order, self.floor
+        previous, can_connect = self._connections(min_connection)
+        
+        # The cheapest cost to have flown each leg with at most k legs, and the leg before it, or -1 for a first leg
+        costs = [np.where(self._first_legs(origins, depart_after), self.cost, UNREACHABLE)]
+        before = [np.full(len(self), -1, dtype = np.int64)]
+        
+        positions = np.arange(len(order))
+        
+        for _ in range(max_legs - 1):
+            sorted_costs = costs[-1][order]
+            lowered = sorted_costs - floor
+            
+            # The cheapest leg landing at each airport so far, and where it is in the sorted order,
+            # the latest one of any which cost the same
+            cheapest = np.minimum.accumulate(lowered)
+            cheapest_at = np.maximum.accumulate(np.where(lowered == cheapest, positions, 0))
+            
+            reachable = can_connect & (cheapest[previous] + floor[previous] < UNREACHABLE)
+            
+            cost = np.where(reachable, cheapest[previous] + floor[previous] + self.cost, UNREACHABLE)
+            improved = cost < costs[-1]
+            
+            costs.append(np.where(improved, cost, costs[-1]))
+            before.append(np.where(improved, order[cheapest_at[previous]], before[-1]))
+            
+            if not improved.any():
+                break
+        
+        itineraries = {}
+        
+        for code, latest_arrival in self._deadlines(destinations, deadline).items():
+            rows = self._arrivals(code, latest_arrival)
+            rows = rows[costs[-1][rows] < UNREACHABLE]
+            
+            if not len(rows):
+                continue
+            
+            # Cheapest first, then soonest
+            leg = rows[np.lexsort((self.arrival_time[rows], costs[-1][rows]))[0]]
+            
+            legs = []
+            k = len(before) - 1
+            
+            while leg >= 0:
+                legs.append(leg)
+                leg, k = before[k][leg], k - 1
+            
+            itineraries[str(self.airports[code])] = self.itinerary(reversed(legs))
+        
+        return itineraries
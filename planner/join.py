@@ -0,0 +1,152 @@
+from planner.enums import FlightDirection
+from planner.store import SECOND, FlightTable
+
+from datetime import timedelta
+from typing import Generator, Iterable, Mapping, Optional
+
+import numpy as np
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """For each group of `counts[i]` rows beginning at `starts[i]`, pair `i` with every row in its group"""
+    owners = np.repeat(np.arange(len(counts)), counts)
+    
+    # Position of each pairing within its group
+    offsets = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+    
+    return owners, np.repeat(starts, counts) + offsets
+
+def _group(keys: np.ndarray, num_keys: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort rows by key, returning the order along with where each key's rows begin and how many there are"""
+    order = np.argsort(keys, kind = "stable")
+    counts = np.bincount(keys, minlength = num_keys)
+    starts = np.cumsum(counts) - counts
+    
+    return order, starts, counts
+
+def city_mates(
+    airports: np.ndarray,
+    codes: Mapping[str, int],
+    city2airports: Mapping[str, tuple[str, ...]],
+    airport2cities: Mapping[str, tuple[str, ...]],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Pairs of airport codes which share a city, so that we can arrive at one and leave from the other"""
+    sources = []
+    targets = []
+    
+    for code, airport in enumerate(airports.tolist()):
+        mates = set()
+        
+        for city in airport2cities.get(airport, ()):
+            mates.update(city2airports[city])
+        
+        for mate in mates:
+            if mate in codes:
+                sources.append(code)
+                targets.append(codes[mate])
+    
+    return np.array(sources, dtype = np.int64), np.array(targets, dtype = np.int64)
+
+def leeway_mask(table: FlightTable, minimum: Optional[timedelta], maximum: Optional[timedelta]) -> np.ndarray:
+    """Which flights in the table have a leeway time within the bounds"""
+    values = table["leeway_time"]
+    mask = np.ones(len(values), dtype = bool)
+    
+    if minimum is not None:
+        mask &= values >= minimum // SECOND
+    
+    if maximum is not None:
+        mask &= values <= maximum // SECOND
+    
+    return mask
+
+def home_cities(departing: FlightTable, airport2cities: Mapping[str, tuple[str, ...]]) -> list[str]:
+    """Cities the departing flights leave from, since a search can be shared by travelers from several"""
+    airports = departing.airports[np.unique(departing["departure_airport"])]
+    return list(dict.fromkeys(city for airport in airports.tolist() for city in airport2cities.get(airport, ())))
+
+def home_rows(table: FlightTable, home_airports: Iterable[str]) -> np.ndarray:
+    """Rows of the flights which leave from any of a traveler's home airports, or return to one"""
+    column = "departure_airport" if table.direction == FlightDirection.DEPARTING else "arrival_airport"
+    is_home = np.isin(table.airports, list(home_airports))
+    
+    return np.flatnonzero(is_home[table[column]])
+
+def from_home(departing: FlightTable, returning: FlightTable, home_airports: Iterable[str]) -> tuple[FlightTable, FlightTable]:
+    """The flights of a traveler's trips, leaving from and returning to their home airports"""
+    return departing.where(home_rows(departing, home_airports)), returning.where(home_rows(returning, home_airports))
+
+def iter_round_trips(
+    departing: FlightTable,
+    returning: FlightTable,
+    city2airports: Mapping[str, tuple[str, ...]],
+    airport2cities: Mapping[str, tuple[str, ...]],
+    *,
+    min_setup_time: Optional[timedelta] = None,
+    max_setup_time: Optional[timedelta] = None,
+    min_cleanup_time: Optional[timedelta] = None,
+    max_cleanup_time: Optional[timedelta] = None,
+    chunk_size: int = 1 << 20,
+) -> Generator[tuple[np.ndarray, np.ndarray], None, None]:
+    """Indices of the departing and returning flight of every round trip, about `chunk_size` trips at a time"""
+    num_airports = len(departing.airports)
+    codes = {airport: code for code, airport in enumerate(departing.airports.tolist())}
+    
+    # Only flights with enough time to setup and cleanup can be part of a round trip
+    departing_rows = np.flatnonzero(leeway_mask(departing, min_setup_time, max_setup_time))
+    returning_rows = np.flatnonzero(leeway_mask(returning, min_cleanup_time, max_cleanup_time))
+    
+    # Every airport which shares a city with each airport, grouped by that airport
+    mate_sources, mate_targets = city_mates(departing.airports, codes, city2airports, airport2cities)
+    mate_order, mate_starts, mate_counts = _group(mate_sources, num_airports)
+    mate_targets = mate_targets[mate_order]
+    
+    # Returning flights grouped by the airport they leave from
+    returning_codes = returning["departure_airport"][returning_rows].astype(np.int64)
+    returning_order, returning_starts, returning_counts = _group(returning_codes, num_airports)
+    returning_rows = returning_rows[returning_order]
+    
+    # How many returning flights leave from the city of each airport, and so how many
+    # round trips each departing flight is part of
+    trips_per_airport = np.bincount(mate_sources[mate_order], weights = returning_counts[mate_targets], minlength = num_airports)
+    trips = trips_per_airport.astype(np.int64)[departing["arrival_airport"][departing_rows].astype(np.int64)]
+    
+    departing_rows = departing_rows[trips > 0]
+    trips_so_far = np.cumsum(trips[trips > 0])
+    
+    # Each departing flight can pair with thousands of returning flights, so only pair up
+    # enough of them at once for about `chunk_size` trips, to keep memory bounded. A single
+    # departing flight with more trips than that is paired up on its own.
+    start = 0
+    
+    while start < len(departing_rows):
+        done = trips_so_far[start - 1] if start > 0 else 0
+        end = max(int(np.searchsorted(trips_so_far, done + chunk_size, side = "right")), start + 1)
+        
+        rows = departing_rows[start:end]
+        start = end
+        
+        # Pair each departing flight with each airport in the city it arrives in...
+        arrival_codes = departing["arrival_airport"][rows].astype(np.int64)
+        owners, mates = _expand(mate_starts[arrival_codes], mate_counts[arrival_codes])
+        mates = mate_targets[mates]
+        
+        # ...and then with each returning flight leaving from that airport
+        pairs, returns = _expand(returning_starts[mates], returning_counts[mates])
+        
+        yield rows[owners[pairs]], returning_rows[returns]
+
+def join_round_trips(
+    departing: FlightTable,
+    returning: FlightTable,
+    city2airports: Mapping[str, tuple[str, ...]],
+    airport2cities: Mapping[str, tuple[str, ...]],
+    **options,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Indices of the departing and returning flight of every round trip, without building any objects"""
+    chunks = list(iter_round_trips(departing, returning, city2airports, airport2cities, **options))
+    
+    if not chunks:
+        return np.empty(0, dtype = np.int64), np.empty(0, dtype = np.int64)
+    
+    departing_rows, returning_rows = zip(*chunks)
+    return np.concatenate(departing_rows), np.concatenate(returning_rows)
@@ -0,0 +1,130 @@
+from planner.query import Query, encode_rows, decode_rows, encode_fares, decode_fares
+
+from typing import Optional
+from threading import Lock
+
+import logging
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+class Journal:
+    """An append-only log of completed queries and their results, for resuming a sweep"""
+    
+    def __init__(self, filepath: str, resume: bool = False):
+        self.filepath = filepath
+        self.completed = {}
+        
+        # Date picker fares of each completed query they were read for
+        self.calendars = {}
+        
+        # The completed query which covers each route, keyed by the search options
+        # and the departure and arrival airports
+        self.routes = {}
+        
+        directory = os.path.dirname(filepath)
+        
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        
+        if resume and os.path.exists(filepath):
+            with open(filepath) as file:
+                for line in file:
+                    # The last line may be cut short if we crashed while writing it
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    
+                    if "calendar" in entry:
+                        self.calendars[entry["calendar"]] = entry["fares"]
+                    else:
+                        self._record(entry["query"], entry["rows"])
+            
+            logger.info("Resuming with %d completed queries from %s", len(self.completed), filepath)
+        
+        # Pooled browsers finish queries from several threads
+        self.lock = Lock()
+        
+        # Start a fresh journal unless we are resuming
+        self.file = open(filepath, "a" if resume else "w")
+        
+        # Don't append onto a line which was cut short
+        if self.file.tell() > 0:
+            with open(filepath, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                
+                if file.read() != b"\n":
+                    self.file.write("\n")
+    
+    def _record(self, key: str, encoded: list):
+        self.completed[key] = encoded
+        
+        departing_from, arriving_to, *options = json.loads(key)
+        options = json.dumps(options)
+        
+        for departure_airport in departing_from:
+            for arrival_airport in arriving_to:
+                self.routes[options, departure_airport, arrival_airport] = key
+    
+    def get(self, query: Query) -> Optional[list]:
+        encoded = self.completed.get(query.key())
+        
+        if encoded is not None:
+            return decode_rows(encoded)
+        
+        # The airports may have been grouped differently when the query was
+        # completed, so put its results together from every query which covered
+        # one of its routes
+        options = query.options_key()
+        departing_from = {code.upper() for code in query.departing_from}
+        arriving_to = {code.upper() for code in query.arriving_to}
+        
+        keys = set()
+        
+        for departure_airport in departing_from:
+            for arrival_airport in arriving_to:
+                key = self.routes.get((options, departure_airport, arrival_airport))
+                
+                if key is None:
+                    return None
+                
+                keys.add(key)
+        
+        return [
+            row
+            for key in keys
+            for row in decode_rows(self.completed[key])
+            if row[0][0] in departing_from and row[0][1] in arriving_to
+        ]
+    
+    def get_fares(self, query: Query) -> Optional[dict]:
+        encoded = self.calendars.get(query.key())
+        return None if encoded is None else decode_fares(encoded)
+    
+    def append(self, query: Query, rows: list):
+        key = query.key()
+        encoded = encode_rows(rows)
+        
+        with self.lock:
+            self._write(dict(query = key, rows = encoded))
+            self._record(key, encoded)
+    
+    def append_fares(self, query: Query, fares: dict):
+        key = query.key()
+        encoded = encode_fares(fares)
+        
+        with self.lock:
+            self._write(dict(calendar = key, fares = encoded))
+            self.calendars[key] = encoded
+    
+    def _write(self, entry: dict):
+        self.file.write(json.dumps(entry) + "\n")
+        
+        # Make sure the entry survives the browser or the machine going down
+        self.file.flush()
+        os.fsync(self.file.fileno())
+    
+    def close(self):
+        self.file.close()
@@ -0,0 +1,109 @@
+from planner.enums import FlightDirection
+from planner.flight import Flight, RoundTrip
+from planner.pruning import Constraints
+from planner.ranking import Objectives, TopK
+
+from collections import defaultdict
+from typing import Iterable, Mapping
+
+class OnlineMatcher:
+    """Pairs flights into round trips as soon as they are found, keeping the best of them"""
+    
+    def __init__(
+        self,
+        city2airports: Mapping[str, tuple[str, ...]],
+        airport2cities: Mapping[str, tuple[str, ...]],
+        objectives: Objectives = Objectives(),
+        k: int = 10,
+        constraints: Constraints = Constraints(),
+    ):
+        self.city2airports = city2airports
+        self.airport2cities = airport2cities
+        self.objectives = objectives
+        self.constraints = constraints
+        self.top = TopK(k)
+        
+        # Usable flights by the eclipse viewing city they arrive in or leave from
+        self.departing = defaultdict(list)
+        self.returning = defaultdict(list)
+        
+        self.seen = set()
+        self.num_trips = 0
+    
+    def _is_usable(self, flight: Flight) -> bool:
+        if flight.direction == FlightDirection.DEPARTING:
+            return self.constraints.min_setup_time <= flight.leeway_time <= self.constraints.max_setup_time
+        
+        return self.constraints.min_cleanup_time <= flight.leeway_time <= self.constraints.max_cleanup_time
+    
+    def add(self, flight: Flight) -> int:
+        """Pair a new flight with every flight already seen in the other direction, returning how many trips it made"""
+        if flight in self.seen or not self._is_usable(flight):
+            return 0
+        
+        self.seen.add(flight)
+        
+        if flight.direction == FlightDirection.DEPARTING:
+            cities = self.airport2cities.get(flight.arrival_airport, ())
+            legs, others = self.departing, self.returning
+        else:
+            cities = self.airport2cities.get(flight.departure_airport, ())
+            legs, others = self.returning, self.departing
+        
+        # A city can share an airport with another city, so the same flight
+        # may be listed under more than one of them
+        partners = set()
+        
+        for city in cities:
+            legs[city].append(flight)
+            partners.update(others[city])
+        
+        for partner in partners:
+            if flight.direction == FlightDirection.DEPARTING:
+                trip = RoundTrip(flight, partner)
+            else:
+                trip = RoundTrip(partner, flight)
+            
+            self.top.push(self.objectives.key(trip), trip)
+        
+        self.num_trips += len(partners)
+        return len(partners)
+    
+    def add_all(self, flights: Iterable[Flight]) -> int:
+        return sum(self.add(flight) for flight in flights)
+    
+    def results(self) -> list[RoundTrip]:
+        """The best trips found so far, best first"""
+        return [trip for _, trip in self.top.results()]
+
+class OriginMatchers:
+    """Splits the flights of a search shared by travelers from several cities, pairing each traveler's own flights"""
+    
+    def __init__(
+        self,
+        origin_cities: Iterable[str],
+        city2airports: Mapping[str, tuple[str, ...]],
+        airport2cities: Mapping[str, tuple[str, ...]],
+        **options,
+    ):
+        self.airport2cities = airport2cities
+        self.matchers = {city: OnlineMatcher(city2airports, airport2cities, **options) for city in origin_cities}
+    
+    def add(self, flight: Flight) -> int:
+        # Flights out leave from a home airport, and flights back land at one
+        if flight.direction == FlightDirection.DEPARTING:
+            home = flight.departure_airport
+        else:
+            home = flight.arrival_airport
+        
+        return sum(self.matchers[city].add(flight) for city in self.airport2cities.get(home, ()) if city in self.matchers)
+    
+    def items(self) -> Iterable[tuple[str, OnlineMatcher]]:
+        return self.matchers.items()
+    
+    def __len__(self) -> int:
+        return len(self.matchers)
+    
+    @property
+    def num_trips(self) -> int:
+        return sum(matcher.num_trips for matcher in self.matchers.values())
@@ -0,0 +1,179 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Generator
+
+from rich.table import Table
+
+import bisect
+import json
+import math
+import os
+import time
+
+# Upper bounds of the histogram buckets, which cover everything from a quick
+# script to a page which takes minutes to load, or a few flights to thousands
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class Histogram:
+    """Counts of observed values in fixed buckets, along with their sum and extremes"""
+    
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> float:
+        """An estimate of the quantile, by interpolating within the bucket it falls in"""
+        if not self.count:
+            return math.nan
+        
+        rank = q * self.count
+        seen = 0
+        
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.max
+                value = low + (high - low) * (rank - seen) / count
+                
+                return min(max(value, self.min), self.max)
+            
+            seen += count
+        
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else math.nan
+    
+    def to_dict(self) -> dict:
+        return dict(
+            count = self.count,
+            sum = self.sum,
+            min = self.min if self.count else None,
+            max = self.max if self.count else None,
+            buckets = dict(zip(map(str, self.buckets + (math.inf,)), self.counts)),
+        )
+
+def timed_call(function: Callable, *args) -> tuple[Any, float]:
+    """Call a function, returning its result and how many seconds it took, e.g. in another process"""
+    started = time.perf_counter()
+    result = function(*args)
+    
+    return result, time.perf_counter() - started
+
+class Metrics:
+    """Counters and histograms of what happened during a run, shared by every browser"""
+    
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+    
+    def increment(self, name: str, amount: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def observe(self, name: str, value: float):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            
+            histogram.observe(value)
+    
+    @contextmanager
+    def timer(self, name: str) -> Generator[None, None, None]:
+        """Observe how many seconds the block takes, in the histogram `<name>_seconds`"""
+        started = time.perf_counter()
+        
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started)
+    
+    def stopwatch(self, prefix: str) -> Callable[[str], None]:
+        """A function which observes the seconds since it was last called, or created, for each step of a sequence"""
+        last = time.perf_counter()
+        
+        def lap(step: str):
+            nonlocal last
+            now = time.perf_counter()
+            
+            self.observe(f"{prefix}_{step}_seconds", now - last)
+            last = now
+        
+        return lap
+    
+    def to_dict(self) -> dict:
+        with self.lock:
+            return dict(
+                started = self.started,
+                elapsed = time.time() - self.started,
+                counters = dict(self.counters),
+                histograms = {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            )
+    
+    def to_prometheus(self, prefix: str = "planner_") -> str:
+        """The metrics in the Prometheus text exposition format"""
+        lines = []
+        
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}{name}_total counter")
+                lines.append(f"{prefix}{name}_total {value}")
+            
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                cumulative = 0
+                
+                for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                    cumulative += count
+                    label = "+Inf" if bound == math.inf else bound
+                    lines.append(f"{prefix}{name}_bucket{{le=\"{label}\"}} {cumulative}")
+                
+                lines.append(f"{prefix}{name}_sum {histogram.sum}")
+                lines.append(f"{prefix}{name}_count {histogram.count}")
+        
+        return "\n".join(lines) + "\n"
+    
+    def export(self, filepath: str):
+        """Write the metrics to a file, in the Prometheus format if it ends with .prom and as JSON otherwise"""
+        directory = os.path.dirname(filepath)
+        
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        
+        with open(filepath, "w") as file:
+            if filepath.endswith(".prom"):
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), file, indent = 2)
+    
+    def summary(self) -> Table:
+        table = Table(title = "Search metrics", title_justify = "left")
+        
+        for column in ("Metric", "Count", "Mean", "p50", "p95", "Max", "Total"):
+            table.add_column(column, justify = "left" if column == "Metric" else "right")
+        
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                table.add_row(name, str(histogram.count), f"{histogram.mean:.3f}", f"{histogram.quantile(0.5):.3f}",
+                              f"{histogram.quantile(0.95):.3f}", f"{histogram.max:.3f}", f"{histogram.sum:.3f}")
+            
+            for name, value in sorted(self.counters.items()):
+                table.add_row(name, "", "", "", "", "", f"{value:g}")
+        
+        return table
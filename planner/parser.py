@@ -0,0 +1,131 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional
+
+from lxml import etree, html as lxml_html
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+class ParsedFlight(NamedTuple):
+    """A flight as listed on a results page"""
+    departure_airport: str
+    arrival_airport: str
+    departure_time: datetime
+    arrival_time: datetime
+    price: Optional[int]
+
+def _with_classes(tag: str, *names: str) -> str:
+    conditions = " and ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in names)
+    return f"{tag}[{conditions}]"
+
+# Every flight is listed in its own card, and each field is looked up within
+# its card so that a missing field can't shift the fields of later flights
+CARDS = etree.XPath("//" + _with_classes("li", "pIav2d"))
+
+DEPARTURE_AIRPORT = etree.XPath(".//" + _with_classes("div", "G2WY5c", "sSHqwe", "ogfYpf", "tPgKwe"))
+ARRIVAL_AIRPORT = etree.XPath(".//" + _with_classes("div", "c8rWCd", "sSHqwe", "ogfYpf", "tPgKwe"))
+
+DEPARTURE_TIME = etree.XPath(".//" + _with_classes("div", "wtdjmc", "YMlIz", "ogfYpf", "tPgKwe"))
+ARRIVAL_TIME = etree.XPath(".//" + _with_classes("div", "XWcVob", "YMlIz", "ogfYpf", "tPgKwe"))
+
+PRICE = etree.XPath(".//" + _with_classes("div", "BVAVmf", "I11szd", "Qr8X4d"))
+
+# Each day of the date picker is a grid cell with its date in `data-iso`, and
+# the cheapest fare for that day underneath once the prices have loaded
+CALENDAR_DAYS = etree.XPath("//div[@role='gridcell' and @data-iso]")
+CALENDAR_PRICE = etree.XPath(".//" + _with_classes("div", "UNMzKf"))
+
+# Times look like "9:05 PM" or "1:30 AM+1", with any kind of space before the meridiem
+TIME_EXPR = re.compile(r"(\d{1,2}):(\d{2})\s*([AP]M)(?:\s*\+(\d+))?", re.IGNORECASE)
+PRICE_EXPR = re.compile(r"\$([\d,]+)")
+
+def _text(card, path: etree.XPath) -> Optional[str]:
+    elements = path(card)
+    return elements[0].text_content().strip() if elements else None
+
+@lru_cache(maxsize = 4096)
+def _parse_time(text: str) -> Optional[timedelta]:
+    # The same few hundred times appear on every page, so each is only parsed once
+    match = TIME_EXPR.search(text)
+
+    if match is None:
+        return None
+
+    hour, minute, meridiem, added_days = match.groups()
+    hour = int(hour) % 12 + (12 if meridiem.upper() == "PM" else 0)
+
+    return timedelta(days = int(added_days or 0), hours = hour, minutes = int(minute))
+
+def _parse_price(text: Optional[str]) -> Optional[int]:
+    if text is None:
+        return None
+
+    match = PRICE_EXPR.search(text)
+    return int(match.group(1).replace(',', '')) if match else None
+
+def parse_flights(page: str, departure_date: datetime) -> list[ParsedFlight]:
+    """Extract every flight on a results page in a single pass over its cards"""
+    tree = lxml_html.fromstring(page)
+    midnight = datetime(departure_date.year, departure_date.month, departure_date.day)
+
+    flights = []
+    skipped = 0
+
+    for card in CARDS(tree):
+        departure_airport = _text(card, DEPARTURE_AIRPORT)
+        arrival_airport = _text(card, ARRIVAL_AIRPORT)
+        departure_time = _text(card, DEPARTURE_TIME)
+        arrival_time = _text(card, ARRIVAL_TIME)
+
+        departure_offset = _parse_time(departure_time) if departure_time else None
+        arrival_offset = _parse_time(arrival_time) if arrival_time else None
+
+        # A flight without its airports or times is of no use, but a flight
+        # without a price is still reported so the caller can decide
+        if not departure_airport or not arrival_airport or departure_offset is None or arrival_offset is None:
+            skipped += 1
+            continue
+
+        flights.append(ParsedFlight(
+            departure_airport = departure_airport,
+            arrival_airport = arrival_airport,
+            departure_time = midnight + departure_offset,
+            arrival_time = midnight + arrival_offset,
+            price = _parse_price(_text(card, PRICE)),
+        ))
+
+    if skipped:
+        logger.info("Skipped %d flights with missing airports or times", skipped)
+
+    return flights
+
+def parse_calendar(page: str) -> dict[datetime, Optional[int]]:
+    """The cheapest fare shown for each day of the date picker, or None for days without one"""
+    tree = lxml_html.fromstring(page)
+    fares = {}
+    
+    for day in CALENDAR_DAYS(tree):
+        try:
+            date = datetime.strptime(day.get("data-iso"), "%Y-%m-%d")
+        except ValueError:
+            continue
+        
+        # Both months of the picker can show the same day, so keep whichever has a price
+        price = _parse_price(_text(day, CALENDAR_PRICE))
+        
+        if fares.get(date) is None:
+            fares[date] = price
+    
+    return fares
+
+def _parse_page(page: tuple[str, datetime]) -> list[ParsedFlight]:
+    return parse_flights(*page)
+
+def parse_pages(pages: Iterable[tuple[str, datetime]], workers: Optional[int] = None) -> list[list[ParsedFlight]]:
+    """Parse many saved (page, departure date) pairs across several processes"""
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        return list(executor.map(_parse_page, pages, chunksize = 8))
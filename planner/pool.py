@@ -0,0 +1,198 @@
+from planner.api import API, BaseAPI, to_rows
+from planner.cache import QueryCache
+from planner.journal import Journal
+from planner.query import Query
+from planner.parser import parse_calendar, parse_flights
+from planner.metrics import Metrics, timed_call
+from planner.supervisor import FailureLog, Supervisor
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from itertools import islice
+from typing import Generator, Iterable, Optional
+from queue import Queue
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class APIPool(BaseAPI):
+    """A fixed set of browsers which serve searches concurrently"""
+    
+    def __init__(
+        self,
+        workers: int = 4,
+        cache: Optional[QueryCache] = None,
+        journal: Optional[Journal] = None,
+        parse_workers: int = 0,
+        metrics: Optional[Metrics] = None,
+        failures: Optional[FailureLog] = None,
+        max_queries: Optional[int] = 100,
+        max_memory: Optional[int] = 1024 * 1024 * 1024,
+        retries: int = 3,
+        **options,
+    ):
+        if workers < 1:
+            raise ValueError("At least one worker is required.")
+        
+        self.workers = workers
+        self.cache = cache
+        self.journal = journal
+        
+        # Shared with every browser, so the steps of all searches are recorded together
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.failures = failures if failures is not None else FailureLog()
+        
+        # Passed through to every API, e.g. `debug` or `timeout`
+        self.options = options
+        
+        # Processes shared by all browsers for parsing pages
+        self.parser = ProcessPoolExecutor(max_workers = parse_workers) if parse_workers > 0 else None
+        
+        # At most `workers` searches use a browser at once, since each must take
+        # one from the idle queue. The extra threads let pages be parsed while
+        # every browser is busy with the next query.
+        self.executor = ThreadPoolExecutor(max_workers = 2 * workers, thread_name_prefix = "api")
+        
+        # Browsers which are not currently serving a search, each watched over
+        # so that it is replaced when it crashes or grows too large
+        self.idle = Queue()
+        
+        supervisors = [
+            Supervisor(self._launch, max_queries = max_queries, max_memory = max_memory, retries = retries,
+                       metrics = self.metrics, failures = self.failures)
+            for _ in range(workers)
+        ]
+        
+        for supervisor in supervisors:
+            self.idle.put(supervisor)
+        
+        # Launch the browsers in parallel, Chrome takes a while to start. If one of them
+        # fails to, close those which did rather than leave them running.
+        try:
+            list(self.executor.map(Supervisor.start, supervisors))
+        except BaseException:
+            self.close()
+            raise
+    
+    def _launch(self) -> API:
+        # The pool looks up and stores results itself
+        return API(metrics = self.metrics, **self.options)
+    
+    def _run(self, query: Query) -> Optional[list]:
+        # Cached searches don't need to wait for a free browser
+        rows = self._lookup(query)
+        
+        if rows is not None:
+            return rows
+        
+        supervisor = self.idle.get()
+        
+        # Failures are retried and recorded by the supervisor, so that only this
+        # query is lost if it keeps failing and the rest of the sweep carries on
+        try:
+            page = supervisor.fetch(query)
+        finally:
+            self.idle.put(supervisor)
+        
+        if page is None:
+            return None
+        
+        # The browser is already free for the next query while this page is parsed
+        try:
+            if self.parser is not None:
+                flights, elapsed = self.parser.submit(timed_call, parse_flights, page, query.departure_date).result()
+            else:
+                flights, elapsed = timed_call(parse_flights, page, query.departure_date)
+            
+            self.metrics.observe("parse_seconds", elapsed)
+            
+            rows = to_rows(flights)
+            self._store(query, rows)
+        except Exception as error:
+            self._give_up(query, error)
+            return None
+        
+        return rows
+    
+    def _run_calendar(self, query: Query) -> Optional[dict[datetime, Optional[int]]]:
+        fares = self._lookup_fares(query)
+        
+        if fares is not None:
+            return fares
+        
+        supervisor = self.idle.get()
+        
+        try:
+            page = supervisor.fetch(query, method = "fetch_calendar")
+        finally:
+            self.idle.put(supervisor)
+        
+        if page is None:
+            return None
+        
+        try:
+            fares = parse_calendar(page)
+            self._store_fares(query, fares)
+        except Exception as error:
+            self._give_up(query, error)
+            return None
+        
+        return fares
+    
+    def _give_up(self, query: Query, error: Exception):
+        # A page which can't be parsed or stored loses only its own query, like a
+        # search which kept failing, rather than ending the sweep. Reading the same
+        # page again wouldn't go any better, so it isn't retried.
+        logger.error("Could not parse or store the results of %s", query, exc_info = True)
+        self.failures.record(query, 1, error, gave_up = True)
+        self.metrics.increment("queries_failed")
+    
+    def cheapest_fares(self, queries: Iterable[Query]) -> Generator[tuple[Query, dict[datetime, Optional[int]]], None, None]:
+        futures = {self.executor.submit(self._run_calendar, query): query for query in queries}
+        
+        # Leave out calendars which failed, so their days are searched in full
+        for future in as_completed(futures):
+            fares = future.result()
+            
+            if fares is not None:
+                yield futures[future], fares
+    
+    def submit(self, query: Query) -> Future:
+        return self.executor.submit(self._run, query)
+    
+    def stream(self, queries: Iterable[Query]) -> Generator[tuple[Query, list], None, None]:
+        queries = iter(queries)
+        
+        # Only take queries as they can be started, so the caller may keep
+        # adding queries based on the results it has seen so far
+        futures = {self.submit(query): query for query in islice(queries, 2 * self.workers)}
+        
+        try:
+            while futures:
+                done, _ = wait(futures, return_when = FIRST_COMPLETED)
+                
+                # Merge results in whichever order the browsers finish them, leaving
+                # out failed searches so they aren't mistaken for finding no flights
+                for future in done:
+                    query = futures.pop(future)
+                    rows = future.result()
+                    
+                    if rows is not None:
+                        yield query, rows
+                    
+                    for query in islice(queries, 1):
+                        futures[self.submit(query)] = query
+        finally:
+            # If the consumer stops early, don't leave queued searches behind
+            for future in futures:
+                future.cancel()
+    
+    def close(self):
+        self.executor.shutdown(wait = True, cancel_futures = True)
+        
+        if self.parser is not None:
+            self.parser.shutdown(cancel_futures = True)
+        
+        while not self.idle.empty():
+            self.idle.get().stop()
@@ -0,0 +1,168 @@
+from planner.enums import TripType
+from planner.query import Query
+from planner.spatial import distance
+
+from collections import defaultdict
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timedelta
+from typing import Iterable
+
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# A search accepts at most this many departure and arrival airports
+MAX_DEPARTING = 7
+MAX_ARRIVING = 4
+
+@dataclass(frozen = True)
+class Constraints:
+    """Bounds which every usable flight must fall within"""
+    min_setup_time: timedelta = timedelta(hours = 2)
+    max_setup_time: timedelta = timedelta(hours = 8)
+    min_cleanup_time: timedelta = timedelta(hours = 2)
+    max_cleanup_time: timedelta = timedelta(hours = 8)
+    min_travel_time: timedelta = timedelta(minutes = 30)
+    max_travel_time: timedelta = timedelta(hours = 18)
+    
+    # Faster than any airliner flies gate to gate, so that the travel time
+    # estimated from distance never rules out a real flight
+    cruise_speed: float = 1000.0
+    
+    def widened(self, days: int) -> "Constraints":
+        """The same bounds, with room to fly out and home a number of days further from the eclipse"""
+        return replace(self,
+                       max_setup_time = self.max_setup_time + timedelta(days = days),
+                       max_cleanup_time = self.max_cleanup_time + timedelta(days = days))
+    
+    def to_json(self) -> dict:
+        # Times are kept in seconds
+        return {
+            field.name: value.total_seconds() if isinstance(value, timedelta) else value
+            for field in fields(self)
+            for value in [getattr(self, field.name)]
+        }
+    
+    @classmethod
+    def from_json(cls, values: dict) -> "Constraints":
+        defaults = cls()
+        
+        return cls(**{
+            name: timedelta(seconds = value) if isinstance(getattr(defaults, name), timedelta) else value
+            for name, value in values.items()
+        })
+
+def pack_routes(
+    routes: Iterable[tuple[str, str]],
+    max_departing: int = MAX_DEPARTING,
+    max_arriving: int = MAX_ARRIVING,
+) -> list[tuple[tuple[str, ...], tuple[str, ...]]]:
+    """Group (departure, arrival) routes into as few searches as we can"""
+    sources = defaultdict(set)
+    
+    for departure_airport, arrival_airport in routes:
+        sources[arrival_airport].add(departure_airport)
+    
+    # Each arrival airport needs a search from every airport with a route to it,
+    # split up if there are more of those than a search allows
+    units = []
+    
+    for arrival_airport, departure_airports in sources.items():
+        departure_airports = sorted(departure_airports)
+        
+        for i in range(0, len(departure_airports), max_departing):
+            units.append((frozenset(departure_airports[i:i + max_departing]), arrival_airport))
+    
+    # Place the units with the most departure airports first, each into the
+    # first search it fits in without going over either limit
+    units.sort(key = lambda unit: (-len(unit[0]), sorted(unit[0]), unit[1]))
+    
+    searches = []
+    
+    for departure_airports, arrival_airport in units:
+        for search in searches:
+            merged = search[0] | departure_airports
+            
+            if len(merged) <= max_departing and len(search[1]) < max_arriving and arrival_airport not in search[1]:
+                search[0] = merged
+                search[1].append(arrival_airport)
+                break
+        else:
+            searches.append([departure_airports, [arrival_airport]])
+    
+    return [(tuple(sorted(departure_airports)), tuple(arrival_airports)) for departure_airports, arrival_airports in searches]
+
+class QueryPlanner:
+    """Plans the searches for a sweep, leaving out routes and dates which can't yield a usable flight"""
+    
+    def __init__(
+        self,
+        localized_events: dict[str, dict[str, datetime]],
+        locations: dict[str, dict],
+        constraints: Constraints = Constraints(),
+    ):
+        self.localized_events = localized_events
+        self.locations = locations
+        self.constraints = constraints
+    
+    def _to_utc(self, airport: str, time: datetime) -> datetime:
+        return time - self.locations[airport]["utc_offset"]
+    
+    def _min_travel_time(self, departure_airport: str, arrival_airport: str) -> timedelta:
+        hours = distance(self.locations[departure_airport], self.locations[arrival_airport]) / self.constraints.cruise_speed
+        return max(self.constraints.min_travel_time, timedelta(hours = hours))
+    
+    def can_depart(self, departure_airport: str, arrival_airport: str, date: datetime) -> bool:
+        # Every flight leaving on this day, in the time zone it leaves from
+        earliest_takeoff = self._to_utc(departure_airport, date)
+        latest_takeoff = earliest_takeoff + timedelta(days = 1)
+        
+        earliest_landing = earliest_takeoff + self._min_travel_time(departure_airport, arrival_airport)
+        latest_landing = latest_takeoff + self.constraints.max_travel_time
+        
+        # We have to land early enough to set up, but not so early that we are left waiting around
+        eclipse_begins = self._to_utc(arrival_airport, self.localized_events[arrival_airport]["start"])
+        
+        return earliest_landing <= eclipse_begins - self.constraints.min_setup_time and \
+               latest_landing >= eclipse_begins - self.constraints.max_setup_time
+    
+    def can_return(self, departure_airport: str, arrival_airport: str, date: datetime) -> bool:
+        earliest_takeoff = self._to_utc(departure_airport, date)
+        latest_takeoff = earliest_takeoff + timedelta(days = 1)
+        
+        # We have to take off late enough to clean up, but not so late that we are left waiting around
+        eclipse_ends = self._to_utc(departure_airport, self.localized_events[departure_airport]["end"])
+        
+        return earliest_takeoff <= eclipse_ends + self.constraints.max_cleanup_time and \
+               latest_takeoff >= eclipse_ends + self.constraints.min_cleanup_time
+    
+    def _plan(self, departing_from: list[str], arriving_to: list[str], dates: list[datetime], is_usable, **options) -> list[Query]:
+        queries = []
+        
+        for date in dates:
+            routes = [
+                (departure_airport, arrival_airport)
+                for departure_airport in departing_from
+                for arrival_airport in arriving_to
+                if departure_airport != arrival_airport and is_usable(departure_airport, arrival_airport, date)
+            ]
+            
+            for departure_airports, arrival_airports in pack_routes(routes):
+                queries.append(Query(departing_from = departure_airports,
+                                     arriving_to = arrival_airports,
+                                     departure_date = date,
+                                     **options))
+        
+        unpruned = len(dates) * math.ceil(len(departing_from) / MAX_DEPARTING) * math.ceil(len(arriving_to) / MAX_ARRIVING)
+        logger.info("Planned %d searches in place of %d", len(queries), unpruned)
+        
+        return queries
+    
+    def departing(self, departing_from: list[str], arriving_to: list[str], dates: list[datetime], **options) -> list[Query]:
+        options.setdefault("trip", TripType.ONEWAY)
+        return self._plan(departing_from, arriving_to, dates, self.can_depart, **options)
+    
+    def returning(self, departing_from: list[str], arriving_to: list[str], dates: list[datetime], **options) -> list[Query]:
+        options.setdefault("trip", TripType.ONEWAY)
+        return self._plan(departing_from, arriving_to, dates, self.can_return, **options)
@@ -0,0 +1,135 @@
+from planner.enums import TripType, FlightClass
+from planner.utils import chunkify
+
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Generator, Optional, Union
+
+import json
+
+@dataclass(frozen = True)
+class Query:
+    """A single search that can be answered by one results page"""
+    departing_from: tuple[str, ...]
+    arriving_to: tuple[str, ...]
+    departure_date: datetime
+    trip: TripType = TripType.ROUNDTRIP
+    flight_class: FlightClass = FlightClass.ECONOMY
+    return_date: Optional[datetime] = None
+    adults: int = 1
+    children: int = 0
+    infants_in_seat: int = 0
+    infants_on_lap: int = 0
+
+    def kwargs(self) -> dict:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    def key(self) -> str:
+        # The order in which airports are entered does not change the results
+        return json.dumps([
+            sorted(code.upper() for code in self.departing_from),
+            sorted(code.upper() for code in self.arriving_to),
+            *self._options(),
+        ])
+    
+    def options_key(self) -> str:
+        # Everything about the search except for the airports
+        return json.dumps(self._options())
+    
+    def route_key(self) -> str:
+        # Everything about the search except for the departure date
+        return json.dumps([
+            sorted(code.upper() for code in self.departing_from),
+            sorted(code.upper() for code in self.arriving_to),
+            *self._options()[1:],
+        ])
+    
+    def _options(self) -> list:
+        return [
+            self.departure_date.strftime("%Y-%m-%d"),
+            self.return_date.strftime("%Y-%m-%d") if self.return_date else None,
+            int(self.trip),
+            int(self.flight_class),
+            self.adults,
+            self.children,
+            self.infants_in_seat,
+            self.infants_on_lap,
+        ]
+
+    def __str__(self):
+        return f"{','.join(self.departing_from)} -> {','.join(self.arriving_to)} on {self.departure_date:%Y-%m-%d}"
+
+def encode_rows(rows: list) -> list:
+    # Flatten search results into JSON friendly lists
+    return [
+        [departure_airport, arrival_airport, departure_time.isoformat(), arrival_time.isoformat(), price]
+        for (departure_airport, arrival_airport), (departure_time, arrival_time), price in rows
+    ]
+
+def decode_rows(encoded: list) -> list:
+    return [
+        ((departure_airport, arrival_airport),
+         (datetime.fromisoformat(departure_time), datetime.fromisoformat(arrival_time)),
+         price)
+        for departure_airport, arrival_airport, departure_time, arrival_time, price in encoded
+    ]
+
+def encode_fares(fares: dict) -> dict:
+    # Days of the date picker as ISO dates, which JSON objects can be keyed by
+    return {day.strftime("%Y-%m-%d"): fare for day, fare in fares.items()}
+
+def decode_fares(encoded: dict) -> dict:
+    return {datetime.strptime(day, "%Y-%m-%d"): fare for day, fare in encoded.items()}
+
+def chunk_queries(
+    departing_from: Union[str, list[str]],
+    arriving_to: Union[str, list[str]],
+    departure_date: Union[datetime, list[datetime]],
+    trip: TripType = TripType.ROUNDTRIP,
+    flight_class: FlightClass = FlightClass.ECONOMY,
+    return_date: Optional[datetime] = None,
+    adults: int = 1,
+    children: int = 0,
+    infants_in_seat: int = 0,
+    infants_on_lap: int = 0,
+) -> Generator[Query, None, None]:
+    if isinstance(departing_from, str):
+        departing_from = [departing_from]
+
+    if isinstance(arriving_to, str):
+        arriving_to = [arriving_to]
+
+    if isinstance(departure_date, datetime):
+        departure_date = [departure_date]
+
+    if trip == TripType.MULTICITY:
+        raise NotImplementedError("Multi-city trips are not yet supported.")
+    elif trip == TripType.ROUNDTRIP and return_date is None:
+        raise ValueError("Return date must be specified for round-trip flights.")
+
+    if adults < 1:
+        raise ValueError("At least one adult must be present.")
+
+    if children < 0:
+        raise ValueError("Cannot have a negative number of children.")
+
+    if infants_in_seat < 0 or infants_on_lap < 0:
+        raise ValueError("Cannot have a negative number of infants.")
+
+    # We can only query up to 7 departure airports and 4 arrival airports at
+    # a time, so chunk the airports into groups
+    for departing_group in chunkify(departing_from, 7):
+        for arriving_group in chunkify(arriving_to, 4):
+            for date in departure_date:
+                yield Query(
+                    departing_from = tuple(departing_group),
+                    arriving_to = tuple(arriving_group),
+                    departure_date = date,
+                    trip = trip,
+                    flight_class = flight_class,
+                    return_date = return_date,
+                    adults = adults,
+                    children = children,
+                    infants_in_seat = infants_in_seat,
+                    infants_on_lap = infants_on_lap,
+                )
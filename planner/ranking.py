@@ -0,0 +1,171 @@
+from planner.flight import RoundTrip
+from planner.store import SECOND
+
+from datetime import timedelta
+from itertools import count
+from typing import Any, Iterable, Sequence, Union
+
+import heapq
+
+import numpy as np
+
+# Objectives a trip can be ranked by, each of which is a property of RoundTrip
+OBJECTIVES = ("cost", "travel_time", "setup_time", "cleanup_time")
+
+class Objectives:
+    """What to rank trips by, each smallest first unless its name starts with a minus sign"""
+    
+    def __init__(self, names: Union[str, Sequence[str]] = ("cost", "travel_time")):
+        if isinstance(names, str):
+            names = names.replace(",", " ").split()
+        
+        self.names = tuple(names)
+        self.columns = []
+        
+        for name in self.names:
+            column = name.lstrip("+-")
+            
+            if column not in OBJECTIVES:
+                raise ValueError(f"{name} is not an objective, choose from {', '.join(OBJECTIVES)}.")
+            
+            # Every objective is minimized, so larger is better for negated objectives
+            self.columns.append((column, -1 if name.startswith("-") else 1))
+        
+        if not self.columns:
+            raise ValueError("At least one objective is required.")
+    
+    def __str__(self):
+        return ", ".join(self.names)
+    
+    def key(self, trip: RoundTrip) -> tuple[int, ...]:
+        """The objectives of a trip, where smaller is better in each"""
+        values = []
+        
+        for column, sign in self.columns:
+            value = getattr(trip, column)
+            
+            if isinstance(value, timedelta):
+                value = value // SECOND
+            
+            values.append(sign * value)
+        
+        return tuple(values)
+    
+    def keys(self, departing_records: np.ndarray, returning_records: np.ndarray) -> np.ndarray:
+        """The objectives of many trips at once, given the records of their flights"""
+        columns = dict(
+            cost = departing_records["cost"].astype(np.int64) + returning_records["cost"],
+            travel_time = departing_records["arrival_time"] - departing_records["departure_time"] + \
+                          returning_records["arrival_time"] - returning_records["departure_time"],
+            setup_time = departing_records["leeway_time"],
+            cleanup_time = returning_records["leeway_time"],
+        )
+        
+        keys = np.empty((len(departing_records), len(self.columns)), dtype = np.int64)
+        
+        for i, (column, sign) in enumerate(self.columns):
+            keys[:, i] = sign * columns[column]
+        
+        return keys
+
+def _lexsort(keys: np.ndarray) -> np.ndarray:
+    # np.lexsort sorts by its last key first
+    return np.lexsort(keys.T[::-1])
+
+class TopK:
+    """Keeps the k best items seen so far, by their keys"""
+    
+    def __init__(self, k: int):
+        if k < 1:
+            raise ValueError("k must be at least 1.")
+        
+        self.k = k
+        
+        # A max heap of the best items, so the worst of them is always at the
+        # top. Keys are negated, and ties are broken by the order items arrived.
+        self.heap = []
+        self.counter = count()
+    
+    def push(self, key: tuple, item: Any) -> bool:
+        entry = (tuple(-value for value in key), -next(self.counter), item)
+        
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+            return True
+        
+        # Only replace the worst item if this one is better
+        if entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+            return True
+        
+        return False
+    
+    def push_many(self, keys: np.ndarray, items: np.ndarray):
+        # At most k of the new items can make it in, so only push the best k of them
+        for i in _lexsort(keys)[:self.k]:
+            if not self.push(tuple(keys[i].tolist()), items[i]):
+                break
+    
+    def __len__(self) -> int:
+        return len(self.heap)
+    
+    def results(self) -> list[tuple[tuple, Any]]:
+        """Every item kept with its key, best first"""
+        return [(tuple(-value for value in key), item) for key, _, item in sorted(self.heap, reverse = True)]
+
+def _dominates(a: Union[tuple, np.ndarray], b: Union[tuple, np.ndarray]) -> bool:
+    return all(x <= y for x, y in zip(a, b)) and any(x < y for x, y in zip(a, b))
+
+class Skyline:
+    """Keeps the items which no other item is at least as good as in every key, and better in one"""
+    
+    def __init__(self):
+        self.frontier = []
+    
+    def push(self, key: tuple, item: Any) -> bool:
+        if any(_dominates(other, key) or other == key for other, _ in self.frontier):
+            return False
+        
+        # This item may be better than some which were on the frontier
+        self.frontier = [(other, other_item) for other, other_item in self.frontier if not _dominates(key, other)]
+        self.frontier.append((key, item))
+        
+        return True
+    
+    def push_many(self, keys: np.ndarray, items: np.ndarray):
+        # Leave out items which are no better than one already on the frontier
+        remaining = np.ones(len(keys), dtype = bool)
+        
+        for other, _ in self.frontier:
+            remaining &= np.any(keys < np.array(other), axis = 1)
+        
+        keys = keys[remaining]
+        items = items[remaining]
+        
+        # In lexicographic order, no item can be beaten by one after it, so the
+        # first remaining item is always on the frontier. Each item added rules
+        # out every item it is as good as or better than in all of the keys.
+        order = _lexsort(keys)
+        keys = keys[order]
+        remaining = np.ones(len(keys), dtype = bool)
+        
+        for i in range(len(keys)):
+            if not remaining[i]:
+                continue
+            
+            self.push(tuple(keys[i].tolist()), items[order[i]])
+            remaining[i:] &= np.any(keys[i:] < keys[i], axis = 1)
+    
+    def __len__(self) -> int:
+        return len(self.frontier)
+    
+    def results(self) -> list[tuple[tuple, Any]]:
+        """Every item on the frontier with its key, best first by the keys in order"""
+        return sorted(self.frontier, key = lambda entry: entry[0])
+
+def rank_trips(trips: Iterable[RoundTrip], objectives: Objectives, ranker: Union[TopK, Skyline]) -> list[RoundTrip]:
+    """Rank a stream of trips, holding only the ones which are kept"""
+    for trip in trips:
+        ranker.push(objectives.key(trip), trip)
+    
+    return [trip for _, trip in ranker.results()]
@@ -0,0 +1,156 @@
+from planner.eclipse import APRIL_8_2024, BesselianElements, contact_times, path_of_totality
+
+from functools import lru_cache
+from typing import Iterable, Mapping, Sequence, Union
+
+import math
+
+from scipy.spatial import cKDTree
+
+import numpy as np
+import pandas as pd
+
+# Mean radius of the Earth in kilometers
+EARTH_RADIUS = 6371.0
+
+def distance(a: Mapping, b: Mapping) -> float:
+    """Great circle distance in kilometers between two locations"""
+    lat1, lon1 = math.radians(a["latitude"]), math.radians(a["longitude"])
+    lat2, lon2 = math.radians(b["latitude"]), math.radians(b["longitude"])
+    
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(h))
+
+def unit_vectors(latitude: Union[float, np.ndarray], longitude: Union[float, np.ndarray]) -> np.ndarray:
+    """Points on the unit sphere, so that straight line distances between them order the same as great circle distances"""
+    phi, lam = np.radians(latitude), np.radians(longitude)
+    return np.stack((np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)), axis = -1)
+
+def _chord(kilometers: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+    return 2 * np.sin(np.minimum(kilometers / EARTH_RADIUS, np.pi) / 2)
+
+def _kilometers(chord: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+    return 2 * EARTH_RADIUS * np.arcsin(np.minimum(chord / 2, 1))
+
+@lru_cache(maxsize = None)
+def _path_tree(elements: BesselianElements) -> cKDTree:
+    return cKDTree(unit_vectors(*path_of_totality(elements)))
+
+class AirportTree:
+    """Airports by where they are on the globe, for finding every airport near a set of places at once"""
+    
+    def __init__(self, codes: Sequence[str], latitude: np.ndarray, longitude: np.ndarray):
+        self.codes = np.asarray(codes, dtype = str)
+        self.latitude = np.asarray(latitude, dtype = float)
+        self.longitude = np.asarray(longitude, dtype = float)
+        
+        self.tree = cKDTree(unit_vectors(self.latitude, self.longitude))
+    
+    @classmethod
+    def from_locations(cls, locations: Mapping[str, Mapping]) -> "AirportTree":
+        """The airports of an index, such as `AirportIndex.locations`
+        
+        The index only knows where each city is, so its airports are all placed at the city
+        and are 0 kilometers apart, as are DFW and DAL or LAX and BUR. Distances are between
+        cities, and are only as close to those between airports as the airports are to the city.
+        Load real airport locations with `from_csv` where that matters.
+        """
+        codes = list(locations)
+        
+        return cls(codes,
+                   [locations[code]["latitude"] for code in codes],
+                   [locations[code]["longitude"] for code in codes])
+    
+    @classmethod
+    def from_csv(cls, filepath: str) -> "AirportTree":
+        """Airports with scheduled flights from an airport database in the format of OurAirports' airports.csv"""
+        df = pd.read_csv(filepath, usecols = ["iata_code", "latitude_deg", "longitude_deg", "scheduled_service"],
+                         keep_default_na = False, na_values = {"latitude_deg": "", "longitude_deg": ""})
+        
+        df = df[(df["scheduled_service"] == "yes") & (df["iata_code"].str.len() == 3)].drop_duplicates("iata_code")
+        
+        return cls(df["iata_code"].to_numpy(), df["latitude_deg"].to_numpy(), df["longitude_deg"].to_numpy())
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+    
+    def within(
+        self,
+        latitude: Union[float, np.ndarray],
+        longitude: Union[float, np.ndarray],
+        radius: float,
+    ) -> list[list[str]]:
+        """For each place, the airports within `radius` kilometers of it, nearest first"""
+        points = unit_vectors(np.atleast_1d(latitude), np.atleast_1d(longitude))
+        results = []
+        
+        for point, rows in zip(points, self.tree.query_ball_point(points, _chord(radius))):
+            rows = np.asarray(rows, dtype = np.int64)
+            distances = np.linalg.norm(self.tree.data[rows] - point, axis = 1)
+            
+            results.append(self.codes[rows[np.argsort(distances, kind = "stable")]].tolist())
+        
+        return results
+    
+    def mates(self, radius: float) -> dict[str, tuple[str, ...]]:
+        """For each airport, the other airports within `radius` kilometers of it, such as those a short drive away"""
+        codes = self.codes.tolist()
+        mates = {code: [] for code in codes}
+        
+        for i, j in self.tree.query_pairs(_chord(radius), output_type = "ndarray").tolist():
+            # The same airport may be listed more than once, under several cities
+            if codes[i] != codes[j]:
+                mates[codes[i]].append(codes[j])
+                mates[codes[j]].append(codes[i])
+        
+        return {code: tuple(sorted(set(others))) for code, others in mates.items()}
+    
+    def path_distances(self, elements: BesselianElements = APRIL_8_2024, limit: float = np.inf) -> np.ndarray:
+        """How many kilometers each airport is from the path of totality, or 0 for those within it and inf past `limit`"""
+        # Bounding the search lets the tree skip most of the path for far away airports
+        bound = _chord(limit) if np.isfinite(limit) else np.inf
+        chords, _ = _path_tree(elements).query(self.tree.data, distance_upper_bound = bound)
+        distances = np.where(np.isinf(chords), np.inf, _kilometers(chords))
+        
+        # The path is only sampled every few kilometers, so check the airports inside it exactly
+        total = contact_times(self.latitude, self.longitude, elements = elements)["duration"] > np.timedelta64(0, "s")
+        return np.where(total, 0.0, distances)
+    
+    def near_path(self, radius: float, elements: BesselianElements = APRIL_8_2024) -> dict[str, float]:
+        """Airports within `radius` kilometers of the path of totality, with how far they are from it"""
+        distances = self.path_distances(elements, limit = radius)
+        near = np.flatnonzero(distances <= radius)
+        
+        return {code: float(distance) for code, distance in zip(self.codes[near].tolist(), distances[near].tolist())}
+
+def transfer_areas(tree: AirportTree, radius: float) -> dict[str, tuple[str, ...]]:
+    """Pairs of airports close enough to arrive at one and fly home from the other, named like cities for the index"""
+    areas = {}
+    
+    for code, others in tree.mates(radius).items():
+        for other in others:
+            pair = tuple(sorted((code, other)))
+            areas["/".join(pair)] = pair
+    
+    return areas
+
+def with_areas(
+    city2airports: Mapping[str, Iterable[str]],
+    airport2cities: Mapping[str, Iterable[str]],
+    areas: Mapping[str, tuple[str, ...]],
+) -> tuple[dict[str, tuple[str, ...]], dict[str, tuple[str, ...]]]:
+    """The cities of an index, along with the transfer areas, as if each area were another city"""
+    city2airports = {city: tuple(airports) for city, airports in city2airports.items()}
+    airport2cities = {airport: tuple(cities) for airport, cities in airport2cities.items()}
+    
+    for area, airports in areas.items():
+        # Airports already in a city together can be paired without an area
+        if any(airports[1] in city2airports[city] for city in airport2cities.get(airports[0], ())):
+            continue
+        
+        city2airports[area] = airports
+        
+        for airport in airports:
+            airport2cities[airport] = airport2cities.get(airport, ()) + (area,)
+    
+    return city2airports, airport2cities
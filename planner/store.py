@@ -0,0 +1,212 @@
+from planner.enums import FlightDirection
+from planner.flight import Flight, SharedValues
+
+from datetime import datetime, timedelta
+from typing import Generator, Iterable, Optional
+
+import json
+import os
+
+import numpy as np
+
+# Every flight is stored as one fixed size record. Airports are stored as their
+# position in the store's table of airports, times as whole seconds since the
+# epoch in the local time of the airport, and costs in whole dollars.
+FLIGHT_DTYPE = np.dtype([
+    ("departure_airport", "<u2"),
+    ("arrival_airport", "<u2"),
+    ("departure_time", "<i8"),
+    ("arrival_time", "<i8"),
+    ("leeway_time", "<i8"),
+    ("cost", "<i4"),
+])
+
+EPOCH = datetime(1970, 1, 1)
+SECOND = timedelta(seconds = 1)
+VERSION = 1
+
+def to_seconds(time: datetime) -> int:
+    return (time - EPOCH) // SECOND
+
+def from_seconds(seconds: int) -> datetime:
+    return EPOCH + int(seconds) * SECOND
+
+def _records_path(directory: str, direction: FlightDirection) -> str:
+    return os.path.join(directory, f"{direction.value}.bin")
+
+def _airports_path(directory: str) -> str:
+    return os.path.join(directory, "airports.json")
+
+class FlightWriter:
+    """Appends flights to a store as they are found"""
+    
+    def __init__(self, directory: str, buffer_size: int = 4096):
+        os.makedirs(directory, exist_ok = True)
+        
+        self.directory = directory
+        self.buffer_size = buffer_size
+        
+        # The bounds the search kept flights within, so that they are paired into trips with the same
+        self.constraints = None
+        
+        # Airports in the order they were first seen, shared by both directions
+        # so that codes can be compared across them
+        self.airports = []
+        self.codes = {}
+        
+        # A new store replaces whatever was there before
+        self.files = {direction: open(_records_path(directory, direction), "wb") for direction in FlightDirection}
+        self.buffers = {direction: [] for direction in FlightDirection}
+        
+        self._write_airports()
+    
+    def _code(self, airport: str) -> int:
+        code = self.codes.get(airport)
+        
+        if code is None:
+            code = self.codes[airport] = len(self.airports)
+            self.airports.append(airport)
+        
+        return code
+    
+    def _write_airports(self):
+        # Replace the table in one step, so that a reader never sees it half written
+        path = _airports_path(self.directory)
+        
+        with open(path + ".tmp", "w") as file:
+            json.dump({"version": VERSION, "airports": self.airports, "constraints": self.constraints}, file)
+        
+        os.replace(path + ".tmp", path)
+    
+    def set_constraints(self, constraints: Optional[dict]):
+        self.constraints = constraints
+        self._write_airports()
+    
+    def write(self, flight: Flight):
+        buffer = self.buffers[flight.direction]
+        
+        buffer.append((
+            self._code(flight.departure_airport),
+            self._code(flight.arrival_airport),
+            to_seconds(flight.departure_time),
+            to_seconds(flight.arrival_time),
+            flight.leeway_time // timedelta(seconds = 1),
+            flight.cost,
+        ))
+        
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+    
+    def write_all(self, flights: Iterable[Flight]):
+        for flight in flights:
+            self.write(flight)
+    
+    def flush(self):
+        # The airports must be written first, since the records refer to them
+        self._write_airports()
+        
+        for direction, buffer in self.buffers.items():
+            if buffer:
+                self.files[direction].write(np.array(buffer, dtype = FLIGHT_DTYPE).tobytes())
+                buffer.clear()
+            
+            self.files[direction].flush()
+    
+    def close(self):
+        self.flush()
+        
+        for file in self.files.values():
+            file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+class FlightTable:
+    """The flights of one direction in a store, mapped into memory"""
+    
+    def __init__(
+        self,
+        records: np.ndarray,
+        airports: np.ndarray,
+        direction: FlightDirection,
+        shared: Optional[SharedValues] = None,
+    ):
+        self.records = records
+        self.airports = airports
+        self.direction = direction
+        
+        # Flights read from the same store share their times, and those
+        # are let go along with the store
+        self.shared = shared if shared is not None else SharedValues()
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.records[name]
+    
+    def airport_names(self, column: str) -> np.ndarray:
+        return self.airports[self.records[column]]
+    
+    def times(self, column: str) -> np.ndarray:
+        return self.records[column].astype("datetime64[s]")
+    
+    def where(self, mask: np.ndarray) -> "FlightTable":
+        return FlightTable(self.records[mask], self.airports, self.direction, self.shared)
+    
+    def flight(self, i: int) -> Flight:
+        record = self.records[i]
+        
+        return Flight(str(self.airports[record["departure_airport"]]),
+                      str(self.airports[record["arrival_airport"]]),
+                      from_seconds(record["departure_time"]),
+                      from_seconds(record["arrival_time"]),
+                      leeway_time = timedelta(seconds = int(record["leeway_time"])),
+                      direction = self.direction,
+                      cost = int(record["cost"]),
+                      shared = self.shared)
+    
+    def flights(self) -> Generator[Flight, None, None]:
+        for i in range(len(self.records)):
+            yield self.flight(i)
+
+class FlightStore:
+    """A store of flights written by a search, read without loading it all into memory"""
+    
+    def __init__(self, directory: str):
+        with open(_airports_path(directory)) as file:
+            metadata = json.load(file)
+        
+        if metadata["version"] != VERSION:
+            raise ValueError(f"{directory} was written by an unsupported version of the flight store.")
+        
+        self.directory = directory
+        self.airports = np.array(metadata["airports"], dtype = str)
+        self.codes = {airport: code for code, airport in enumerate(metadata["airports"])}
+        
+        # Stores written before the constraints were saved don't have them
+        self.constraints = metadata.get("constraints")
+        
+        self.shared = SharedValues()
+        self.departing = self._open(FlightDirection.DEPARTING)
+        self.returning = self._open(FlightDirection.RETURNING)
+    
+    def _open(self, direction: FlightDirection) -> FlightTable:
+        path = _records_path(self.directory, direction)
+        
+        # A search which was cut short may have left part of a record behind
+        count = os.path.getsize(path) // FLIGHT_DTYPE.itemsize
+        
+        # An empty file can't be mapped
+        if count == 0:
+            records = np.empty(0, dtype = FLIGHT_DTYPE)
+        else:
+            records = np.memmap(path, dtype = FLIGHT_DTYPE, mode = "r", shape = (count,))
+        
+        return FlightTable(records, self.airports, direction, self.shared)
+    
+    def code(self, airport: str) -> Optional[int]:
+        return self.codes.get(airport)
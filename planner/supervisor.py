@@ -0,0 +1,164 @@
+from planner.api import API
+from planner.metrics import Metrics
+from planner.query import Query
+
+from threading import Lock
+from typing import Any, Callable, Optional
+from time import sleep
+
+import logging
+import random
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+class FailureLog:
+    """A structured record of every failed search attempt, kept in memory and appended to a file"""
+    
+    def __init__(self, filepath: Optional[str] = None):
+        self.filepath = filepath
+        self.entries = []
+        
+        # Pooled browsers share one log
+        self.lock = Lock()
+        self.file = None
+        
+        if filepath is not None:
+            directory = os.path.dirname(filepath)
+            
+            if directory:
+                os.makedirs(directory, exist_ok = True)
+            
+            self.file = open(filepath, "a")
+    
+    def record(self, query: Query, attempt: int, error: BaseException, gave_up: bool):
+        entry = dict(
+            time = time.time(),
+            query = str(query),
+            key = query.key(),
+            attempt = attempt,
+            error = type(error).__name__,
+            message = str(error).strip().splitlines()[0] if str(error).strip() else "",
+            gave_up = gave_up,
+        )
+        
+        with self.lock:
+            self.entries.append(entry)
+            
+            if self.file is not None:
+                self.file.write(json.dumps(entry) + "\n")
+                self.file.flush()
+    
+    def given_up(self) -> list[dict]:
+        """Failures of searches which were not retried again"""
+        with self.lock:
+            return [entry for entry in self.entries if entry["gave_up"]]
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+class Supervisor:
+    """Keeps one browser healthy over a long sweep, replacing it and retrying searches as needed"""
+    
+    def __init__(
+        self,
+        launch: Callable[[], API],
+        max_queries: Optional[int] = 100,
+        max_memory: Optional[int] = 1024 * 1024 * 1024,
+        retries: int = 3,
+        backoff: float = 2,
+        max_backoff: float = 60,
+        metrics: Optional[Metrics] = None,
+        failures: Optional[FailureLog] = None,
+    ):
+        self.launch = launch
+        
+        # Chrome grows over hundreds of searches, so start a new one every so often.
+        # The memory limit is on the page's JavaScript heap, in bytes, which is what
+        # grows as results pages pile up. Either limit is turned off by None or 0.
+        self.max_queries = max_queries
+        self.max_memory = max_memory
+        
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.failures = failures if failures is not None else FailureLog()
+        
+        self.api = None
+        self.queries = 0
+    
+    def start(self) -> API:
+        if self.api is None:
+            self.api = self.launch()
+            self.queries = 0
+        
+        return self.api
+    
+    def stop(self):
+        if self.api is None:
+            return
+        
+        # The browser may already be gone, which is often why it is being stopped
+        try:
+            self.api.close()
+        except Exception:
+            logger.debug("Failed to close the browser", exc_info = True)
+        
+        self.api = None
+    
+    def _needs_recycling(self) -> bool:
+        if self.max_queries and self.queries >= self.max_queries:
+            return True
+        
+        if not self.max_memory:
+            return False
+        
+        try:
+            return self.api.heap_size() > self.max_memory
+        except Exception:
+            # A browser which can't report its memory won't be much use for searching either
+            return True
+    
+    def _delay(self, attempt: int) -> float:
+        # Full jitter, so browsers which failed together don't all retry together
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+    
+    def fetch(self, query: Query, method: str = "fetch") -> Optional[Any]:
+        """What the browser's method returns for a query, by default its results page, or None if every attempt failed"""
+        for attempt in range(1, self.retries + 2):
+            try:
+                result = getattr(self.start(), method)(query)
+            except Exception as error:
+                gave_up = attempt > self.retries
+                self.failures.record(query, attempt, error, gave_up)
+                
+                # The browser may have crashed, hung or been left on an unexpected
+                # page, so the next attempt gets a new one
+                self.stop()
+                self.metrics.increment("browser_restarts")
+                
+                if gave_up:
+                    logger.error("Giving up on %s after %d attempts", query, attempt, exc_info = True)
+                    self.metrics.increment("queries_failed")
+                    return None
+                
+                delay = self._delay(attempt)
+                logger.warning("Search failed for %s, retrying in %.1fs: %r", query, delay, error)
+                self.metrics.increment("retries")
+                
+                sleep(delay)
+                continue
+            
+            self.queries += 1
+            
+            if self._needs_recycling():
+                logger.info("Recycling the browser after %d searches", self.queries)
+                self.metrics.increment("browser_recycles")
+                self.stop()
+            
+            return result
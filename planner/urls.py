@@ -0,0 +1,79 @@
+from planner.enums import TripType
+from planner.query import Query
+
+from datetime import datetime
+from urllib.parse import urlencode
+
+import base64
+
+# The search page reads the whole query from its `tfs` parameter, which is a
+# base64 encoded protocol buffer with the following layout:
+#
+#   message Airport    { int32 type = 1; string code = 2; }
+#   message FlightData { string date = 2; repeated Airport from = 13; repeated Airport to = 14; }
+#   message Info       { repeated FlightData data = 3; repeated int32 passengers = 8; int32 seat = 9; int32 trip = 19; }
+#
+# It is small enough that we write the wire format by hand.
+
+AIRPORT = 1
+
+ADULT = 1
+CHILD = 2
+INFANT_IN_SEAT = 3
+INFANT_ON_LAP = 4
+
+def _varint(value: int) -> bytes:
+    result = bytearray()
+
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+def _int_field(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+def _bytes_field(number: int, value: bytes) -> bytes:
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+def _airport(code: str) -> bytes:
+    return _int_field(1, AIRPORT) + _bytes_field(2, code.encode())
+
+def _leg(date: datetime, departing_from: tuple[str, ...], arriving_to: tuple[str, ...]) -> bytes:
+    message = _bytes_field(2, date.strftime("%Y-%m-%d").encode())
+
+    for code in departing_from:
+        message += _bytes_field(13, _airport(code))
+
+    for code in arriving_to:
+        message += _bytes_field(14, _airport(code))
+
+    return message
+
+def encode_query(query: Query) -> str:
+    message = _bytes_field(3, _leg(query.departure_date, query.departing_from, query.arriving_to))
+
+    # The return leg flies the same route in reverse
+    if query.trip == TripType.ROUNDTRIP:
+        message += _bytes_field(3, _leg(query.return_date, query.arriving_to, query.departing_from))
+
+    passengers = [ADULT] * query.adults + \
+                 [CHILD] * query.children + \
+                 [INFANT_IN_SEAT] * query.infants_in_seat + \
+                 [INFANT_ON_LAP] * query.infants_on_lap
+
+    message += _bytes_field(8, b"".join(_varint(passenger) for passenger in passengers))
+
+    # Seats are numbered from economy and trips from round trip, both starting at 1
+    message += _int_field(9, int(query.flight_class) - 2)
+    message += _int_field(19, int(query.trip) + 1)
+
+    return base64.urlsafe_b64encode(message).decode().rstrip("=")
+
+def search_url(endpoint: str, query: Query) -> str:
+    return endpoint + "?" + urlencode(dict(tfs = encode_query(query), hl = "en", curr = "USD"))
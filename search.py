@@ -1,9 +1,20 @@
-from planner.flight import FlightDirection, Flight
+from planner.flight import FlightDirection, Flight, SharedValues
 from planner.api import API, TripType, FlightClass
-from planner.utils import get_airport_to_eclipse_times, load_airports
+from planner.pool import APIPool
+from planner.cache import QueryCache
+from planner.journal import Journal
+from planner.query import Query, chunk_queries
+from planner.pruning import Constraints, QueryPlanner
+from planner.fares import FareFilter
+from planner.store import FlightWriter
+from planner.matcher import OnlineMatcher, OriginMatchers
+from planner.metrics import Metrics
+from planner.supervisor import FailureLog
+from planner.index import load_index
 
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Generator
+from typing import Generator, Iterable, Optional, Union
 
 from rich.progress import (
     Progress,
@@ -11,22 +22,103 @@ from rich.progress import (
     TextColumn,
     TimeElapsedColumn,
 )
+from rich.console import Console
+from rich.table import Table
 
-def fetch_departing_flights(
-    localized_events: dict[str, dict[str, datetime]],
-    *,
+# Dates to fly out to the eclipse on, and to fly home on
+DEPARTURE_DATES = [datetime(2024, 4, 7), datetime(2024, 4, 8)]
+RETURN_DATES = [datetime(2024, 4, 8)]
+
+def travel_dates(window: int = 0) -> tuple[list[datetime], list[datetime]]:
+    """Dates to fly out and home on, with `window` more days before and after the eclipse"""
+    departure_dates = [DEPARTURE_DATES[0] - timedelta(days = days) for days in range(window, 0, -1)] + DEPARTURE_DATES
+    return_dates = RETURN_DATES + [RETURN_DATES[-1] + timedelta(days = days) for days in range(1, window + 1)]
+    
+    return departure_dates, return_dates
+
+class SearchProgress(Progress):
+    """Progress bars, followed by the best round trips found so far"""
+    
+    def __init__(self, *columns, matchers: Optional[OriginMatchers] = None, **kwargs):
+        # Set first, since the display is rendered while it is being set up
+        self.matchers = matchers
+        super().__init__(*columns, **kwargs)
+    
+    def get_renderables(self):
+        yield self.make_tasks_table(self.tasks)
+        
+        if self.matchers is None:
+            return
+        
+        # Only name the city when travelers from several cities are searching together
+        for origin_city, matcher in self.matchers.items():
+            if matcher.num_trips:
+                yield trips_table(matcher, origin_city if len(self.matchers) > 1 else None)
+
+def trips_table(matcher: OnlineMatcher, origin_city: Optional[str] = None) -> Table:
+    origin = f" from {origin_city}" if origin_city is not None else ""
+    table = Table(title = f"Best of {matcher.num_trips} round trips{origin} by {matcher.objectives}", title_justify = "left")
+    
+    for column in ("Depart", "View at", "Return from", "Arrive home", "Setup", "Cleanup", "Travel", "Cost"):
+        table.add_column(column)
+    
+    for trip in matcher.results():
+        departing_flight, returning_flight = trip.departing_flight, trip.returning_flight
+        
+        table.add_row(f"{departing_flight.departure_airport} {departing_flight.departure_time:%b %-d %-I:%M %p}",
+                      f"{departing_flight.arrival_airport} {departing_flight.arrival_time:%b %-d %-I:%M %p}",
+                      f"{returning_flight.departure_airport} {returning_flight.departure_time:%b %-d %-I:%M %p}",
+                      f"{returning_flight.arrival_airport} {returning_flight.arrival_time:%b %-d %-I:%M %p}",
+                      str(trip.setup_time), str(trip.cleanup_time), str(trip.travel_time), f"${trip.cost}")
+    
+    return table
+
+def departing_queries(
     departing_airports: list[str],
     returning_airports: list[str],
-    api: API,
-) -> Generator[Flight, None, None]:
-    # Get departing flights
-    results = api.search(
-        departing_from = departing_airports,
-        arriving_to = returning_airports,
-        departure_date = [datetime(2024, 4, 7), datetime(2024, 4, 8)],
-        trip = TripType.ONEWAY,
-    )
+    query_planner: Optional[QueryPlanner] = None,
+    dates: list[datetime] = DEPARTURE_DATES,
+    fare_filter: Optional[FareFilter] = None,
+) -> Iterable[Query]:
+    # Leave out routes and dates which can't get us there in time
+    if query_planner is not None:
+        queries = query_planner.departing(departing_airports, returning_airports, dates)
+    else:
+        queries = chunk_queries(
+            departing_from = departing_airports,
+            arriving_to = returning_airports,
+            departure_date = dates,
+            trip = TripType.ONEWAY,
+        )
+    
+    # Only search the days whose cheapest fare fits in the budget
+    return fare_filter.filter(queries) if fare_filter is not None else queries
 
+def returning_queries(
+    departing_airports: list[str],
+    returning_airports: list[str],
+    query_planner: Optional[QueryPlanner] = None,
+    dates: list[datetime] = RETURN_DATES,
+    fare_filter: Optional[FareFilter] = None,
+) -> Iterable[Query]:
+    # Leave out routes and dates which can't leave at a good time after the eclipse
+    if query_planner is not None:
+        queries = query_planner.returning(departing_airports, returning_airports, dates)
+    else:
+        queries = chunk_queries(
+            departing_from = departing_airports,
+            arriving_to = returning_airports,
+            departure_date = dates,
+            trip = TripType.ONEWAY,
+        )
+    
+    return fare_filter.filter(queries) if fare_filter is not None else queries
+
+def to_departing_flights(
+    localized_events: dict[str, dict[str, datetime]],
+    results: Iterable,
+    shared: Optional[SharedValues] = None,
+) -> Generator[Flight, None, None]:
     for (departure_code, arrival_code), (takeoff_time, landing_time), cost in results:
         # If the cost is not available, skip this flight
         if cost is None:
@@ -47,25 +139,16 @@ def fetch_departing_flights(
                         takeoff_time, landing_time,
                         leeway_time = setup_time,
                         direction = FlightDirection.DEPARTING,
-                        cost = cost)
+                        cost = cost,
+                        shared = shared)
         
         yield flight
 
-def fetch_returning_flights(
+def to_returning_flights(
     localized_events: dict[str, dict[str, datetime]],
-    *,
-    departing_airports: list[str],
-    returning_airports: list[str],
-    api: API,
+    results: Iterable,
+    shared: Optional[SharedValues] = None,
 ) -> Generator[Flight, None, None]:
-    # Get returning flights
-    results = api.search(
-        departing_from = departing_airports,
-        arriving_to = returning_airports,
-        departure_date = [datetime(2024, 4, 8)],
-        trip = TripType.ONEWAY,
-    )
-
     for (departure_code, arrival_code), (takeoff_time, landing_time), cost in results:
         # If the cost is not available, skip this flight
         if cost is None:
@@ -86,95 +169,205 @@ def fetch_returning_flights(
                         takeoff_time, landing_time,
                         leeway_time = cleanup_time,
                         direction = FlightDirection.RETURNING,
-                        cost = cost)
+                        cost = cost,
+                        shared = shared)
         
         yield flight
 
-def search(debug: bool = False) -> tuple[list[Flight], list[Flight]]:
-    # Initialize API
-    api = API(debug = debug)
+def fetch_round_trip_flights(
+    localized_events: dict[str, dict[str, datetime]],
+    *,
+    origin_airports: list[str],
+    viewing_airports: list[str],
+    city2airports: dict[str, list[str]],
+    airport2cities: dict[str, list[str]],
+    api: Union[API, APIPool],
+    query_planner: Optional[QueryPlanner] = None,
+    departure_dates: list[datetime] = DEPARTURE_DATES,
+    return_dates: list[datetime] = RETURN_DATES,
+    fare_filter: Optional[FareFilter] = None,
+) -> Generator[Flight, None, None]:
+    # Searches which have yet to be started. Returning searches are put at the
+    # front, so that complete round trips are found as early as possible.
+    pending = deque(departing_queries(origin_airports, viewing_airports, query_planner, departure_dates, fare_filter))
+    returning = set()
+    
+    # Flights found by this sweep share their times, until the sweep is done
+    shared = SharedValues()
     
-    # Load origin and eclipse viewing airports
-    origin_airports, viewing_airports, city2airports, airport2cities = load_airports("data/processed.csv")
+    # Airports we have already decided to search for returning flights from,
+    # and those among them which are waiting for enough airports to fill a search
+    queued_airports = set()
+    waiting_airports = []
     
-    # Get eclipse event times at each airport
-    localized_events = get_airport_to_eclipse_times("data/processed.csv")
+    def queue_returning_searches(airports: list[str]):
+        queries = list(returning_queries(airports, origin_airports, query_planner, return_dates, fare_filter))
+        returning.update(queries)
+        pending.extendleft(reversed(queries))
+    
+    def next_queries() -> Generator[Query, None, None]:
+        while pending or waiting_airports:
+            # Nothing else is left to search, so don't wait for a full search
+            if not pending:
+                queue_returning_searches(waiting_airports)
+                waiting_airports.clear()
+                
+                # Every route from them may have been pruned, or only went home to where it came from
+                continue
+            
+            yield pending.popleft()
+    
+    # Results can queue more searches after the API has already asked for the
+    # next search and been told there are none, so keep going until none remain
+    while pending or waiting_airports:
+        for query, results in api.stream(next_queries()):
+            if query in returning:
+                yield from to_returning_flights(localized_events, results, shared)
+                continue
+            
+            for flight in to_departing_flights(localized_events, results, shared):
+                yield flight
+                
+                # Determine airports we can use to return home after viewing the eclipse
+                #
+                # NOTE: If a city has multiple airports, we can view the eclipse at one and depart from another.
+                #       For example, Dallas has two airports: DFW and DAL. We can view the eclipse at DFW and
+                #       depart for home from DAL.
+                #
+                # We are arriving at some airport to view the eclipse. Let's get all of the cities
+                # which share this airport.
+                for city in airport2cities[flight.arrival_airport]:
+                    # Then, get all of the airports used by all of these cities. This is
+                    # effectively the list of airports we can use for returning home.
+                    for airport in city2airports[city]:
+                        if airport not in queued_airports:
+                            queued_airports.add(airport)
+                            waiting_airports.append(airport)
+            
+            # Search from as many airports at once as a search allows
+            while len(waiting_airports) >= 7:
+                queue_returning_searches(waiting_airports[:7])
+                del waiting_airports[:7]
 
+def search(
+    debug: bool = False,
+    workers: int = 1,
+    cache: Optional[QueryCache] = None,
+    direct: bool = True,
+    parse_workers: int = 0,
+    journal: Optional[Journal] = None,
+    constraints: Optional[Constraints] = Constraints(),
+    origin_cities: Union[str, Iterable[str]] = "Los Angeles",
+    store: Optional[FlightWriter] = None,
+    top: int = 10,
+    metrics: Optional[Metrics] = None,
+    lean: bool = False,
+    failures: Optional[FailureLog] = None,
+    retries: int = 3,
+    recycle_after: Optional[int] = 100,
+    max_memory: Optional[int] = 1024 * 1024 * 1024,
+    window: int = 0,
+    budget: Optional[int] = None,
+    transfer_radius: Optional[float] = None,
+    path_radius: Optional[float] = None,
+) -> tuple[list[Flight], list[Flight]]:
+    if not isinstance(origin_cities, str):
+        origin_cities = tuple(origin_cities)
+    
+    # Load origin and eclipse viewing airports, along with the eclipse event times and location of each.
+    # Travelers from every origin share one search, so a route is only searched once however many
+    # travelers could take it, and their flights are only split apart when they are paired into trips.
+    index = load_index("data/processed.csv", origin_cities = origin_cities,
+                       transfer_radius = transfer_radius, path_radius = path_radius)
+    localized_events = index.events
+    
+    # Flights on the extra days of the window land earlier, or take off later, by as many days
+    bounds = (constraints if constraints is not None else Constraints()).widened(window)
+    
+    # Plan searches which can only yield flights within the constraints
+    if constraints is not None:
+        query_planner = QueryPlanner(localized_events, index.locations, bounds)
+    else:
+        query_planner = None
+    
+    # Pair each traveler's flights into round trips as they are found, so the best can be shown during the search
+    if top > 0:
+        matchers = OriginMatchers(index.origin_cities, index.city2airports, index.airport2cities, k = top,
+                                  constraints = bounds)
+    else:
+        matchers = None
+    
+    # Save the bounds with the flights, so that match.py pairs them into the same trips
+    if store is not None:
+        store.set_constraints(bounds.to_json())
+    
     # Create progress bar
-    progress = Progress(
+    progress = SearchProgress(
         SpinnerColumn(),
         *Progress.get_default_columns(),
         TextColumn("[blue]{task.completed} flights"),
         TimeElapsedColumn(),
+        matchers = matchers,
     )
-        
-    with progress:
-        # Create progress bar task for departing flights
-        departing_task = progress.add_task("[green]Searching for departing flights...", total = None)
     
-        # Query the API for departing flights
-        results = fetch_departing_flights(localized_events,
-                                          departing_airports = origin_airports,
-                                          returning_airports = viewing_airports,
-                                          api = api)
-        
-        # Fetch departing flights
-        departing_flights = set()
-        
-        for flight in results:
-            if flight in departing_flights:
-                continue
-
-            departing_flights.add(flight)
-            
-            # Update progress bar
-            progress.update(departing_task, advance = 1)
-        
-        # End the departing flights task
-        progress.stop_task(departing_task)
-        
-        # Determine airports we can use to return home after viewing the eclipse
-        #
-        # NOTE: If a city has multiple airports, we can view the eclipse at one and depart from another.
-        #       For example, Dallas has two airports: DFW and DAL. We can view the eclipse at DFW and
-        #       depart for home from DAL.
-        returning_airports = set()
-        
-        for flight in departing_flights:
-            # We are arriving at some airport to view the eclipse. Let's get all of the cities
-            # which share this airport.
-            for city in airport2cities[flight.arrival_airport]:
-                # Then, get all of the airports used by all of these cities. This is 
-                # effectively the list of airports we can use for returning home.
-                for airport in city2airports[city]:
-                    returning_airports.add(airport)
-                    
-        returning_airports = list(returning_airports)
-        
-        # Create progress bar task for returning flights
+    # Initialize API. Even a single browser is run in a pool, so that it is
+    # restarted and its searches retried if it crashes, hangs or grows too large.
+    api = APIPool(workers = workers, debug = debug, cache = cache, journal = journal, direct = direct,
+                  parse_workers = parse_workers, metrics = metrics, lean = lean, failures = failures,
+                  retries = retries, max_queries = recycle_after, max_memory = max_memory)
+    
+    # Check the fares for a whole route at once, and only search the days which fit the budget
+    fare_filter = FareFilter(api, budget) if budget is not None else None
+    departure_dates, return_dates = travel_dates(window)
+    
+    # The browsers are closed however the search ends
+    with api, progress:
+        # Create progress bar tasks for both directions, which are searched at the same time
+        departing_task = progress.add_task("[green]Searching for departing flights...", total = None)
         returning_task = progress.add_task("[red]Searching for returning flights...", total = None)
         
-        # Query the API for returning flights
-        results = fetch_returning_flights(localized_events,
-                                          departing_airports = returning_airports,
-                                          returning_airports = origin_airports,
-                                          api = api)
+        # Query the API for departing flights, and for returning flights from
+        # each viewing city as soon as we find a way to get there
+        results = fetch_round_trip_flights(localized_events,
+                                           origin_airports = list(index.origins),
+                                           viewing_airports = list(index.targets),
+                                           city2airports = index.city2airports,
+                                           airport2cities = index.airport2cities,
+                                           api = api,
+                                           query_planner = query_planner,
+                                           departure_dates = departure_dates,
+                                           return_dates = return_dates,
+                                           fare_filter = fare_filter)
         
-        # Fetch returning flights
+        # Fetch flights
+        departing_flights = set()
         returning_flights = set()
         
         for flight in results:
-            if flight in returning_flights:
+            if flight.direction == FlightDirection.DEPARTING:
+                flights, task = departing_flights, departing_task
+            else:
+                flights, task = returning_flights, returning_task
+            
+            if flight in flights:
                 continue
             
-            returning_flights.add(flight)
+            flights.add(flight)
+            
+            # Save each flight as soon as it is found
+            if store is not None:
+                store.write(flight)
+            
+            if matchers is not None:
+                matchers.add(flight)
             
             # Update progress bar
-            progress.update(returning_task, advance = 1)
+            progress.update(task, advance = 1)
         
-        # End the returning flights task
+        # End the flight tasks
+        progress.stop_task(departing_task)
         progress.stop_task(returning_task)
-        
+    
     # Sort flights by cost
     get_cost = lambda flight: flight.cost
     
@@ -184,12 +377,76 @@ def search(debug: bool = False) -> tuple[list[Flight], list[Flight]]:
     return departing_flights, returning_flights
 
 if __name__ == "__main__":
-    import pickle
+    import argparse
+    
+    parser = argparse.ArgumentParser(description = "Search for flights to and from the eclipse")
+    parser.add_argument("--debug", action = "store_true", help = "show the browser window")
+    parser.add_argument("--origin-city", nargs = "+", default = ["Los Angeles"],
+                        help = "cities to fly out of and back home to, searched together, from the eclipse table or data/origins.csv")
+    parser.add_argument("--workers", type = int, default = 1, help = "number of browsers to search with in parallel")
+    parser.add_argument("--cache", default = "output/cache.sqlite", help = "file to cache search results in")
+    parser.add_argument("--cache-ttl", type = float, default = 1, help = "hours a cached search result stays fresh")
+    parser.add_argument("--no-cache", action = "store_true", help = "always search the website")
+    parser.add_argument("--parse-workers", type = int, default = 0, help = "number of processes to parse pages with in the background")
+    parser.add_argument("--journal", default = "output/journal.jsonl", help = "file to record completed searches in")
+    parser.add_argument("--resume", action = "store_true", help = "skip searches which the journal shows were already completed")
+    parser.add_argument("--lean", action = "store_true", help = "don't load images, fonts or tracking, and turn off unneeded browser features")
+    parser.add_argument("--form", action = "store_true", help = "fill in the search form instead of opening results from a link")
+    parser.add_argument("--min-setup", type = float, default = 2, help = "fewest hours to set up before the eclipse begins")
+    parser.add_argument("--max-setup", type = float, default = 8, help = "most hours to wait before the eclipse begins")
+    parser.add_argument("--min-cleanup", type = float, default = 2, help = "fewest hours to clean up after the eclipse ends")
+    parser.add_argument("--max-cleanup", type = float, default = 8, help = "most hours to wait after the eclipse ends")
+    parser.add_argument("--max-travel", type = float, default = 18, help = "longest flight in hours, including connections")
+    parser.add_argument("--output", default = "output/flights", help = "directory to store the flights found in")
+    parser.add_argument("--top", type = int, default = 10, help = "number of the best round trips to show while searching, or 0 for none")
+    parser.add_argument("--metrics", default = "output/metrics.json", help = "file to save timings to, in the Prometheus text format if it ends with .prom")
+    parser.add_argument("--retries", type = int, default = 3, help = "times to retry a failed search, with a new browser each time")
+    parser.add_argument("--recycle-after", type = int, default = 100, help = "searches after which each browser is replaced, or 0 to never replace them")
+    parser.add_argument("--max-memory", type = float, default = 1024, help = "megabytes of JavaScript heap on the page after which a browser is replaced, or 0 for no limit")
+    parser.add_argument("--failures", default = "output/failures.jsonl", help = "file to record failed searches in")
+    parser.add_argument("--window", type = int, default = 0, help = "days earlier to fly out and later to fly home on, besides the eclipse, which lengthen the setup and cleanup windows by as many days")
+    parser.add_argument("--budget", type = int, help = "most dollars to pay for a round trip, skipping days whose cheapest flight costs more")
+    parser.add_argument("--no-prune", action = "store_true", help = "search every route and date, even those which can't be used")
+    parser.add_argument("--transfer-radius", type = float, help = "kilometers within which to fly home from a different airport than the one arrived at")
+    parser.add_argument("--path-radius", type = float, help = "only view from airports within this many kilometers of the path of totality")
+    args = parser.parse_args()
+    
+    cache = None if args.no_cache else QueryCache(args.cache, ttl = timedelta(hours = args.cache_ttl))
+    
+    journal = Journal(args.journal, resume = args.resume)
+    
+    constraints = None if args.no_prune else Constraints(
+        min_setup_time = timedelta(hours = args.min_setup),
+        max_setup_time = timedelta(hours = args.max_setup),
+        min_cleanup_time = timedelta(hours = args.min_cleanup),
+        max_cleanup_time = timedelta(hours = args.max_cleanup),
+        max_travel_time = timedelta(hours = args.max_travel),
+    )
+    
+    store = FlightWriter(args.output)
+    metrics = Metrics()
+    failures = FailureLog(args.failures)
+    
+    departing_flights, returning_flights = search(debug = args.debug, workers = args.workers, cache = cache,
+                                                  direct = not args.form, parse_workers = args.parse_workers,
+                                                  journal = journal, constraints = constraints,
+                                                  origin_cities = args.origin_city, store = store, top = args.top,
+                                                  metrics = metrics, lean = args.lean, failures = failures,
+                                                  retries = args.retries, recycle_after = args.recycle_after or None,
+                                                  max_memory = int(args.max_memory * 1024 * 1024) or None,
+                                                  window = args.window, budget = args.budget,
+                                                  transfer_radius = args.transfer_radius, path_radius = args.path_radius)
+    
+    store.close()
+    journal.close()
+    failures.close()
     
-    departing_flights, returning_flights = search()
+    # Show where the time went, and save it to compare against later runs
+    Console().print(metrics.summary())
+    metrics.export(args.metrics)
     
-    with open("output/departing.pkl", "wb") as file:
-        pickle.dump(departing_flights, file)
+    # Searches which failed every time are left out of the journal, so resuming will try them again
+    given_up = failures.given_up()
     
-    with open("output/returning.pkl", "wb") as file:
-        pickle.dump(returning_flights, file)
\ No newline at end of file
+    if given_up:
+        print(f"{len(given_up)} searches failed, see {args.failures} for details and run with --resume to retry them")
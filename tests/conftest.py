@@ -0,0 +1,58 @@
+from planner.enums import FlightDirection
+from planner.flight import Flight
+from planner.store import FlightStore, FlightWriter
+
+from datetime import datetime, timedelta
+
+import random
+
+# Airports to fly out of and home to, and airports to view the eclipse from,
+# with cities of more than one airport on both sides
+HOME_AIRPORTS = ["LAX", "BUR", "DEN"]
+VIEWING_AIRPORTS = ["DFW", "DAL", "AUS", "SAT", "IND", "CLE"]
+AIRPORTS = HOME_AIRPORTS + VIEWING_AIRPORTS
+
+CITY2AIRPORTS = {
+    "Los Angeles": ("LAX", "BUR"),
+    "Denver": ("DEN",),
+    "Dallas": ("DFW", "DAL"),
+    "Austin": ("AUS",),
+    "San Antonio": ("SAT",),
+    "Indianapolis": ("IND",),
+    "Cleveland": ("CLE",),
+}
+
+AIRPORT2CITIES = {airport: tuple(city for city, airports in CITY2AIRPORTS.items() if airport in airports) for airport in AIRPORTS}
+
+# Flights take off over the two days from here
+START = datetime(2024, 4, 7)
+
+def random_flights(num_flights: int, seed: int, round_trips: bool = True) -> list[Flight]:
+    """Flights out from a home airport to a viewing airport and back, or between any two airports"""
+    rng = random.Random(seed)
+    flights = []
+    
+    for _ in range(num_flights):
+        direction = rng.choice(list(FlightDirection))
+        
+        if round_trips:
+            home, viewing = rng.choice(HOME_AIRPORTS), rng.choice(VIEWING_AIRPORTS)
+            departure_airport, arrival_airport = (home, viewing) if direction == FlightDirection.DEPARTING else (viewing, home)
+        else:
+            departure_airport, arrival_airport = rng.sample(AIRPORTS, 2)
+        
+        departure_time = START + timedelta(minutes = rng.randrange(0, 48 * 60, 5))
+        arrival_time = departure_time + timedelta(minutes = rng.randrange(45, 400, 5))
+        
+        flights.append(Flight(departure_airport, arrival_airport, departure_time, arrival_time,
+                              leeway_time = timedelta(minutes = rng.randrange(0, 12 * 60, 15)),
+                              direction = direction,
+                              cost = rng.randrange(40, 500)))
+    
+    return flights
+
+def random_store(directory: str, num_flights: int, seed: int, round_trips: bool = True) -> FlightStore:
+    with FlightWriter(directory) as writer:
+        writer.write_all(random_flights(num_flights, seed, round_trips))
+    
+    return FlightStore(directory)
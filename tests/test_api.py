@@ -0,0 +1,84 @@
+from planner.api import API, BaseAPI, TripType
+from planner.metrics import Metrics
+from planner.query import Query
+
+from datetime import datetime
+
+import pytest
+
+QUERY = Query(departing_from = ["LAX"], arriving_to = ["DFW"], departure_date = datetime(2024, 4, 7), trip = TripType.ONEWAY)
+
+class FakeDriver:
+    """A page whose waits end the way they are told to, in turn, as (found, number of flights)"""
+    
+    def __init__(self, waits: list):
+        self.waits = list(waits)
+        self.loaded = []
+        self.blocked = None
+        self.page_source = "<html></html>"
+    
+    def get(self, url: str):
+        self.loaded.append(url)
+    
+    def execute_async_script(self, script: str, selector: str, more_than: int, otherwise, timeout: float):
+        found, count = self.waits.pop(0)
+        return [found, count, 10.0, 1]
+    
+    def execute_script(self, script: str):
+        return None
+    
+    def execute_cdp_cmd(self, command: str, params: dict):
+        if command == "Network.setBlockedURLs":
+            self.blocked = params["urls"]
+
+def browser(waits: list, lean: bool = True) -> API:
+    # A browser without Chrome behind it
+    api = API.__new__(API)
+    api.driver = FakeDriver(waits)
+    api.metrics = Metrics()
+    api.endpoint = API.endpoint
+    api.direct = True
+    api.lean = lean
+    api.form = None
+    api.results_timeout = 1
+    api.expand_timeout = 1
+    api.parser = None
+    
+    return api
+
+def test_route_without_flights_keeps_blocking():
+    # The page says there are no flights, which it can do with everything blocked
+    api = browser([(True, 0)])
+    api._open_results(QUERY)
+    
+    assert api.lean
+    assert api.driver.blocked is None
+    assert len(api.driver.loaded) == 1
+
+def test_blocking_stops_when_nothing_shows():
+    api = browser([(False, 0), (True, 3)])
+    
+    assert api._open_results(QUERY)
+    assert not api.lean
+    assert api.driver.blocked == []
+    assert len(api.driver.loaded) == 2
+
+def test_route_without_flights_is_answered_by_the_link():
+    api = browser([(True, 0)], lean = False)
+    
+    assert api._open_results(QUERY)
+    assert api.direct
+
+def test_link_which_never_renders_is_not_tried_again():
+    api = browser([(False, 0)], lean = False)
+    
+    assert not api._open_results(QUERY)
+    assert not api.direct
+
+def test_incomplete_api_fails_when_created():
+    class StreamOnly(BaseAPI):
+        def stream(self, queries):
+            yield from ()
+    
+    with pytest.raises(TypeError):
+        StreamOnly()
@@ -0,0 +1,82 @@
+from planner import cache
+from planner.cache import QueryCache
+from planner.query import Query
+
+from datetime import datetime, timedelta
+
+import pytest
+
+DATE = datetime(2024, 4, 7)
+
+class Clock:
+    """Stands in for the time module, so that entries can be aged without waiting"""
+    
+    def __init__(self):
+        self.now = 1_700_000_000.0
+    
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    
+    return clock
+
+def query(departing_from: list, arriving_to: tuple = ("DFW",)) -> Query:
+    return Query(departing_from = departing_from, arriving_to = arriving_to, departure_date = DATE, return_date = datetime(2024, 4, 8))
+
+def rows(departure_airport: str, price: int = 100) -> list:
+    return [((departure_airport, "DFW"), (DATE.replace(hour = 6), DATE.replace(hour = 9)), price)]
+
+def test_airport_order_and_case_hit_the_same_entry(tmp_path, clock):
+    results = QueryCache(str(tmp_path / "cache.sqlite"))
+    results.put(query(["LAX", "bur"]), rows("LAX"))
+    
+    assert results.get(query(["BUR", "lax"])) == rows("LAX")
+    assert results.get(query(["LAX"])) is None
+    
+    results.close()
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    results = QueryCache(str(tmp_path / "cache.sqlite"), ttl = timedelta(hours = 1))
+    results.put(query(["LAX"]), rows("LAX"))
+    
+    clock.now += 30 * 60
+    results.put(query(["BUR"]), rows("BUR"))
+    
+    clock.now += 40 * 60
+    
+    assert results.get(query(["LAX"])) is None
+    assert results.get(query(["BUR"])) == rows("BUR")
+    
+    # Expired entries are deleted the next time anything is added
+    results.put(query(["ONT"]), rows("ONT"))
+    keys = [key for key, in results.connection.execute("SELECT key FROM results")]
+    
+    assert keys == [query(["BUR"]).key(), query(["ONT"]).key()]
+    
+    results.close()
+
+def test_oldest_entries_are_evicted_to_fit(tmp_path, clock):
+    size = len(cache.json.dumps(cache.encode_rows(rows("LAX"))))
+    results = QueryCache(str(tmp_path / "cache.sqlite"), max_size = 2 * size)
+    
+    for departure_airport in ("LAX", "BUR", "ONT"):
+        results.put(query([departure_airport]), rows(departure_airport))
+        clock.now += 1
+    
+    assert results.get(query(["LAX"])) is None
+    assert results.get(query(["BUR"])) == rows("BUR")
+    assert results.get(query(["ONT"])) == rows("ONT")
+    
+    # Reading an entry doesn't keep it any longer, only replacing it does
+    results.put(query(["BUR"]), rows("BUR", price = 90))
+    clock.now += 1
+    results.put(query(["SNA"]), rows("SNA"))
+    
+    assert results.get(query(["ONT"])) is None
+    assert results.get(query(["BUR"])) == rows("BUR", price = 90)
+    
+    results.close()
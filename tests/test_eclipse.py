@@ -0,0 +1,81 @@
+from planner.eclipse import contact_times
+from planner.index import UTC_OFFSETS, load_index, table_times
+
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import pytest
+
+TABLE = pd.read_csv("data/processed.csv")
+
+def local_contacts() -> dict[str, np.ndarray]:
+    contacts = contact_times(TABLE["latitude"].to_numpy(), TABLE["longitude"].to_numpy())
+    offsets = pd.to_timedelta(TABLE["tz"].map(UTC_OFFSETS), unit = "h").to_numpy()
+    
+    return {name: times + offsets if times.dtype.kind == "M" else times for name, times in contacts.items()}
+
+def seconds_apart(times: np.ndarray, column: str) -> np.ndarray:
+    return np.abs((times - pd.to_datetime(TABLE[column]).to_numpy()) / np.timedelta64(1, "s"))
+
+def test_first_and_last_contacts_match_the_table():
+    contacts = local_contacts()
+    partial = ~TABLE["visibility"].str.startswith("Total").to_numpy()
+    
+    assert np.all(seconds_apart(contacts["c1"], "partial_begins") <= 1)
+    
+    # The table only gives the last contact for cities outside of totality
+    assert partial.any()
+    assert np.all(seconds_apart(contacts["c4"], "partial_ends")[partial] <= 1)
+
+def test_totality_matches_the_table():
+    contacts = local_contacts()
+    total = TABLE["visibility"].str.startswith("Total").to_numpy()
+    
+    assert np.array_equal(~np.isnat(contacts["c2"]), total)
+    assert np.all((contacts["duration"] > np.timedelta64(0, "s")) == total)
+    
+    # The duration column is of the whole eclipse, from first to last contact
+    whole = (contacts["c4"] - contacts["c1"] - pd.to_timedelta(TABLE["duration"]).to_numpy()) / np.timedelta64(1, "s")
+    assert np.all(np.abs(whole) <= 2)
+
+def test_table_times_match_every_column():
+    times = table_times(local_contacts())
+    
+    for column in ("partial_begins", "maximum", "partial_ends"):
+        assert np.all(seconds_apart(times[column], column) <= 2), column
+
+def test_no_eclipse_far_away():
+    contacts = contact_times(np.array([-40.0, 60.0]), np.array([150.0, 100.0]))
+    
+    assert np.all(np.isnat(contacts["c1"]))
+    assert np.all(contacts["magnitude"] == 0)
+
+@pytest.fixture
+def untimed_table(tmp_path) -> str:
+    # The same table with the times of some cities left out, to be worked out instead
+    table = TABLE.copy()
+    table.loc[::3, ["partial_begins", "maximum", "partial_ends"]] = None
+    
+    table.to_csv(tmp_path / "processed.csv", index = False)
+    shutil.copy("data/origins.csv", tmp_path / "origins.csv")
+    
+    return str(tmp_path / "processed.csv")
+
+def test_worked_out_times_agree_with_the_table(untimed_table: str):
+    index = load_index("data/processed.csv")
+    untimed = load_index(untimed_table)
+    
+    assert list(untimed.events) == list(index.events)
+    
+    for airport in index.events:
+        for name in ("start", "maximum", "end"):
+            assert abs((untimed.events[airport][name] - index.events[airport][name]).total_seconds()) <= 2
+
+def test_home_airports_have_no_eclipse():
+    index = load_index("data/processed.csv", origin_cities = ("Los Angeles", "Chicago"))
+    
+    assert "ORD" in index.origins
+    assert "ORD" not in index.events
+    assert all(airport in index.events for airport in index.targets)
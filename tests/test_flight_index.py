@@ -0,0 +1,66 @@
+from planner.enums import FlightDirection
+from planner.flight import Flight
+from planner.flight_index import FlightIndex
+
+from conftest import random_store
+
+from datetime import datetime, timedelta
+
+import pytest
+
+@pytest.fixture(scope = "module")
+def index(tmp_path_factory) -> FlightIndex:
+    return FlightIndex(random_store(str(tmp_path_factory.mktemp("flights")), 500, 0))
+
+def brute_force(index: FlightIndex, direction: FlightDirection, airports, leeway_range, time_range, max_cost) -> set[Flight]:
+    flights = set()
+    
+    for flight in index.tables[direction].flights():
+        airport = flight.arrival_airport if direction == FlightDirection.DEPARTING else flight.departure_airport
+        time = flight.arrival_time if direction == FlightDirection.DEPARTING else flight.departure_time
+        
+        if airports is not None and airport not in airports:
+            continue
+        
+        if not all(check for check in (
+            leeway_range[0] is None or flight.leeway_time >= leeway_range[0],
+            leeway_range[1] is None or flight.leeway_time <= leeway_range[1],
+            time_range[0] is None or time >= time_range[0],
+            time_range[1] is None or time <= time_range[1],
+            max_cost is None or flight.cost <= max_cost,
+        )):
+            continue
+        
+        flights.add(flight)
+    
+    return flights
+
+@pytest.mark.parametrize("direction", list(FlightDirection))
+@pytest.mark.parametrize("airports", [None, ["AUS"], ["DFW", "DAL", "SEA"]])
+@pytest.mark.parametrize("leeway_range", [
+    (None, None),
+    (timedelta(hours = 2), timedelta(hours = 8)),
+    (None, timedelta(hours = 3)),
+    (timedelta(hours = 6), None),
+])
+@pytest.mark.parametrize("time_range", [
+    (None, None),
+    (datetime(2024, 4, 8, 6), datetime(2024, 4, 8, 12)),
+    (datetime(2024, 4, 8, 15), None),
+])
+@pytest.mark.parametrize("max_cost", [None, 200])
+def test_matches_brute_force(index: FlightIndex, direction, airports, leeway_range, time_range, max_cost):
+    table = index.query(direction, airports = airports, leeway_range = leeway_range, time_range = time_range, max_cost = max_cost)
+    
+    assert set(table.flights()) == brute_force(index, direction, airports, leeway_range, time_range, max_cost)
+    assert len(set(table.flights())) == len(table)
+
+def test_bounds_are_inclusive(index: FlightIndex):
+    flight = next(index.tables[FlightDirection.DEPARTING].flights())
+    
+    table = index.query(FlightDirection.DEPARTING,
+                        airports = [flight.arrival_airport],
+                        leeway_range = (flight.leeway_time, flight.leeway_time),
+                        time_range = (flight.arrival_time, flight.arrival_time))
+    
+    assert flight in set(table.flights())
@@ -0,0 +1,115 @@
+from planner.enums import FlightDirection
+from planner.flight import Flight
+from planner.itinerary import LegIndex
+from planner.store import FlightStore, FlightWriter
+
+from conftest import random_store
+
+from datetime import datetime, timedelta
+
+import pytest
+
+ORIGINS = ["LAX", "DEN"]
+DESTINATIONS = ["AUS", "SAT", "IND", "CLE"]
+
+DEPART_AFTER = datetime(2024, 4, 7, 6)
+DEADLINE = datetime(2024, 4, 8, 14)
+CONNECTION = timedelta(hours = 2)
+
+def brute_force(store: FlightStore, max_legs: int) -> tuple[dict, dict]:
+    """The soonest arrival and lowest cost at each destination, from every itinerary there is"""
+    flights = list(store.departing.flights()) + list(store.returning.flights())
+    soonest, cheapest = {}, {}
+    
+    def extend(itinerary: list[Flight]):
+        last = itinerary[-1]
+        
+        if last.arrival_airport in DESTINATIONS and last.arrival_time <= DEADLINE:
+            airport = last.arrival_airport
+            soonest[airport] = min(soonest.get(airport, last.arrival_time), last.arrival_time)
+            cheapest[airport] = min(cheapest.get(airport, 10 ** 9), sum(flight.cost for flight in itinerary))
+        
+        if len(itinerary) == max_legs:
+            return
+        
+        for flight in flights:
+            if flight.departure_airport == last.arrival_airport and flight.departure_time >= last.arrival_time + CONNECTION:
+                extend(itinerary + [flight])
+    
+    for flight in flights:
+        if flight.departure_airport in ORIGINS and flight.departure_time >= DEPART_AFTER:
+            extend([flight])
+    
+    return soonest, cheapest
+
+def check(itinerary, max_legs: int):
+    flights = itinerary.flights
+    
+    assert 1 <= len(flights) <= max_legs
+    assert itinerary.departure_airport in ORIGINS
+    assert itinerary.departure_time >= DEPART_AFTER
+    assert itinerary.arrival_time <= DEADLINE
+    assert all(before.arrival_airport == after.departure_airport for before, after in zip(flights, flights[1:]))
+    assert all(connection >= CONNECTION for connection in itinerary.connection_times)
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("max_legs", [1, 2, 3])
+def test_matches_brute_force(tmp_path, seed: int, max_legs: int):
+    store = random_store(str(tmp_path), 120, seed, round_trips = False)
+    legs = LegIndex.from_store(store)
+    
+    soonest, cheapest = brute_force(store, max_legs)
+    
+    earliest_arrivals = legs.earliest_arrivals(ORIGINS, DESTINATIONS, DEPART_AFTER, DEADLINE, CONNECTION, max_legs)
+    cheapest_itineraries = legs.cheapest(ORIGINS, DESTINATIONS, DEPART_AFTER, DEADLINE, CONNECTION, max_legs)
+    
+    assert {airport: itinerary.arrival_time for airport, itinerary in earliest_arrivals.items()} == soonest
+    assert {airport: itinerary.cost for airport, itinerary in cheapest_itineraries.items()} == cheapest
+    
+    for itinerary in list(earliest_arrivals.values()) + list(cheapest_itineraries.values()):
+        check(itinerary, max_legs)
+
+def test_deadline_for_each_destination(tmp_path):
+    legs = LegIndex.from_store(random_store(str(tmp_path), 120, 0, round_trips = False))
+    
+    everything = legs.earliest_arrivals(ORIGINS, DESTINATIONS, DEPART_AFTER)
+    airport, itinerary = next(iter(everything.items()))
+    
+    # Nothing lands sooner than the soonest, so a deadline a minute earlier leaves the destination
+    # out, while destinations without a deadline are unaffected
+    deadlines = {airport: itinerary.arrival_time - timedelta(minutes = 1)}
+    found = legs.earliest_arrivals(ORIGINS, DESTINATIONS, DEPART_AFTER, deadlines)
+    
+    assert airport not in found
+    assert all(found[other] == everything[other] for other in everything if other != airport)
+
+def test_self_transfer(tmp_path):
+    with FlightWriter(str(tmp_path)) as writer:
+        writer.write(Flight("LAX", "DEN", datetime(2024, 4, 7, 6), datetime(2024, 4, 7, 9),
+                            leeway_time = timedelta(0), direction = FlightDirection.DEPARTING, cost = 80))
+        writer.write(Flight("DEN", "AUS", datetime(2024, 4, 7, 12), datetime(2024, 4, 7, 15),
+                            leeway_time = timedelta(0), direction = FlightDirection.DEPARTING, cost = 90))
+        writer.write(Flight("LAX", "AUS", datetime(2024, 4, 7, 8), datetime(2024, 4, 7, 13),
+                            leeway_time = timedelta(0), direction = FlightDirection.DEPARTING, cost = 400))
+    
+    legs = LegIndex.from_store(FlightStore(str(tmp_path)))
+    
+    cheapest = legs.cheapest(["LAX"], ["AUS"])["AUS"]
+    assert [flight.arrival_airport for flight in cheapest.flights] == ["DEN", "AUS"]
+    assert cheapest.cost == 170
+    assert cheapest.connection_times == [timedelta(hours = 3)]
+    
+    assert legs.earliest_arrivals(["LAX"], ["AUS"])["AUS"].cost == 400
+    
+    # Too short a connection, or too few legs, leaves only the direct flight
+    assert legs.cheapest(["LAX"], ["AUS"], min_connection = timedelta(hours = 4))["AUS"].cost == 400
+    assert legs.cheapest(["LAX"], ["AUS"], max_legs = 1)["AUS"].cost == 400
+
+def test_at_least_one_leg(tmp_path):
+    legs = LegIndex.from_store(random_store(str(tmp_path), 10, 0, round_trips = False))
+    
+    with pytest.raises(ValueError):
+        legs.cheapest(ORIGINS, DESTINATIONS, max_legs = 0)
+    
+    with pytest.raises(ValueError):
+        legs.earliest_arrivals(ORIGINS, DESTINATIONS, max_legs = 0)
@@ -0,0 +1,83 @@
+from planner.enums import FlightDirection
+from planner.join import iter_round_trips, join_round_trips
+from planner.store import FLIGHT_DTYPE, FlightTable
+
+from conftest import AIRPORT2CITIES, AIRPORTS, CITY2AIRPORTS, random_store
+
+from datetime import timedelta
+
+import numpy as np
+
+import pytest
+
+def brute_force(departing: FlightTable, returning: FlightTable, bounds: dict) -> set[tuple[int, int]]:
+    """Every pair of flights where the second leaves from the city the first arrives in"""
+    def within(leeway: int, low: str, high: str) -> bool:
+        return (bounds.get(low) is None or leeway >= bounds[low] // timedelta(seconds = 1)) and \
+               (bounds.get(high) is None or leeway <= bounds[high] // timedelta(seconds = 1))
+    
+    pairs = set()
+    
+    for i, departing_record in enumerate(departing.records):
+        arrival_airport = departing.airports[departing_record["arrival_airport"]]
+        mates = {mate for city in AIRPORT2CITIES[arrival_airport] for mate in CITY2AIRPORTS[city]}
+        
+        if not within(departing_record["leeway_time"], "min_setup_time", "max_setup_time"):
+            continue
+        
+        for j, returning_record in enumerate(returning.records):
+            if returning.airports[returning_record["departure_airport"]] in mates and \
+               within(returning_record["leeway_time"], "min_cleanup_time", "max_cleanup_time"):
+                pairs.add((i, j))
+    
+    return pairs
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("bounds", [
+    {},
+    dict(min_setup_time = timedelta(hours = 2), max_setup_time = timedelta(hours = 8),
+         min_cleanup_time = timedelta(hours = 2), max_cleanup_time = timedelta(hours = 8)),
+    dict(min_setup_time = timedelta(hours = 5), max_cleanup_time = timedelta(hours = 3)),
+])
+def test_matches_brute_force(tmp_path, seed: int, bounds: dict):
+    store = random_store(str(tmp_path), 350, seed)
+    departing, returning = store.departing, store.returning
+    
+    departing_rows, returning_rows = join_round_trips(departing, returning, CITY2AIRPORTS, AIRPORT2CITIES, **bounds)
+    pairs = list(zip(departing_rows.tolist(), returning_rows.tolist()))
+    
+    # Each round trip is found once
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == brute_force(departing, returning, bounds)
+
+def test_airport_without_a_city(tmp_path):
+    store = random_store(str(tmp_path), 100, 0)
+    departing, returning = store.departing, store.returning
+    
+    # Flights to an airport in no city can't be paired with anything
+    airport2cities = dict(AIRPORT2CITIES, IND = ())
+    city2airports = {city: airports for city, airports in CITY2AIRPORTS.items() if city != "Indianapolis"}
+    
+    departing_rows, _ = join_round_trips(departing, returning, city2airports, airport2cities)
+    
+    assert not np.any(departing.airport_names("arrival_airport")[departing_rows] == "IND")
+
+def test_no_flights():
+    empty = FlightTable(np.zeros(0, dtype = FLIGHT_DTYPE), np.array(AIRPORTS, dtype = str), FlightDirection.DEPARTING)
+    departing_rows, returning_rows = join_round_trips(empty, empty, CITY2AIRPORTS, AIRPORT2CITIES)
+    
+    assert len(departing_rows) == len(returning_rows) == 0
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1 << 20])
+def test_chunks_are_bounded_by_trips(tmp_path, chunk_size: int):
+    store = random_store(str(tmp_path), 350, 1)
+    departing, returning = store.departing, store.returning
+    
+    chunks = list(iter_round_trips(departing, returning, CITY2AIRPORTS, AIRPORT2CITIES, chunk_size = chunk_size))
+    
+    # Only a departing flight with more trips than fit in a chunk gets a larger chunk, all of its own
+    for departing_rows, _ in chunks:
+        assert len(departing_rows) <= chunk_size or len(np.unique(departing_rows)) == 1
+    
+    pairs = {pair for departing_rows, returning_rows in chunks for pair in zip(departing_rows.tolist(), returning_rows.tolist())}
+    assert pairs == brute_force(departing, returning, {})
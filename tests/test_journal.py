@@ -0,0 +1,106 @@
+from planner.journal import Journal
+from planner.query import Query
+
+from datetime import datetime
+
+import os
+
+DATE = datetime(2024, 4, 7)
+
+def query(departing_from: list, arriving_to: list) -> Query:
+    return Query(departing_from = departing_from, arriving_to = arriving_to, departure_date = DATE, return_date = datetime(2024, 4, 8))
+
+def rows(query: Query) -> list:
+    """One flight on every route of a query"""
+    return [
+        ((departure_airport, arrival_airport), (DATE.replace(hour = 6), DATE.replace(hour = 9)), 100 + i)
+        for i, (departure_airport, arrival_airport) in enumerate(
+            (departure_airport, arrival_airport)
+            for departure_airport in query.departing_from
+            for arrival_airport in query.arriving_to
+        )
+    ]
+
+def test_query_is_rebuilt_from_other_groupings(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    
+    for earlier in (query(["LAX", "BUR"], ["DFW"]), query(["LAX", "BUR", "ONT"], ["AUS", "IND"])):
+        journal.append(earlier, rows(earlier))
+    
+    # Airports are matched whatever their order or case
+    found = journal.get(query(["bur"], ["IND", "DFW", "AUS"]))
+    
+    assert sorted(row[0] for row in found) == [("BUR", "AUS"), ("BUR", "DFW"), ("BUR", "IND")]
+    
+    journal.close()
+
+def test_query_with_an_uncovered_route_misses(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.append(query(["LAX", "BUR"], ["DFW"]), rows(query(["LAX", "BUR"], ["DFW"])))
+    
+    assert journal.get(query(["LAX", "ONT"], ["DFW"])) is None
+    assert journal.get(query(["LAX"], ["DFW", "AUS"])) is None
+    
+    journal.close()
+
+def test_resume_after_a_line_was_cut_short(tmp_path):
+    filepath = str(tmp_path / "journal.jsonl")
+    first, second, third = query(["LAX"], ["DFW"]), query(["BUR"], ["AUS"]), query(["ONT"], ["IND"])
+    
+    journal = Journal(filepath)
+    journal.append(first, rows(first))
+    journal.append(second, rows(second))
+    journal.close()
+    
+    # Crash partway through writing the second entry
+    with open(filepath) as file:
+        text = file.read()
+    
+    with open(filepath, "w") as file:
+        file.write(text[:-20])
+    
+    journal = Journal(filepath, resume = True)
+    
+    assert journal.get(first) == rows(first)
+    assert journal.get(second) is None
+    
+    # Entries written after resuming start on their own line, so they survive the next resume
+    journal.append(third, rows(third))
+    journal.close()
+    
+    journal = Journal(filepath, resume = True)
+    
+    assert journal.get(first) == rows(first)
+    assert journal.get(third) == rows(third)
+    
+    journal.close()
+
+def test_fresh_journal_forgets_the_last_sweep(tmp_path):
+    filepath = str(tmp_path / "journal.jsonl")
+    
+    journal = Journal(filepath)
+    journal.append(query(["LAX"], ["DFW"]), rows(query(["LAX"], ["DFW"])))
+    journal.close()
+    
+    journal = Journal(filepath, resume = False)
+    
+    assert journal.get(query(["LAX"], ["DFW"])) is None
+    
+    journal.close()
+
+def test_every_entry_is_synced_to_disk(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    
+    for departure_airport in ("LAX", "BUR", "ONT"):
+        journal.append(query([departure_airport], ["DFW"]), rows(query([departure_airport], ["DFW"])))
+        
+        # Readable by another process as soon as it is appended
+        with open(journal.filepath) as file:
+            assert len(file.readlines()) == len(synced)
+    
+    assert len(synced) == 3
+    
+    journal.close()
@@ -0,0 +1,73 @@
+from planner.join import from_home, iter_round_trips
+from planner.matcher import OriginMatchers
+from planner.pruning import Constraints
+from planner.ranking import Objectives, TopK
+
+from conftest import AIRPORT2CITIES, CITY2AIRPORTS, random_flights, random_store
+
+from datetime import timedelta
+
+import random
+
+import numpy as np
+import pytest
+
+def offline_top(store, origin_city: str, objectives: Objectives, k: int, constraints: Constraints) -> tuple[list, int]:
+    """The best trips from a finished store, as match.py finds them, and how many trips there were"""
+    departing, returning = from_home(store.departing, store.returning, CITY2AIRPORTS[origin_city])
+    
+    chunks = iter_round_trips(departing, returning, CITY2AIRPORTS, AIRPORT2CITIES,
+                              min_setup_time = constraints.min_setup_time,
+                              max_setup_time = constraints.max_setup_time,
+                              min_cleanup_time = constraints.min_cleanup_time,
+                              max_cleanup_time = constraints.max_cleanup_time)
+    
+    top = TopK(k)
+    num_trips = 0
+    
+    for departing_rows, returning_rows in chunks:
+        keys = objectives.keys(departing.records[departing_rows], returning.records[returning_rows])
+        top.push_many(keys, np.stack((departing_rows, returning_rows), axis = 1))
+        num_trips += len(keys)
+    
+    return [tuple(int(value) for value in key) for key, _ in top.results()], num_trips
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("objectives", ["cost,travel_time", "-setup_time,cost"])
+@pytest.mark.parametrize("constraints", [
+    Constraints(),
+    Constraints(min_setup_time = timedelta(hours = 1), max_cleanup_time = timedelta(hours = 4)).widened(1),
+])
+def test_matches_the_finished_store(tmp_path, seed: int, objectives: str, constraints: Constraints):
+    origin_cities = ["Los Angeles", "Denver"]
+    objectives = Objectives(objectives)
+    k = 15
+    
+    store = random_store(str(tmp_path), 400, seed)
+    
+    # Flights arrive in whatever order the searches finish in, and overlapping searches find some of them twice
+    flights = random_flights(400, seed)
+    flights += flights[:50]
+    random.Random(seed).shuffle(flights)
+    
+    matchers = OriginMatchers(origin_cities, CITY2AIRPORTS, AIRPORT2CITIES, objectives = objectives, k = k, constraints = constraints)
+    
+    for flight in flights:
+        matchers.add(flight)
+    
+    assert len(matchers) == len(origin_cities)
+    
+    for origin_city, matcher in matchers.items():
+        keys, num_trips = offline_top(store, origin_city, objectives, k, constraints)
+        
+        assert num_trips > 0
+        assert matcher.num_trips == num_trips
+        
+        # Trips which tie may be chosen differently, but their keys are the same
+        assert [objectives.key(trip) for trip in matcher.results()] == keys
+        
+        home_airports = CITY2AIRPORTS[origin_city]
+        
+        for trip in matcher.results():
+            assert trip.departing_flight.departure_airport in home_airports
+            assert trip.returning_flight.arrival_airport in home_airports
@@ -0,0 +1,80 @@
+from planner.parser import parse_calendar, parse_flights
+
+from datetime import datetime
+from typing import Optional
+
+def card(departure_airport: str, arrival_airport: str, departure_time: str, arrival_time: str,
+         price: Optional[str] = None, layover: Optional[str] = None) -> str:
+    """A flight card laid out like those on the results page"""
+    return f"""
+    <li class="pIav2d">
+      <div class="wtdjmc YMlIz ogfYpf tPgKwe">{departure_time}</div>
+      <div class="XWcVob YMlIz ogfYpf tPgKwe">{arrival_time}</div>
+      <div class="G2WY5c sSHqwe ogfYpf tPgKwe">{departure_airport}</div>
+      <div class="c8rWCd sSHqwe ogfYpf tPgKwe">{arrival_airport}</div>
+      {f'<div class="EfT7Ae AdWm1c tPgKwe"><span class="ogfYpf">1 stop</span><div class="sSHqwe">{layover}</div></div>' if layover else ''}
+      {f'<div class="BVAVmf I11szd Qr8X4d"><span>{price}</span></div>' if price else ''}
+    </li>
+    """
+
+def page(*cards: str) -> str:
+    return f"<html><body><ul>{''.join(cards)}</ul></body></html>"
+
+def test_card_without_a_price_keeps_the_others_aligned():
+    flights = parse_flights(page(
+        card("LAX", "DFW", "6:00 AM", "11:15 AM"),
+        card("BUR", "AUS", "7:30 AM", "12:45 PM", price = "$1,204"),
+    ), datetime(2024, 4, 7))
+    
+    assert [(flight.departure_airport, flight.price) for flight in flights] == [("LAX", None), ("BUR", 1204)]
+    assert flights[1].departure_time == datetime(2024, 4, 7, 7, 30)
+    assert flights[1].arrival_time == datetime(2024, 4, 7, 12, 45)
+
+def test_cards_with_and_without_a_layover():
+    flights = parse_flights(page(
+        card("LAX", "IND", "8:05 AM", "6:40 PM", price = "$310", layover = "1 hr 5 min DEN"),
+        card("ONT", "DFW", "9:10 AM", "2:20 PM", price = "$199"),
+    ), datetime(2024, 4, 7))
+    
+    assert [(flight.departure_airport, flight.arrival_airport, flight.price) for flight in flights] == [
+        ("LAX", "IND", 310),
+        ("ONT", "DFW", 199),
+    ]
+    assert flights[1].departure_time == datetime(2024, 4, 7, 9, 10)
+
+def test_overnight_arrival_rolls_over_the_month():
+    flights = parse_flights(page(
+        card("LAX", "BUF", "10:55 PM", "7:05 AM+1", price = "$254"),
+        card("SFO", "CLE", "11:59 PM", "12:30 AM+2", price = "$301"),
+    ), datetime(2024, 3, 31))
+    
+    assert flights[0].departure_time == datetime(2024, 3, 31, 22, 55)
+    assert flights[0].arrival_time == datetime(2024, 4, 1, 7, 5)
+    assert flights[1].arrival_time == datetime(2024, 4, 2, 0, 30)
+
+def test_card_without_times_is_skipped():
+    flights = parse_flights(page(
+        card("LAX", "DFW", "", "11:15 AM", price = "$99"),
+        card("BUR", "AUS", "7:30 AM", "12:45 PM", price = "$120"),
+    ), datetime(2024, 4, 7))
+    
+    assert [flight.departure_airport for flight in flights] == ["BUR"]
+
+def test_empty_results_page():
+    assert parse_flights(page(), datetime(2024, 4, 7)) == []
+    assert parse_flights("<html><body><div>No results returned.</div></body></html>", datetime(2024, 4, 7)) == []
+
+def test_calendar_keeps_the_day_with_a_price():
+    calendar = """
+    <div role="gridcell" data-iso="2024-04-06"><div class="UNMzKf">$420</div></div>
+    <div role="gridcell" data-iso="2024-04-07"></div>
+    <div role="gridcell" data-iso="2024-04-07"><div class="UNMzKf">$1,180</div></div>
+    <div role="gridcell" data-iso="2024-04-08"></div>
+    <div role="gridcell" data-iso="not a date"><div class="UNMzKf">$5</div></div>
+    """
+    
+    assert parse_calendar(f"<html><body>{calendar}</body></html>") == {
+        datetime(2024, 4, 6): 420,
+        datetime(2024, 4, 7): 1180,
+        datetime(2024, 4, 8): None,
+    }
@@ -0,0 +1,113 @@
+from planner import pool
+from planner.journal import Journal
+from planner.pool import APIPool
+from planner.query import Query
+from planner.supervisor import FailureLog
+
+from datetime import datetime
+from threading import Lock
+
+import pytest
+
+import search
+
+class FakeBrowser:
+    """A browser which fails to start after the first few, and remembers which are still open"""
+    lock = Lock()
+    launched = 0
+    fail_after = None
+    open = set()
+    
+    def __init__(self, **options):
+        with FakeBrowser.lock:
+            FakeBrowser.launched += 1
+            
+            if FakeBrowser.fail_after is not None and FakeBrowser.launched > FakeBrowser.fail_after:
+                raise RuntimeError("Chrome failed to start")
+            
+            FakeBrowser.open.add(self)
+    
+    def fetch(self, query) -> str:
+        raise RuntimeError("crash")
+    
+    def close(self):
+        FakeBrowser.open.discard(self)
+
+@pytest.fixture
+def browsers(monkeypatch):
+    monkeypatch.setattr(pool, "API", FakeBrowser)
+    monkeypatch.setattr(FakeBrowser, "launched", 0)
+    monkeypatch.setattr(FakeBrowser, "fail_after", None)
+    monkeypatch.setattr(FakeBrowser, "open", set())
+    
+    return FakeBrowser
+
+def test_failed_launch_closes_the_other_browsers(browsers):
+    browsers.fail_after = 2
+    
+    with pytest.raises(RuntimeError):
+        APIPool(workers = 4)
+    
+    assert browsers.launched > 2
+    assert not browsers.open
+
+def test_search_closes_the_browsers_when_it_fails(browsers, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("sweep failed")
+        yield
+    
+    monkeypatch.setattr(search, "fetch_round_trip_flights", fail)
+    
+    with pytest.raises(RuntimeError):
+        search.search(workers = 2, top = 0)
+    
+    assert browsers.launched == 2
+    assert not browsers.open
+
+CALENDAR = """
+<div role="gridcell" data-iso="2024-04-06"><div class="UNMzKf">$420</div></div>
+<div role="gridcell" data-iso="2024-04-07"><div class="UNMzKf">$180</div></div>
+"""
+
+def test_resumed_search_reuses_the_date_pickers(browsers, monkeypatch, tmp_path):
+    opened = []
+    
+    def fetch_calendar(self, query) -> str:
+        opened.append(query)
+        return CALENDAR
+    
+    monkeypatch.setattr(browsers, "fetch_calendar", fetch_calendar, raising = False)
+    
+    query = Query(departing_from = ["LAX"], arriving_to = ["DFW"], departure_date = datetime(2024, 4, 6))
+    filepath = str(tmp_path / "journal.jsonl")
+    
+    for resume in (False, True):
+        journal = Journal(filepath, resume = resume)
+        
+        with APIPool(workers = 1, journal = journal) as api:
+            assert list(api.cheapest_fares([query])) == [(query, {datetime(2024, 4, 6): 420, datetime(2024, 4, 7): 180})]
+        
+        journal.close()
+    
+    assert opened == [query]
+
+def test_page_which_cant_be_parsed_loses_only_its_query(browsers, monkeypatch):
+    monkeypatch.setattr(browsers, "fetch", lambda self, query: query.arriving_to[0])
+    
+    def parse_flights(page: str, departure_date: datetime) -> list:
+        if page == "AUS":
+            raise ValueError("unexpected page")
+        
+        return []
+    
+    monkeypatch.setattr(pool, "parse_flights", parse_flights)
+    
+    queries = [Query(departing_from = ["LAX"], arriving_to = [airport], departure_date = datetime(2024, 4, 7), return_date = datetime(2024, 4, 8))
+               for airport in ("DFW", "AUS", "IND")]
+    failures = FailureLog()
+    
+    with APIPool(workers = 2, failures = failures) as api:
+        found = [query.arriving_to[0] for query, _ in api.stream(queries)]
+    
+    assert sorted(found) == ["DFW", "IND"]
+    assert [(entry["key"], entry["gave_up"]) for entry in failures.entries] == [(queries[1].key(), True)]
@@ -0,0 +1,121 @@
+from planner.index import load_index
+from planner.store import FlightStore, FlightWriter
+from planner.pruning import MAX_ARRIVING, MAX_DEPARTING, Constraints, QueryPlanner, distance, pack_routes
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+import random
+
+import pytest
+
+INDEX = load_index("data/processed.csv")
+
+@pytest.mark.parametrize("seed", range(10))
+def test_pack_routes_covers_every_route(seed: int):
+    rng = random.Random(seed)
+    airports = [f"A{i:02d}" for i in range(30)]
+    routes = {(rng.choice(airports[:12]), rng.choice(airports[12:])) for _ in range(rng.randrange(1, 150))}
+    
+    searches = pack_routes(routes)
+    covered = Counter((departure, arrival) for departures, arrivals in searches for departure in departures for arrival in arrivals)
+    
+    # A search covers every pairing of its airports, so routes which weren't asked for
+    # may come along, but none which were asked for is left out
+    assert all(covered[route] >= 1 for route in routes)
+    
+    for departures, arrivals in searches:
+        assert 1 <= len(departures) <= MAX_DEPARTING
+        assert 1 <= len(arrivals) <= MAX_ARRIVING
+        assert len(set(arrivals)) == len(arrivals)
+
+def test_pack_routes_shares_searches():
+    # Seven airports flying to four places fit in a single search
+    routes = [(f"D{i}", f"A{j}") for i in range(7) for j in range(4)]
+    assert len(pack_routes(routes)) == 1
+    
+    # An eighth departure airport needs a second search for every arrival
+    assert len(pack_routes(routes + [("D7", "A0")])) == 2
+
+def usable_flight_exists(planner: QueryPlanner, departure_airport: str, arrival_airport: str, date: datetime, returning: bool) -> bool:
+    """Whether any flight leaving that day, of any possible length, fits the setup or cleanup window"""
+    constraints = planner.constraints
+    min_travel_time = planner._min_travel_time(departure_airport, arrival_airport)
+    
+    for minutes in range(0, 24 * 60, 10):
+        takeoff = planner._to_utc(departure_airport, date + timedelta(minutes = minutes))
+        
+        if returning:
+            eclipse_ends = planner._to_utc(departure_airport, planner.localized_events[departure_airport]["end"])
+            
+            if eclipse_ends + constraints.min_cleanup_time <= takeoff <= eclipse_ends + constraints.max_cleanup_time:
+                return True
+            
+            continue
+        
+        eclipse_begins = planner._to_utc(arrival_airport, planner.localized_events[arrival_airport]["start"])
+        
+        # The earliest and latest this flight can land
+        if takeoff + min_travel_time <= eclipse_begins - constraints.min_setup_time and \
+           takeoff + constraints.max_travel_time >= eclipse_begins - constraints.max_setup_time:
+            return True
+    
+    return False
+
+@pytest.mark.parametrize("constraints", [
+    Constraints(),
+    Constraints(min_setup_time = timedelta(hours = 1), max_setup_time = timedelta(hours = 30)),
+    Constraints(min_cleanup_time = timedelta(hours = 6), max_cleanup_time = timedelta(hours = 12), max_travel_time = timedelta(hours = 6)),
+])
+def test_planner_keeps_every_usable_route(constraints: Constraints):
+    planner = QueryPlanner(INDEX.events, INDEX.locations, constraints)
+    dates = [datetime(2024, 4, 6), datetime(2024, 4, 7), datetime(2024, 4, 8), datetime(2024, 4, 9)]
+    
+    for origin in INDEX.origins:
+        for target in INDEX.targets:
+            for date in dates:
+                if usable_flight_exists(planner, origin, target, date, returning = False):
+                    assert planner.can_depart(origin, target, date), (origin, target, date)
+                
+                if usable_flight_exists(planner, target, origin, date, returning = True):
+                    assert planner.can_return(target, origin, date), (target, origin, date)
+
+def test_planner_prunes_days_too_far_from_the_eclipse():
+    planner = QueryPlanner(INDEX.events, INDEX.locations, Constraints())
+    
+    assert not any(planner.can_depart(origin, target, datetime(2024, 4, 5)) for origin in INDEX.origins for target in INDEX.targets)
+    assert not any(planner.can_return(target, origin, datetime(2024, 4, 10)) for origin in INDEX.origins for target in INDEX.targets)
+    
+    # Flying out the day before, and home on the day, is always possible with the default windows
+    assert all(planner.can_depart(origin, target, datetime(2024, 4, 7)) for origin in INDEX.origins for target in INDEX.targets)
+    assert all(planner.can_return(target, origin, datetime(2024, 4, 8)) for origin in INDEX.origins for target in INDEX.targets)
+
+def test_planned_queries_only_cover_usable_routes():
+    planner = QueryPlanner(INDEX.events, INDEX.locations, Constraints())
+    dates = [datetime(2024, 4, 7), datetime(2024, 4, 8)]
+    
+    queries = planner.departing(list(INDEX.origins), list(INDEX.targets), dates)
+    routes = {(departure, arrival, query.departure_date) for query in queries for departure in query.departing_from for arrival in query.arriving_to}
+    
+    expected = {(origin, target, date) for origin in INDEX.origins for target in INDEX.targets for date in dates if planner.can_depart(origin, target, date)}
+    assert expected <= routes
+
+def test_distance():
+    los_angeles, new_york = dict(latitude = 33.94, longitude = -118.41), dict(latitude = 40.64, longitude = -73.78)
+    
+    assert distance(los_angeles, los_angeles) == 0
+    assert distance(los_angeles, new_york) == pytest.approx(3975, rel = 0.01)
+
+def test_widened_planner_keeps_the_extra_days():
+    planner = QueryPlanner(INDEX.events, INDEX.locations, Constraints().widened(2))
+    
+    assert all(planner.can_depart(origin, target, datetime(2024, 4, 5)) for origin in INDEX.origins for target in INDEX.targets)
+    assert all(planner.can_return(target, origin, datetime(2024, 4, 10)) for origin in INDEX.origins for target in INDEX.targets)
+
+def test_constraints_are_saved_with_the_flights(tmp_path):
+    constraints = Constraints(min_setup_time = timedelta(hours = 1), cruise_speed = 900.0).widened(3)
+    
+    with FlightWriter(str(tmp_path)) as writer:
+        writer.set_constraints(constraints.to_json())
+    
+    assert Constraints.from_json(FlightStore(str(tmp_path)).constraints) == constraints
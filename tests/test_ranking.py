@@ -0,0 +1,74 @@
+from planner.ranking import Skyline, TopK
+
+import numpy as np
+
+import pytest
+
+def pareto_front(keys: np.ndarray) -> set[tuple]:
+    """Keys which no other key is at least as good as in every objective, and better in one"""
+    front = set()
+    
+    for key in keys:
+        dominated = np.any(np.all(keys <= key, axis = 1) & np.any(keys < key, axis = 1))
+        
+        if not dominated:
+            front.add(tuple(key.tolist()))
+    
+    return front
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("k", [1, 5, 50])
+def test_top_k_keeps_the_best(seed: int, k: int):
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, 20, (300, 2))
+    items = np.arange(len(keys))
+    
+    ranker = TopK(k)
+    
+    # In batches, as the join produces them
+    for batch in np.array_split(np.arange(len(keys)), 7):
+        ranker.push_many(keys[batch], items[batch])
+    
+    expected = sorted(tuple(key) for key in keys.tolist())[:k]
+    results = ranker.results()
+    
+    assert [key for key, _ in results] == expected
+    assert all(tuple(keys[item].tolist()) == key for key, item in results)
+
+def test_top_k_breaks_ties_by_arrival():
+    ranker = TopK(2)
+    
+    for item in "abcd":
+        ranker.push((1,), item)
+    
+    assert [item for _, item in ranker.results()] == ["a", "b"]
+
+def test_top_k_needs_room():
+    with pytest.raises(ValueError):
+        TopK(0)
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("num_objectives", [2, 3])
+def test_skyline_is_the_pareto_front(seed: int, num_objectives: int):
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, 30, (400, num_objectives))
+    items = np.arange(len(keys))
+    
+    batched = Skyline()
+    
+    for batch in np.array_split(np.arange(len(keys)), 5):
+        batched.push_many(keys[batch], items[batch])
+    
+    one_by_one = Skyline()
+    
+    for key, item in zip(keys.tolist(), items.tolist()):
+        one_by_one.push(tuple(key), item)
+    
+    front = pareto_front(keys)
+    
+    for ranker in (batched, one_by_one):
+        results = ranker.results()
+        
+        # Equal keys are only kept once
+        assert [key for key, _ in results] == sorted(front)
+        assert all(tuple(keys[item].tolist()) == key for key, item in results)
@@ -0,0 +1,63 @@
+from planner.index import load_index
+from planner.pruning import Constraints, QueryPlanner
+from planner.query import Query
+
+from search import fetch_round_trip_flights
+
+from datetime import timedelta
+
+class FakeAPI:
+    """Answers every search with one flight on each route, landing in time for the eclipse"""
+    
+    def __init__(self, events: dict):
+        self.events = events
+        self.queries = []
+    
+    def stream(self, queries):
+        for query in queries:
+            self.queries.append(query)
+            yield query, self.rows(query)
+    
+    def rows(self, query: Query) -> list:
+        rows = []
+        
+        for departure_airport in query.departing_from:
+            for arrival_airport in query.arriving_to:
+                if arrival_airport in self.events:
+                    landing_time = self.events[arrival_airport]["start"] - timedelta(hours = 3)
+                else:
+                    landing_time = query.departure_date + timedelta(hours = 22)
+                
+                rows.append(((departure_airport, arrival_airport), (landing_time - timedelta(hours = 2), landing_time), 100))
+        
+        return rows
+
+INDEX = load_index("data/processed.csv")
+
+def fetch(constraints: Constraints) -> tuple[list, FakeAPI]:
+    index = INDEX
+    api = FakeAPI(index.events)
+    
+    flights = list(fetch_round_trip_flights(index.events,
+                                            origin_airports = list(index.origins),
+                                            viewing_airports = list(index.targets),
+                                            city2airports = index.city2airports,
+                                            airport2cities = index.airport2cities,
+                                            api = api,
+                                            query_planner = QueryPlanner(index.events, index.locations, constraints)))
+    
+    return flights, api
+
+def test_returning_searches_follow_departing_flights():
+    flights, api = fetch(Constraints())
+    
+    assert flights
+    assert any(set(query.arriving_to) & set(INDEX.origins) for query in api.queries)
+
+def test_pruning_every_returning_search_ends_the_sweep():
+    # No flight home can leave a whole day after the eclipse ends, so every returning search is pruned
+    constraints = Constraints(min_cleanup_time = timedelta(hours = 20), max_cleanup_time = timedelta(hours = 24))
+    flights, api = fetch(constraints)
+    
+    assert flights
+    assert not any(set(query.arriving_to) & set(INDEX.origins) for query in api.queries)
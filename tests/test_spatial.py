@@ -0,0 +1,103 @@
+from planner.eclipse import path_of_totality
+from planner.spatial import AirportTree, distance, transfer_areas, with_areas
+
+import math
+
+import numpy as np
+import pytest
+
+EARTH_RADIUS = 6371.0
+
+# One degree along the equator, or along any meridian
+DEGREE = 2 * math.pi * EARTH_RADIUS / 360
+
+# Airports along the equator, so that the distances between them are whole multiples of a degree
+EQUATOR = AirportTree(["AAA", "BBB", "CCC", "DDD"], [0.0, 0.0, 0.0, 0.0], [0.0, 1.0, 2.0, -1.5])
+
+def test_distance():
+    assert distance(dict(latitude = 0, longitude = 0), dict(latitude = 0, longitude = 1)) == pytest.approx(DEGREE)
+    assert distance(dict(latitude = 0, longitude = 0), dict(latitude = 0, longitude = 90)) == pytest.approx(90 * DEGREE)
+    assert distance(dict(latitude = 90, longitude = 0), dict(latitude = 0, longitude = 45)) == pytest.approx(90 * DEGREE)
+    assert distance(dict(latitude = 10, longitude = 20), dict(latitude = -10, longitude = -160)) == pytest.approx(180 * DEGREE)
+
+def test_within_finds_the_nearest_first():
+    assert EQUATOR.within(0.0, 0.0, 2 * DEGREE - 1) == [["AAA", "BBB", "DDD"]]
+    assert EQUATOR.within(0.0, 0.0, DEGREE - 1) == [["AAA"]]
+    
+    # Several places at once
+    assert EQUATOR.within(np.array([0.0, 0.0]), np.array([1.9, -1.4]), 0.5 * DEGREE) == [["CCC"], ["DDD"]]
+
+def test_mates_are_the_airports_in_reach():
+    mates = EQUATOR.mates(1.5 * DEGREE)
+    
+    assert mates == {"AAA": ("BBB", "DDD"), "BBB": ("AAA", "CCC"), "CCC": ("BBB",), "DDD": ("AAA",)}
+
+def test_airport_listed_twice_is_not_its_own_mate():
+    tree = AirportTree(["AAA", "AAA", "BBB"], [0.0, 0.0, 0.0], [0.0, 0.0, 5.0])
+    assert tree.mates(DEGREE) == {"AAA": (), "BBB": ()}
+
+def test_path_distances_match_the_nearest_point_of_the_path():
+    # Dallas is in the path of totality, the others are not
+    tree = AirportTree(["DFW", "LAX", "ATL", "JFK"], [32.90, 33.94, 33.64, 40.64], [-97.04, -118.41, -84.43, -73.78])
+    distances = tree.path_distances()
+    
+    latitude, longitude = path_of_totality()
+    
+    for code, lat, lon, found in zip(tree.codes, tree.latitude, tree.longitude, distances):
+        if code == "DFW":
+            assert found == 0
+            continue
+        
+        nearest = min(distance(dict(latitude = lat, longitude = lon), dict(latitude = a, longitude = b)) for a, b in zip(latitude.ravel(), longitude.ravel()))
+        assert found == pytest.approx(nearest, rel = 1e-6)
+    
+    # Airports past the limit aren't measured
+    limited = tree.path_distances(limit = 1000)
+    
+    assert np.isinf(limited[1])
+    assert limited[2] == pytest.approx(distances[2])
+    
+    assert set(tree.near_path(400)) == {"DFW", "JFK"}
+    assert tree.near_path(0) == {"DFW": 0.0}
+
+def test_from_csv_keeps_airports_with_scheduled_flights(tmp_path):
+    filepath = tmp_path / "airports.csv"
+    filepath.write_text(
+        "id,ident,iata_code,latitude_deg,longitude_deg,scheduled_service\n"
+        "1,KLAX,LAX,33.94,-118.41,yes\n"
+        "2,KBUR,BUR,34.20,-118.36,yes\n"
+        "3,KVNY,VNY,34.21,-118.49,no\n"
+        "4,XXXX,,34.0,-118.0,yes\n"
+        "5,KLAX2,LAX,0.0,0.0,yes\n"
+        "6,KNA,NA,10.0,10.0,yes\n"
+    )
+    
+    tree = AirportTree.from_csv(str(filepath))
+    
+    assert tree.codes.tolist() == ["LAX", "BUR"]
+    assert tree.within(34.0, -118.4, 10) == [["LAX"]]
+    
+    # Burbank is about 30 kilometers from LAX
+    assert tree.mates(35) == {"LAX": ("BUR",), "BUR": ("LAX",)}
+    assert tree.mates(25) == {"LAX": (), "BUR": ()}
+
+def test_from_locations_places_airports_at_their_city():
+    tree = AirportTree.from_locations({"DFW": dict(latitude = 32.78, longitude = -96.8), "DAL": dict(latitude = 32.78, longitude = -96.8)})
+    assert tree.mates(0.001) == {"DFW": ("DAL",), "DAL": ("DFW",)}
+
+def test_with_areas_adds_airports_from_different_cities():
+    city2airports = {"Dallas": ("DFW", "DAL"), "Waco": ("ACT",)}
+    airport2cities = {"DFW": ("Dallas",), "DAL": ("Dallas",), "ACT": ("Waco",)}
+    
+    tree = AirportTree(["DFW", "DAL", "ACT"], [32.90, 32.85, 31.61], [-97.04, -96.85, -97.23])
+    areas = transfer_areas(tree, 150)
+    
+    assert areas == {"ACT/DAL": ("ACT", "DAL"), "ACT/DFW": ("ACT", "DFW"), "DAL/DFW": ("DAL", "DFW")}
+    
+    city2airports, airport2cities = with_areas(city2airports, airport2cities, areas)
+    
+    # Dallas' airports are already paired by their city
+    assert "DAL/DFW" not in city2airports
+    assert city2airports["ACT/DFW"] == ("ACT", "DFW")
+    assert sorted(airport2cities["ACT"]) == ["ACT/DAL", "ACT/DFW", "Waco"]
+    assert airport2cities["DFW"] == ("Dallas", "ACT/DFW")
@@ -0,0 +1,41 @@
+from planner.flight import Flight, SharedValues
+
+from conftest import random_store
+
+import pickle
+
+def test_flights_share_values_within_a_store(tmp_path):
+    store = random_store(str(tmp_path), 200, 0)
+    flights = list(store.departing.flights()) + list(store.returning.flights())
+    
+    # Equal times read from the same store are the same object
+    first = {}
+    
+    for flight in flights:
+        for value in (flight.departure_time, flight.arrival_time, flight.leeway_time):
+            assert first.setdefault(value, value) is value
+    
+    # Filtered tables read into the same shared values as the store
+    assert store.departing.where(store.departing["cost"] >= 0).shared is store.shared
+
+def test_stores_do_not_share_values(tmp_path):
+    a = random_store(str(tmp_path / "a"), 50, 0)
+    b = random_store(str(tmp_path / "b"), 50, 0)
+    
+    assert a.shared is not b.shared
+    assert a.departing.flight(0).departure_time is not b.departing.flight(0).departure_time
+    assert a.departing.flight(0) == b.departing.flight(0)
+
+def test_pickled_flights_are_equal(tmp_path):
+    store = random_store(str(tmp_path), 10, 0)
+    flight = store.departing.flight(0)
+    copy = pickle.loads(pickle.dumps(flight))
+    
+    assert isinstance(copy, Flight)
+    assert copy == flight and hash(copy) == hash(flight)
+
+def test_shared_values():
+    shared = SharedValues()
+    
+    assert shared(1000) is shared(int("1000"))
+    assert len(shared) == 1
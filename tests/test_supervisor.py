@@ -0,0 +1,75 @@
+from planner.supervisor import FailureLog, Supervisor
+from planner.query import Query
+
+from datetime import datetime
+
+import pytest
+
+QUERY = Query(departing_from = ["LAX"], arriving_to = ["DFW"], departure_date = datetime(2024, 4, 7), return_date = datetime(2024, 4, 8))
+
+class FakeBrowser:
+    launched = 0
+    
+    def __init__(self, heap_size: int = 0):
+        FakeBrowser.launched += 1
+        self.size = heap_size
+    
+    def fetch(self, query: Query) -> str:
+        return "<html></html>"
+    
+    def heap_size(self) -> int:
+        return self.size
+    
+    def close(self):
+        pass
+
+@pytest.fixture(autouse = True)
+def reset(monkeypatch):
+    monkeypatch.setattr(FakeBrowser, "launched", 0)
+
+@pytest.mark.parametrize("max_queries", [None, 0])
+def test_no_search_limit(max_queries):
+    supervisor = Supervisor(lambda: FakeBrowser(), max_queries = max_queries, max_memory = None)
+    
+    for _ in range(10):
+        supervisor.fetch(QUERY)
+    
+    assert FakeBrowser.launched == 1
+
+def test_search_limit():
+    supervisor = Supervisor(lambda: FakeBrowser(), max_queries = 3, max_memory = None)
+    
+    for _ in range(10):
+        supervisor.fetch(QUERY)
+    
+    # A new browser is launched for the 4th, 7th and 10th searches
+    assert FakeBrowser.launched == 4
+
+@pytest.mark.parametrize("max_memory", [None, 0])
+def test_no_memory_limit(max_memory):
+    supervisor = Supervisor(lambda: FakeBrowser(heap_size = 2 ** 40), max_queries = None, max_memory = max_memory)
+    
+    for _ in range(5):
+        supervisor.fetch(QUERY)
+    
+    assert FakeBrowser.launched == 1
+
+def test_memory_limit():
+    supervisor = Supervisor(lambda: FakeBrowser(heap_size = 2 ** 30), max_queries = None, max_memory = 2 ** 20)
+    
+    for _ in range(5):
+        supervisor.fetch(QUERY)
+    
+    assert FakeBrowser.launched == 5
+
+def test_failed_searches_are_recorded():
+    class Crashing(FakeBrowser):
+        def fetch(self, query: Query) -> str:
+            raise RuntimeError("tab crashed")
+    
+    failures = FailureLog()
+    supervisor = Supervisor(lambda: Crashing(), retries = 2, backoff = 0, failures = failures)
+    
+    assert supervisor.fetch(QUERY) is None
+    assert [entry["attempt"] for entry in failures.entries] == [1, 2, 3]
+    assert [entry["gave_up"] for entry in failures.entries] == [False, False, True]